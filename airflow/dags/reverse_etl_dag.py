@@ -28,44 +28,18 @@ default_args = {
 
 
 def sync_user_segments(**context):
-    """Sync user segments to CRM table."""
+    """
+    Sync changed user segments to CRM table.
+    
+    mart_user_segments stamps every row it rewrites with a new segmented_at;
+    only rows newer than the CRM's source_segmented_at watermark are synced.
+    """
     import duckdb
     import psycopg2
     from psycopg2.extras import execute_values
     
     duckdb_path = os.getenv('DUCKDB_PATH', '/data/searchflow.duckdb')
     
-    # Extract from warehouse
-    warehouse = duckdb.connect(duckdb_path, read_only=True)
-    
-    try:
-        segments = warehouse.execute("""
-            SELECT 
-                user_id,
-                segment,
-                engagement_score,
-                lifetime_revenue,
-                lifetime_conversions,
-                primary_platform,
-                primary_country,
-                first_seen_at,
-                last_seen_at
-            FROM main_marketing.mart_user_segments
-            WHERE user_id IS NOT NULL
-            LIMIT 10000
-        """).fetchall()
-    except Exception as e:
-        print(f"Warning: Could not read from warehouse: {e}")
-        segments = []
-    finally:
-        warehouse.close()
-    
-    print(f"Extracted {len(segments)} segments from warehouse")
-    
-    if not segments:
-        return {'segments_synced': 0}
-    
-    # Load to CRM (Postgres)
     postgres_config = {
         'host': os.getenv('POSTGRES_HOST', 'postgres'),
         'port': int(os.getenv('POSTGRES_PORT', '5432')),
@@ -76,6 +50,11 @@ def sync_user_segments(**context):
     
     try:
         conn = psycopg2.connect(**postgres_config)
+    except Exception as e:
+        print(f"Warning: Could not connect to Postgres: {e}")
+        return {'segments_synced': 0}
+    
+    try:
         cursor = conn.cursor()
         
         # Ensure table exists
@@ -93,37 +72,71 @@ def sync_user_segments(**context):
                 synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        cursor.execute("""
+            ALTER TABLE crm_user_segments
+            ADD COLUMN IF NOT EXISTS source_segmented_at TIMESTAMP
+        """)
+        conn.commit()
         
-        # Upsert segments
-        execute_values(
-            cursor,
-            """
-            INSERT INTO crm_user_segments 
-            (user_id, segment, engagement_score, lifetime_revenue, 
-             lifetime_conversions, primary_platform, primary_country,
-             first_seen_at, last_seen_at, synced_at)
-            VALUES %s
-            ON CONFLICT (user_id) DO UPDATE SET
-                segment = EXCLUDED.segment,
-                engagement_score = EXCLUDED.engagement_score,
-                lifetime_revenue = EXCLUDED.lifetime_revenue,
-                lifetime_conversions = EXCLUDED.lifetime_conversions,
-                synced_at = CURRENT_TIMESTAMP
-            """,
-            [(
-                row[0], row[1], row[2], row[3], row[4],
-                row[5], row[6], row[7], row[8], datetime.utcnow()
-            ) for row in segments]
-        )
+        # Newest warehouse segmented_at already in the CRM
+        cursor.execute("SELECT MAX(source_segmented_at) FROM crm_user_segments")
+        watermark = cursor.fetchone()[0]
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        # Extract users changed since the last sync
+        warehouse = duckdb.connect(duckdb_path, read_only=True)
+        try:
+            segments = warehouse.execute("""
+                SELECT 
+                    user_id,
+                    segment,
+                    engagement_score,
+                    lifetime_revenue,
+                    lifetime_conversions,
+                    primary_platform,
+                    primary_country,
+                    first_seen_at,
+                    last_seen_at,
+                    segmented_at AT TIME ZONE 'UTC' AS source_segmented_at
+                FROM main_marketing.mart_user_segments
+                WHERE user_id IS NOT NULL
+                  AND ($since IS NULL OR segmented_at AT TIME ZONE 'UTC' > $since)
+            """, {'since': watermark}).fetchall()
+        finally:
+            warehouse.close()
+        
+        print(f"Extracted {len(segments)} changed segments from warehouse (since {watermark or 'beginning'})")
+        
+        if segments:
+            # Upsert segments
+            execute_values(
+                cursor,
+                """
+                INSERT INTO crm_user_segments 
+                (user_id, segment, engagement_score, lifetime_revenue, 
+                 lifetime_conversions, primary_platform, primary_country,
+                 first_seen_at, last_seen_at, source_segmented_at, synced_at)
+                VALUES %s
+                ON CONFLICT (user_id) DO UPDATE SET
+                    segment = EXCLUDED.segment,
+                    engagement_score = EXCLUDED.engagement_score,
+                    lifetime_revenue = EXCLUDED.lifetime_revenue,
+                    lifetime_conversions = EXCLUDED.lifetime_conversions,
+                    source_segmented_at = EXCLUDED.source_segmented_at,
+                    synced_at = CURRENT_TIMESTAMP
+                """,
+                [(*row, datetime.utcnow()) for row in segments],
+                page_size=1000,
+            )
+            conn.commit()
         
+        cursor.close()
         print(f"Synced {len(segments)} segments to CRM")
         
     except Exception as e:
-        print(f"Warning: Could not sync to Postgres: {e}")
+        print(f"Warning: Could not sync segments: {e}")
+        segments = []
+    finally:
+        conn.close()
     
     return {'segments_synced': len(segments)}
 
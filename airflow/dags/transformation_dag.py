@@ -3,13 +3,45 @@ SearchFlow Transformation DAG
 
 Runs dbt transformations to build staging, intermediate, and mart models.
 Runs hourly.
+
+All marts are built by a single `dbt run --threads N --select marts`; dbt
+runs the independent ones (funnel fact and rollups, dim_users →
+mart_user_segments, mart_recommendations) concurrently on its threads.
+DuckDB allows one writer process, so separate Airflow tasks per mart would
+only queue behind each other and each pay dbt's startup and parse cost.
+On adapters with concurrent writers (DBT_CONCURRENT_WRITERS=true, e.g.
+Snowflake), the marts are split into parallel Airflow branches instead:
+
+    staging → intermediate → fct_search_funnel
+                           → funnel rollups (tag:rollups)
+                           → dim_users → mart_user_segments
+            → mart_recommendations
+
+`dbt deps` and `dbt docs generate` only run when their inputs changed.
+
+After staging, materialize_churn_features refreshes the online churn
+features (ml.churn_features and the API's feature store artifact) from the
+staging events, alongside the intermediate and mart builds.
+
+Smart scheduling: `dbt source freshness` reports the ingestion watermark
+(max ingested_at) of every raw source. Only models downstream of sources
+that advanced since the last successful run (plus `state:modified+` models)
+are rebuilt. Models whose output also changes with the clock alone
+(tag:time-driven: mart_user_segments' recency pass, fct_search_funnel's
+backfill window) run every hour, even when no source advanced.
 """
 
+import json
+import os
+import shutil
+import subprocess
 from datetime import datetime, timedelta
 
 from airflow import DAG
+from airflow.models import Variable
 from airflow.operators.bash import BashOperator
 from airflow.operators.empty import EmptyOperator
+from airflow.operators.python import PythonOperator
 
 
 default_args = {
@@ -24,6 +56,156 @@ default_args = {
 DBT_DIR = '/dbt'
 DBT_CMD = f'cd {DBT_DIR} && dbt'
 
+# Threads dbt uses to run independent models concurrently within one invocation
+DBT_THREADS = int(os.getenv('DBT_THREADS', '4'))
+
+# Pool bounding concurrent dbt processes against the warehouse.
+# DuckDB allows a single writer process, so the pool is created with one slot;
+# raise it (airflow pools set) when targeting Snowflake.
+DBT_POOL = os.getenv('DBT_POOL', 'dbt_warehouse')
+
+# Whether the warehouse accepts writes from several dbt processes at once.
+# Only then are the marts split into parallel Airflow branches.
+DBT_CONCURRENT_WRITERS = os.getenv('DBT_CONCURRENT_WRITERS', 'false').lower() == 'true'
+
+# ML engine checkout and the churn feature store artifact the API serves
+ML_ENGINE_DIR = os.getenv('ML_ENGINE_DIR', '/ml_engine')
+DUCKDB_PATH = os.getenv('DUCKDB_PATH', '/data/searchflow.duckdb')
+CHURN_FEATURES_PATH = os.getenv('CHURN_FEATURES_PATH', f'{ML_ENGINE_DIR}/models/churn_features')
+
+# Manifest of the last successful run, used for `state:modified` selection
+DBT_STATE_DIR = f'{DBT_DIR}/state'
+
+# Airflow Variable holding the source watermarks processed by the last successful run
+WATERMARKS_VARIABLE = 'searchflow_source_watermarks'
+
+# Selector for models whose code changed since the last successful run
+STATE_MODIFIED = 'state:modified+'
+
+# Selector for models that must be rebuilt every run because they depend on
+# the current time, not just on new source data
+TIME_DRIVEN = 'tag:time-driven'
+
+# Jinja: change selectors pushed by detect_changes, plus --state when needed
+CHANGES = "ti.xcom_pull(task_ids='detect_changes')"
+STATE_ARGS = (
+    f"{{% if '{STATE_MODIFIED}' in {CHANGES} %}}--state {DBT_STATE_DIR}{{% endif %}}"
+)
+
+
+def dbt_run(select: str) -> str:
+    """
+    Build a `dbt run` command for a selector using the configured threads.
+    
+    The selector is intersected with each changed source / modified-state
+    selector, so only models downstream of new data are rebuilt.
+    """
+    return (
+        f'{DBT_CMD} run --threads {DBT_THREADS} --select '
+        f"{{% for change in {CHANGES} %}}'{select},{{{{ change }}}}' {{% endfor %}}"
+        f'{STATE_ARGS}'
+    )
+
+
+def dbt_if_changed(command: str, inputs: str, stamp: str) -> str:
+    """
+    Build a command that runs `dbt <command>` only when its inputs changed.
+    
+    A fingerprint of the input files is written to `stamp` after each
+    successful run; an unchanged fingerprint skips the command.
+    """
+    return (
+        f'cd {DBT_DIR} && '
+        f'fingerprint=$(find {inputs} -type f 2>/dev/null | sort | xargs cat | sha1sum | cut -d" " -f1) && '
+        f'if [ "$fingerprint" = "$(cat {stamp} 2>/dev/null)" ]; then '
+        f'echo "No changes in {inputs}, skipping dbt {command}"; '
+        f'else dbt {command} && echo "$fingerprint" > {stamp}; fi'
+    )
+
+
+def state_modified_models() -> list:
+    """List models whose code changed since the manifest in DBT_STATE_DIR."""
+    result = subprocess.run(
+        [
+            'dbt', '--quiet', 'ls',
+            '--select', 'state:modified',
+            '--state', DBT_STATE_DIR,
+            '--resource-type', 'model',
+            '--output', 'name',
+        ],
+        cwd=DBT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.split()
+
+
+def detect_changed_sources(**context):
+    """
+    Decide which parts of the dbt graph need rebuilding.
+    
+    Compares each source's max_loaded_at from `dbt source freshness` with the
+    watermark recorded by the last successful run. Returns a list of dbt
+    selectors; TIME_DRIVEN is always included, so a run without new data
+    still refreshes the time-driven models.
+    """
+    ti = context['task_instance']
+    
+    with open(os.path.join(DBT_DIR, 'target', 'sources.json')) as f:
+        freshness = json.load(f)
+    
+    previous = Variable.get(WATERMARKS_VARIABLE, default_var={}, deserialize_json=True)
+    current = {}
+    changes = []
+    
+    for result in freshness.get('results', []):
+        unique_id = result['unique_id']
+        max_loaded_at = result.get('max_loaded_at')
+        if max_loaded_at is None:
+            # Freshness query failed: rebuild rather than silently skipping data
+            print(f"No watermark for {unique_id}: {result.get('error')}")
+        else:
+            current[unique_id] = max_loaded_at
+            if max_loaded_at == previous.get(unique_id):
+                continue
+        
+        # source.<project>.<source_name>.<table> → source:<source_name>.<table>+
+        _, _, source_name, table = unique_id.split('.')
+        changes.append(f'source:{source_name}.{table}+')
+    
+    if not os.path.exists(os.path.join(DBT_STATE_DIR, 'manifest.json')):
+        # First run (no state to compare against): build everything
+        changes = ['fqn:*']
+    else:
+        if state_modified_models():
+            changes.append(STATE_MODIFIED)
+        changes.append(TIME_DRIVEN)
+    
+    ti.xcom_push(key='watermarks', value=current)
+    
+    print(f"Source watermarks: {json.dumps(current, indent=2)}")
+    print(f"Selected for rebuild: {changes}")
+    
+    return changes
+
+
+def record_run_state(**context):
+    """Persist source watermarks and the manifest after a successful run."""
+    ti = context['task_instance']
+    
+    watermarks = ti.xcom_pull(key='watermarks', task_ids='detect_changes') or {}
+    previous = Variable.get(WATERMARKS_VARIABLE, default_var={}, deserialize_json=True)
+    Variable.set(WATERMARKS_VARIABLE, {**previous, **watermarks}, serialize_json=True)
+    
+    os.makedirs(DBT_STATE_DIR, exist_ok=True)
+    shutil.copy(
+        os.path.join(DBT_DIR, 'target', 'manifest.json'),
+        os.path.join(DBT_STATE_DIR, 'manifest.json'),
+    )
+    
+    print(f"Recorded watermarks for {len(watermarks)} sources")
+
 
 with DAG(
     'searchflow_transformation',
@@ -38,52 +220,148 @@ with DAG(
     
     start = EmptyOperator(task_id='start')
     
-    # Install dbt packages (deps)
+    # Install dbt packages (deps), only when the package spec or lock changed
     dbt_deps = BashOperator(
         task_id='dbt_deps',
-        bash_command=f'{DBT_CMD} deps',
+        bash_command=dbt_if_changed(
+            'deps',
+            inputs='packages.yml package-lock.yml',
+            stamp='dbt_packages/.deps_fingerprint',
+        ),
+    )
+    
+    # Source watermarks: max ingested_at per raw table (stale sources only warn here)
+    dbt_source_freshness = BashOperator(
+        task_id='dbt_source_freshness',
+        bash_command=(
+            f'cd {DBT_DIR} && rm -f target/sources.json && '
+            f'(dbt source freshness || test -f target/sources.json)'
+        ),
+        pool=DBT_POOL,
+    )
+    
+    # Compare watermarks with the last successful run to select what to rebuild
+    detect_changes = PythonOperator(
+        task_id='detect_changes',
+        python_callable=detect_changed_sources,
     )
     
     # Run staging models
     dbt_run_staging = BashOperator(
         task_id='dbt_run_staging',
-        bash_command=f'{DBT_CMD} run --select staging',
+        bash_command=dbt_run('staging'),
+        pool=DBT_POOL,
+    )
+    
+    # Online churn features from the fresh staging events. Writes
+    # ml.churn_features, so it shares the warehouse writer pool.
+    materialize_churn_features = BashOperator(
+        task_id='materialize_churn_features',
+        bash_command=(
+            f'cd {ML_ENGINE_DIR} && python -m src.training.materialize_churn_features '
+            f'--duckdb-path {DUCKDB_PATH} --store-path {CHURN_FEATURES_PATH}'
+        ),
+        pool=DBT_POOL,
     )
     
     # Run intermediate models
     dbt_run_intermediate = BashOperator(
         task_id='dbt_run_intermediate',
-        bash_command=f'{DBT_CMD} run --select intermediate',
+        bash_command=dbt_run('intermediate'),
+        pool=DBT_POOL,
     )
     
-    # Run mart models
-    dbt_run_marts = BashOperator(
-        task_id='dbt_run_marts',
-        bash_command=f'{DBT_CMD} run --select marts',
-    )
+    if DBT_CONCURRENT_WRITERS:
+        # Analytics branch: funnel fact table
+        dbt_run_fct_search_funnel = BashOperator(
+            task_id='dbt_run_fct_search_funnel',
+            bash_command=dbt_run('fct_search_funnel'),
+            pool=DBT_POOL,
+        )
+        
+        # Analytics branch: funnel rollup cubes (hourly → daily)
+        dbt_run_funnel_rollups = BashOperator(
+            task_id='dbt_run_funnel_rollups',
+            bash_command=dbt_run('tag:rollups'),
+            pool=DBT_POOL,
+        )
+        
+        # Analytics → marketing branch: user dimension feeds segmentation
+        dbt_run_dim_users = BashOperator(
+            task_id='dbt_run_dim_users',
+            bash_command=dbt_run('dim_users'),
+            pool=DBT_POOL,
+        )
+        
+        dbt_run_mart_user_segments = BashOperator(
+            task_id='dbt_run_mart_user_segments',
+            bash_command=dbt_run('mart_user_segments'),
+            pool=DBT_POOL,
+        )
+        
+        # Marketing branch: recommendations only depend on staging
+        dbt_run_mart_recommendations = BashOperator(
+            task_id='dbt_run_mart_recommendations',
+            bash_command=dbt_run('mart_recommendations'),
+            pool=DBT_POOL,
+        )
+        
+        dbt_run_intermediate >> dbt_run_fct_search_funnel
+        dbt_run_intermediate >> dbt_run_funnel_rollups
+        dbt_run_intermediate >> dbt_run_dim_users >> dbt_run_mart_user_segments
+        dbt_run_staging >> dbt_run_mart_recommendations
+        
+        mart_tasks = [
+            dbt_run_fct_search_funnel,
+            dbt_run_funnel_rollups,
+            dbt_run_mart_user_segments,
+            dbt_run_mart_recommendations,
+        ]
+    else:
+        # All marts in one invocation; dbt's threads run independent models concurrently
+        dbt_run_marts = BashOperator(
+            task_id='dbt_run_marts',
+            bash_command=dbt_run('marts'),
+            pool=DBT_POOL,
+        )
+        
+        dbt_run_intermediate >> dbt_run_marts
+        
+        mart_tasks = [dbt_run_marts]
     
-    # Run all tests
+    # Run tests for everything that was rebuilt
     dbt_test = BashOperator(
         task_id='dbt_test',
-        bash_command=f'{DBT_CMD} test',
+        bash_command=(
+            f'{DBT_CMD} test --threads {DBT_THREADS} --select '
+            f"{{% for change in {CHANGES} %}}'{{{{ change }}}}' {{% endfor %}}"
+            f'{STATE_ARGS}'
+        ),
+        pool=DBT_POOL,
+    )
+    
+    # Advance watermarks and state only after a successful build + test
+    record_state = PythonOperator(
+        task_id='record_state',
+        python_callable=record_run_state,
     )
     
-    # Generate documentation (optional, for debugging)
+    # Generate documentation, only when models or project config changed
     dbt_docs = BashOperator(
         task_id='dbt_docs_generate',
-        bash_command=f'{DBT_CMD} docs generate',
+        bash_command=dbt_if_changed(
+            'docs generate',
+            inputs='models macros dbt_project.yml',
+            stamp='target/.docs_fingerprint',
+        ),
+        pool=DBT_POOL,
     )
     
     end = EmptyOperator(task_id='end')
     
-    # Linear pipeline: deps → staging → intermediate → marts → test → docs
-    (
-        start 
-        >> dbt_deps 
-        >> dbt_run_staging 
-        >> dbt_run_intermediate 
-        >> dbt_run_marts 
-        >> dbt_test 
-        >> dbt_docs 
-        >> end
-    )
+    # deps → freshness → detect → staging → intermediate → marts → test → record state → docs
+    start >> dbt_deps >> dbt_source_freshness >> detect_changes >> dbt_run_staging
+    dbt_run_staging >> dbt_run_intermediate
+    dbt_run_staging >> materialize_churn_features >> end
+    
+    mart_tasks >> dbt_test >> record_state >> dbt_docs >> end
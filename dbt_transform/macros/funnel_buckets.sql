@@ -0,0 +1,40 @@
+{#
+    Time buckets an incremental funnel model must rebuild.
+
+    A session counts in the bucket of its session_start, and late or replayed
+    events can move that start into another hour or day. int_search_sessions
+    keeps the range of every session_start a session has been written with
+    (earliest_session_start .. latest_session_start), so the buckets to rebuild
+    are all buckets in that range for each session ingested since the model's
+    high-water mark (minus `session_lookback_hours`): the bucket the session
+    is in now and every bucket it was counted in before.
+
+    funnel_rebuild_buckets returns a subquery of bucket values (funnel_hour
+    timestamps or funnel_date dates). delete_funnel_buckets is a pre-hook that
+    deletes them first: delete+insert only replaces buckets present in the new
+    result, so a bucket whose only session moved away would keep its stale row.
+#}
+
+{% macro funnel_rebuild_buckets(grain) %}
+    SELECT DISTINCT CAST(bucket AS {{ 'TIMESTAMP' if grain == 'hour' else 'DATE' }})
+    FROM (
+        SELECT UNNEST(generate_series(
+            DATE_TRUNC('{{ grain }}', earliest_session_start),
+            DATE_TRUNC('{{ grain }}', latest_session_start),
+            INTERVAL 1 {{ grain }}
+        )) AS bucket
+        FROM {{ ref('int_search_sessions') }}
+        WHERE last_ingested_at > (
+            SELECT COALESCE(MAX(last_ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }}
+        ) - INTERVAL '{{ var("session_lookback_hours") }} hours'
+    )
+{% endmacro %}
+
+
+{% macro delete_funnel_buckets(grain=none) %}
+    {%- set grain = grain or var('funnel_rollups')[model.name].grain -%}
+    {%- if is_incremental() -%}
+    DELETE FROM {{ this }}
+    WHERE {{ 'funnel_hour' if grain == 'hour' else 'funnel_date' }} IN ({{ funnel_rebuild_buckets(grain) }})
+    {%- endif -%}
+{% endmacro %}
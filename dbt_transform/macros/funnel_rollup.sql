@@ -0,0 +1,91 @@
+{#
+    Build a funnel rollup (aggregate cube) described in the `funnel_rollups` var.
+
+    Every rollup stores additive measures only (counts and sums), so any rollup
+    can be re-aggregated into a coarser one and rates/averages are derived at
+    query time as ratios of sums.
+
+    The spec is looked up by model name:
+      grain:       hour | day
+      dimensions:  list of dimension columns kept in the rollup
+      source:      int_search_sessions (session-level) or another rollup
+
+    Incremental runs replace only the time buckets (funnel_hour / funnel_date)
+    of sessions ingested since the last run, minus `session_lookback_hours`,
+    including the buckets those sessions were in before their start moved
+    (see funnel_rebuild_buckets). Every rollup model runs delete_funnel_buckets
+    as a pre-hook, so a bucket left without sessions is deleted.
+#}
+
+{% macro funnel_rollup() %}
+
+{%- set spec = var('funnel_rollups')[model.name] -%}
+{%- set time_column = 'funnel_hour' if spec.grain == 'hour' else 'funnel_date' -%}
+{%- set from_sessions = spec.source == 'int_search_sessions' -%}
+
+WITH source AS (
+    SELECT
+        {% if from_sessions -%}
+        DATE_TRUNC('hour', session_start) AS funnel_hour,
+        DATE(session_start) AS funnel_date,
+        {%- endif %}
+        *
+    FROM {{ ref(spec.source) }}
+),
+
+filtered AS (
+    SELECT * FROM source
+    {% if is_incremental() %}
+    WHERE {{ time_column }} IN ({{ funnel_rebuild_buckets(spec.grain) }})
+    {% endif %}
+)
+
+SELECT
+    {% if spec.grain == 'hour' -%}
+    funnel_hour,
+    {% endif -%}
+    funnel_date,
+    
+    -- Dimensions
+    {% for dimension in spec.dimensions -%}
+    {{ dimension }},
+    {% endfor %}
+    {% if from_sessions -%}
+    -- Additive measures from sessions
+    COUNT(*) AS total_sessions,
+    SUM(search_count) AS total_searches,
+    SUM(click_count) AS total_clicks,
+    SUM(conversion_count) AS total_conversions,
+    SUM(total_booking_value) AS total_revenue,
+    SUM(total_commission) AS total_commission,
+    SUM(session_duration_minutes) AS sum_session_duration_minutes,
+    SUM(avg_click_position) AS sum_avg_click_position,
+    SUM(CASE WHEN click_count > 0 THEN 1 ELSE 0 END) AS clicked_sessions,
+    SUM(unique_queries) AS sum_unique_queries,
+    SUM(CASE WHEN session_outcome = 'converted' THEN 1 ELSE 0 END) AS converted_sessions,
+    SUM(CASE WHEN session_outcome = 'engaged' THEN 1 ELSE 0 END) AS engaged_sessions,
+    SUM(CASE WHEN session_outcome = 'bounced' THEN 1 ELSE 0 END) AS bounced_sessions,
+    {%- else -%}
+    -- Re-aggregated additive measures
+    SUM(total_sessions) AS total_sessions,
+    SUM(total_searches) AS total_searches,
+    SUM(total_clicks) AS total_clicks,
+    SUM(total_conversions) AS total_conversions,
+    SUM(total_revenue) AS total_revenue,
+    SUM(total_commission) AS total_commission,
+    SUM(sum_session_duration_minutes) AS sum_session_duration_minutes,
+    SUM(sum_avg_click_position) AS sum_avg_click_position,
+    SUM(clicked_sessions) AS clicked_sessions,
+    SUM(sum_unique_queries) AS sum_unique_queries,
+    SUM(converted_sessions) AS converted_sessions,
+    SUM(engaged_sessions) AS engaged_sessions,
+    SUM(bounced_sessions) AS bounced_sessions,
+    {%- endif %}
+    
+    -- Incremental high-water mark
+    MAX(last_ingested_at) AS last_ingested_at
+
+FROM filtered
+GROUP BY ALL
+
+{% endmacro %}
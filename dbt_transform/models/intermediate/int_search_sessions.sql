@@ -1,6 +1,8 @@
 {{
     config(
-        materialized='view'
+        materialized='incremental',
+        unique_key='session_id',
+        incremental_strategy='delete+insert'
     )
 }}
 
@@ -9,8 +11,63 @@
     
     A session groups user activity with a 30-minute timeout.
     This intermediate model provides the foundation for funnel analysis.
+    
+    Incremental strategy:
+    - Only sessions touched by events ingested after the high-water mark
+      (MAX(last_ingested_at) already in this table) are recomputed
+    - The high-water mark is pushed back by `session_lookback_hours` so that
+      late clicks/conversions from batches committed out of order are still picked up
+    - Touched sessions are re-aggregated in full and replaced on session_id
+    - earliest/latest_session_start keep the range of every session_start a
+      session has been written with, so time-bucketed consumers can rebuild
+      the buckets a session left when late or replayed events moved its start
+    
+    Rows are written sorted by day and user: time-bucketed consumers (funnel,
+    rollups) prune row groups by date, and per-user consumers (dim_users)
+    read each user's sessions from adjacent rows.
 */
 
+{% if is_incremental() %}
+
+{% set high_water_mark %}
+    (SELECT COALESCE(MAX(last_ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }})
+        - INTERVAL '{{ var("session_lookback_hours") }} hours'
+{% endset %}
+
+-- Sessions with at least one event ingested since the last run (minus lookback)
+WITH touched_sessions AS (
+    SELECT session_id FROM {{ ref('stg_search_events') }}
+    WHERE ingested_at > {{ high_water_mark }}
+    UNION
+    SELECT session_id FROM {{ ref('stg_click_events') }}
+    WHERE ingested_at > {{ high_water_mark }}
+    UNION
+    SELECT session_id FROM {{ ref('stg_conversion_events') }}
+    WHERE ingested_at > {{ high_water_mark }}
+),
+
+searches AS (
+    SELECT * FROM {{ ref('stg_search_events') }}
+    WHERE session_id IN (SELECT session_id FROM touched_sessions)
+),
+
+clicks AS (
+    SELECT * FROM {{ ref('stg_click_events') }}
+    WHERE session_id IN (SELECT session_id FROM touched_sessions)
+),
+
+conversions AS (
+    SELECT * FROM {{ ref('stg_conversion_events') }}
+    WHERE session_id IN (SELECT session_id FROM touched_sessions)
+),
+
+-- Stored versions of the touched sessions, replaced by this run
+stored_sessions AS (
+    SELECT session_id, earliest_session_start, latest_session_start
+    FROM {{ this }}
+    WHERE session_id IN (SELECT session_id FROM touched_sessions)
+),
+{% else %}
 WITH searches AS (
     SELECT * FROM {{ ref('stg_search_events') }}
 ),
@@ -22,6 +79,7 @@ clicks AS (
 conversions AS (
     SELECT * FROM {{ ref('stg_conversion_events') }}
 ),
+{% endif %}
 
 -- Get first search of each session for context
 first_search_per_session AS (
@@ -45,7 +103,8 @@ session_searches AS (
         COUNT(*) AS search_count,
         COUNT(DISTINCT search_query) AS unique_queries,
         -- Take the user_id if available (any non-null)
-        MAX(user_id) AS user_id
+        MAX(user_id) AS user_id,
+        MAX(ingested_at) AS last_ingested_at
     FROM searches
     GROUP BY session_id
 ),
@@ -56,7 +115,8 @@ session_clicks AS (
         session_id,
         COUNT(*) AS click_count,
         AVG(result_position) AS avg_click_position,
-        SUM(result_price) AS total_clicked_value
+        SUM(result_price) AS total_clicked_value,
+        MAX(ingested_at) AS last_ingested_at
     FROM clicks
     GROUP BY session_id
 ),
@@ -67,7 +127,8 @@ session_conversions AS (
         c.session_id,
         COUNT(*) AS conversion_count,
         SUM(c.booking_value) AS total_booking_value,
-        SUM(c.commission) AS total_commission
+        SUM(c.commission) AS total_commission,
+        MAX(c.ingested_at) AS last_ingested_at
     FROM conversions c
     GROUP BY c.session_id
 )
@@ -78,6 +139,15 @@ SELECT
     ss.session_start,
     ss.session_end,
     
+    -- Range of session_start across every version of this session
+    {% if is_incremental() %}
+    LEAST(ss.session_start, COALESCE(prev.earliest_session_start, ss.session_start)) AS earliest_session_start,
+    GREATEST(ss.session_start, COALESCE(prev.latest_session_start, ss.session_start)) AS latest_session_start,
+    {% else %}
+    ss.session_start AS earliest_session_start,
+    ss.session_start AS latest_session_start,
+    {% endif %}
+    
     -- Session duration in minutes
     EXTRACT(EPOCH FROM (ss.session_end - ss.session_start)) / 60 AS session_duration_minutes,
     
@@ -115,9 +185,24 @@ SELECT
         WHEN COALESCE(scv.conversion_count, 0) > 0 THEN 'converted'
         WHEN COALESCE(sc.click_count, 0) > 0 THEN 'engaged'
         ELSE 'bounced'
-    END AS session_outcome
+    END AS session_outcome,
+    
+    -- Latest ingestion time across all session events (incremental high-water mark)
+    GREATEST(
+        ss.last_ingested_at,
+        COALESCE(sc.last_ingested_at, ss.last_ingested_at),
+        COALESCE(scv.last_ingested_at, ss.last_ingested_at)
+    ) AS last_ingested_at
 
 FROM session_searches ss
 LEFT JOIN first_search_per_session fs ON ss.session_id = fs.session_id
 LEFT JOIN session_clicks sc ON ss.session_id = sc.session_id
 LEFT JOIN session_conversions scv ON ss.session_id = scv.session_id
+{% if is_incremental() %}
+LEFT JOIN stored_sessions prev ON ss.session_id = prev.session_id
+{% endif %}
+
+-- Physical layout: clustered by day, then user. Sorted on the key its readers
+-- group by (dim_users, int_user_attribute_counts), not on session_id, which
+-- this model only groups by internally.
+ORDER BY DATE_TRUNC('day', ss.session_start), ss.user_id, ss.session_start
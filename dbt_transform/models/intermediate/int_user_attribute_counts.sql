@@ -0,0 +1,58 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='user_id',
+        incremental_strategy='delete+insert'
+    )
+}}
+
+/*
+    Per-user session counts for each categorical attribute value.
+    
+    One row per (user_id, attribute, attribute_value), built in a single
+    hash-aggregation pass over sessions. dim_users picks the most frequent
+    value per attribute (its primary_* columns) from these pre-counted pairs
+    instead of sorting all sessions.
+    
+    Incremental: all pairs of users with sessions updated since the last run
+    (minus `session_lookback_hours`) are recounted and replaced on user_id.
+*/
+
+WITH sessions AS (
+    SELECT
+        user_id,
+        session_start,
+        platform,
+        device_type,
+        geo_country,
+        last_ingested_at
+    FROM {{ ref('int_search_sessions') }}
+    WHERE user_id IS NOT NULL
+    {% if is_incremental() %}
+      AND user_id IN (
+        SELECT user_id FROM {{ ref('int_search_sessions') }}
+        WHERE last_ingested_at > (
+            SELECT COALESCE(MAX(last_ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }}
+        ) - INTERVAL '{{ var("session_lookback_hours") }} hours'
+      )
+    {% endif %}
+),
+
+attribute_values AS (
+    -- NULL values are dropped by UNPIVOT
+    UNPIVOT sessions
+    ON platform, device_type, geo_country
+    INTO
+        NAME attribute
+        VALUE attribute_value
+)
+
+SELECT
+    user_id,
+    attribute,
+    attribute_value,
+    COUNT(*) AS session_count,
+    MAX(session_start) AS last_session_at,
+    MAX(last_ingested_at) AS last_ingested_at
+FROM attribute_values
+GROUP BY user_id, attribute, attribute_value
@@ -1,6 +1,8 @@
 {{
     config(
-        materialized='view'
+        materialized='incremental',
+        unique_key='search_event_id',
+        incremental_strategy='delete+insert'
     )
 }}
 
@@ -12,8 +14,77 @@
     - Funnel analysis (where users drop off)
     - Time-to-conversion analysis
     - Search quality evaluation
+    
+    Attribution window: clicks and conversions are matched to a search only
+    within the same session and within `conversion_window_hours` after the
+    search, which bounds the join search space.
+    
+    Incremental strategy:
+    - Sessions with events ingested since the last run (minus
+      `session_lookback_hours`) are touched
+    - Within a touched session, only journeys whose window is still open at
+      the session's earliest new event are rebuilt; new events past a
+      search's window cannot change its journey
+    - Clicks/conversions are read only for those sessions and time range,
+      and rebuilt journeys replace their rows on search_event_id
 */
 
+{% set attribution_window %}INTERVAL '{{ var("conversion_window_hours") }} hours'{% endset %}
+
+{% if is_incremental() %}
+
+{% set high_water_mark %}
+    (SELECT COALESCE(MAX(last_ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }})
+        - INTERVAL '{{ var("session_lookback_hours") }} hours'
+{% endset %}
+
+-- Earliest newly ingested event per touched session
+WITH new_events AS (
+    SELECT session_id, event_timestamp FROM {{ ref('stg_search_events') }}
+    WHERE ingested_at > {{ high_water_mark }}
+    UNION ALL
+    SELECT session_id, event_timestamp FROM {{ ref('stg_click_events') }}
+    WHERE ingested_at > {{ high_water_mark }}
+    UNION ALL
+    SELECT session_id, event_timestamp FROM {{ ref('stg_conversion_events') }}
+    WHERE ingested_at > {{ high_water_mark }}
+),
+
+touched_sessions AS (
+    SELECT session_id, MIN(event_timestamp) AS first_new_event_at
+    FROM new_events
+    GROUP BY session_id
+),
+
+-- Searches whose attribution window is still open for the new events
+searches AS (
+    SELECT s.*
+    FROM {{ ref('stg_search_events') }} s
+    INNER JOIN touched_sessions t ON s.session_id = t.session_id
+    WHERE s.event_timestamp + {{ attribution_window }} >= t.first_new_event_at
+),
+
+search_bounds AS (
+    SELECT
+        MIN(event_timestamp) AS window_start,
+        MAX(event_timestamp) + {{ attribution_window }} AS window_end
+    FROM searches
+),
+
+clicks AS (
+    SELECT * FROM {{ ref('stg_click_events') }}
+    WHERE session_id IN (SELECT session_id FROM searches)
+      AND event_timestamp BETWEEN (SELECT window_start FROM search_bounds)
+                              AND (SELECT window_end FROM search_bounds)
+),
+
+conversions AS (
+    SELECT * FROM {{ ref('stg_conversion_events') }}
+    WHERE session_id IN (SELECT session_id FROM searches)
+      AND event_timestamp BETWEEN (SELECT window_start FROM search_bounds)
+                              AND (SELECT window_end FROM search_bounds)
+),
+{% else %}
 WITH searches AS (
     SELECT * FROM {{ ref('stg_search_events') }}
 ),
@@ -25,6 +96,7 @@ clicks AS (
 conversions AS (
     SELECT * FROM {{ ref('stg_conversion_events') }}
 ),
+{% endif %}
 
 -- Join search -> click -> conversion
 journeys AS (
@@ -75,11 +147,26 @@ journeys AS (
             WHEN cv.event_timestamp IS NOT NULL 
             THEN EXTRACT(EPOCH FROM (cv.event_timestamp - s.event_timestamp))
             ELSE NULL 
-        END AS search_to_conversion_seconds
+        END AS search_to_conversion_seconds,
+        
+        -- Latest ingestion time across the journey (incremental high-water mark)
+        GREATEST(
+            s.ingested_at,
+            COALESCE(c.ingested_at, s.ingested_at),
+            COALESCE(cv.ingested_at, s.ingested_at)
+        ) AS last_ingested_at
         
     FROM searches s
-    LEFT JOIN clicks c ON s.event_id = c.search_event_id
-    LEFT JOIN conversions cv ON c.event_id = cv.click_event_id
+    LEFT JOIN clicks c
+        ON s.event_id = c.search_event_id
+        AND s.session_id = c.session_id
+        AND c.event_timestamp BETWEEN s.event_timestamp
+                                  AND s.event_timestamp + {{ attribution_window }}
+    LEFT JOIN conversions cv
+        ON c.event_id = cv.click_event_id
+        AND c.session_id = cv.session_id
+        AND cv.event_timestamp BETWEEN s.event_timestamp
+                                   AND s.event_timestamp + {{ attribution_window }}
 )
 
 SELECT
@@ -131,6 +218,11 @@ SELECT
     
     -- Attribution: revenue attributed to this search
     COALESCE(booking_value, 0) AS attributed_revenue,
-    COALESCE(commission, 0) AS attributed_commission
+    COALESCE(commission, 0) AS attributed_commission,
+    
+    last_ingested_at
 
 FROM journeys
+
+-- Physical layout: clustered by day, then session, then time
+ORDER BY DATE_TRUNC('day', search_timestamp), session_id, search_timestamp
@@ -1,6 +1,8 @@
 {{
     config(
-        materialized='table'
+        materialized='incremental',
+        unique_key='user_id',
+        incremental_strategy='delete+insert'
     )
 }}
 
@@ -12,11 +14,25 @@
     - Lifetime value analysis
     - Cohort analysis
     - User-level reporting
+    
+    Incremental strategy:
+    - Only users with sessions updated since the last run (minus
+      `session_lookback_hours`) are recomputed, over all of their sessions
+    - Only time-independent facts are stored; recency such as days since
+      last seen is derived at read time from first_seen_at / last_seen_at
 */
 
 WITH sessions AS (
     SELECT * FROM {{ ref('int_search_sessions') }}
     WHERE user_id IS NOT NULL
+    {% if is_incremental() %}
+      AND user_id IN (
+        SELECT user_id FROM {{ ref('int_search_sessions') }}
+        WHERE last_ingested_at > (
+            SELECT COALESCE(MAX(last_ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }}
+        ) - INTERVAL '{{ var("session_lookback_hours") }} hours'
+      )
+    {% endif %}
 ),
 
 user_metrics AS (
@@ -37,19 +53,38 @@ user_metrics AS (
         SUM(total_booking_value) AS lifetime_revenue,
         SUM(total_commission) AS lifetime_commission,
         
-        -- Most common values (simplified mode calculation)
-        -- In production, use a proper mode function
-        MAX(platform) AS primary_platform,
-        MAX(device_type) AS primary_device,
-        MAX(geo_country) AS primary_country,
-        
         -- Engagement averages
         AVG(session_duration_minutes) AS avg_session_duration,
         AVG(session_ctr) AS avg_ctr,
-        AVG(session_conversion_rate) AS avg_conversion_rate
+        AVG(session_conversion_rate) AS avg_conversion_rate,
+        
+        -- Incremental high-water mark
+        MAX(last_ingested_at) AS last_ingested_at
         
     FROM sessions
     GROUP BY user_id
+),
+
+primary_values AS (
+    -- Most frequent value per attribute from pre-counted (user, value) pairs;
+    -- ties go to the most recently used value
+    SELECT *
+    FROM {{ ref('int_user_attribute_counts') }}
+    WHERE user_id IN (SELECT user_id FROM user_metrics)
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY user_id, attribute
+        ORDER BY session_count DESC, last_session_at DESC, attribute_value
+    ) = 1
+),
+
+user_attributes AS (
+    SELECT
+        user_id,
+        MAX(CASE WHEN attribute = 'platform' THEN attribute_value END) AS primary_platform,
+        MAX(CASE WHEN attribute = 'device_type' THEN attribute_value END) AS primary_device,
+        MAX(CASE WHEN attribute = 'geo_country' THEN attribute_value END) AS primary_country
+    FROM primary_values
+    GROUP BY user_id
 )
 
 SELECT
@@ -57,12 +92,6 @@ SELECT
     first_seen_at,
     last_seen_at,
     
-    -- Days since last activity
-    EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - last_seen_at)) / 86400 AS days_since_last_seen,
-    
-    -- Account age in days
-    EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - first_seen_at)) / 86400 AS account_age_days,
-    
     -- Activity metrics
     total_sessions,
     lifetime_searches,
@@ -107,6 +136,9 @@ SELECT
         WHEN lifetime_conversions > 0 
         THEN lifetime_revenue / lifetime_conversions 
         ELSE 0 
-    END AS avg_order_value
+    END AS avg_order_value,
+    
+    last_ingested_at
 
 FROM user_metrics
+LEFT JOIN user_attributes USING (user_id)
@@ -1,6 +1,10 @@
 {{
     config(
-        materialized='table'
+        materialized='incremental',
+        unique_key='funnel_date',
+        incremental_strategy='delete+insert',
+        pre_hook="{{ delete_funnel_buckets('day') }}",
+        tags=['time-driven']
     )
 }}
 
@@ -12,10 +16,22 @@
     - Click-through rates by segment
     - Conversion rates and revenue
     - Channel performance
+    
+    Incremental strategy:
+    - Each funnel_date is a partition that is deleted and re-inserted as a whole
+    - Only dates containing sessions ingested since the last run (minus
+      `session_lookback_hours`) are recomputed, so late sessions land in their own day
+    - Those sessions' previous dates are recomputed too (see funnel_rebuild_buckets),
+      so a session whose start moved to another day is not counted twice
+    - The trailing `funnel_backfill_days` are always recomputed as a safety net
 */
 
 WITH sessions AS (
     SELECT * FROM {{ ref('int_search_sessions') }}
+    {% if is_incremental() %}
+    WHERE DATE(session_start) IN ({{ funnel_rebuild_buckets('day') }})
+    OR session_start >= CURRENT_DATE - INTERVAL '{{ var("funnel_backfill_days") }} days'
+    {% endif %}
 )
 
 SELECT
@@ -79,7 +95,10 @@ SELECT
     -- Outcome distribution
     SUM(CASE WHEN session_outcome = 'converted' THEN 1 ELSE 0 END) AS converted_sessions,
     SUM(CASE WHEN session_outcome = 'engaged' THEN 1 ELSE 0 END) AS engaged_sessions,
-    SUM(CASE WHEN session_outcome = 'bounced' THEN 1 ELSE 0 END) AS bounced_sessions
+    SUM(CASE WHEN session_outcome = 'bounced' THEN 1 ELSE 0 END) AS bounced_sessions,
+    
+    -- Incremental high-water mark
+    MAX(last_ingested_at) AS last_ingested_at
 
 FROM sessions
 GROUP BY 1, 2, 3, 4, 5, 6
@@ -0,0 +1,23 @@
+{{
+    config(
+        materialized='table'
+    )
+}}
+
+/*
+    Catalog of funnel rollups.
+    
+    Read by the rollup query router (scripts/query_rollups.py) to send a
+    dimension/time-range query to the coarsest rollup that can answer it.
+*/
+
+{% for name, spec in var('funnel_rollups').items() %}
+SELECT
+    '{{ name }}' AS rollup_name,
+    '{{ spec.grain }}' AS time_grain,
+    '{{ spec.dimensions | join(",") }}' AS dimensions,
+    {{ spec.dimensions | length }} AS dimension_count,
+    (SELECT COUNT(*) FROM {{ ref(name) }}) AS row_count,
+    CURRENT_TIMESTAMP AS refreshed_at
+{% if not loop.last %}UNION ALL{% endif %}
+{% endfor %}
@@ -0,0 +1,14 @@
+{{
+    config(
+        unique_key='funnel_date',
+        pre_hook="{{ delete_funnel_buckets() }}"
+    )
+}}
+
+/*
+    Daily funnel cube by platform and device type.
+    
+    Grain, dimensions and source are defined in the `funnel_rollups` var.
+*/
+
+{{ funnel_rollup() }}
@@ -0,0 +1,14 @@
+{{
+    config(
+        unique_key='funnel_hour',
+        pre_hook="{{ delete_funnel_buckets() }}"
+    )
+}}
+
+/*
+    Hourly funnel cube across all five dimensions (finest rollup).
+    
+    Grain, dimensions and source are defined in the `funnel_rollups` var.
+*/
+
+{{ funnel_rollup() }}
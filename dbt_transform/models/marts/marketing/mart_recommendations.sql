@@ -12,6 +12,11 @@
     
     Logic: "Users who clicked/booked destinations similar to yours also liked these destinations"
     
+    Implemented as item-item collaborative filtering over destination co-occurrence,
+    which costs O(users x destinations) instead of a user-user self-join:
+    - Each user's history is capped at `reco_max_user_destinations` strongest signals
+    - Each destination keeps only its top `reco_neighbors_per_destination` co-occurring destinations
+    
     Used by the search service for:
     - Personalized result ranking
     - "Recommended for you" sections
@@ -31,7 +36,8 @@ WITH user_destinations AS (
                 WHEN cv.event_id IS NOT NULL THEN 1.0 
                 ELSE 0.5 
             END
-        ) AS signal_strength
+        ) AS signal_strength,
+        MAX(c.event_timestamp) AS last_interaction_at
     FROM {{ ref('stg_click_events') }} c
     LEFT JOIN {{ ref('stg_conversion_events') }} cv 
         ON c.event_id = cv.click_event_id
@@ -40,39 +46,73 @@ WITH user_destinations AS (
     GROUP BY c.user_id, c.result_destination
 ),
 
--- Find similar users (share at least 2 destinations of interest)
-user_similarity AS (
+-- Cap each user's history so heavy users don't blow up the pair counts
+capped_user_destinations AS (
+    SELECT
+        user_id,
+        destination,
+        signal_strength
+    FROM user_destinations
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY user_id
+        ORDER BY signal_strength DESC, last_interaction_at DESC
+    ) <= {{ var('reco_max_user_destinations') }}
+),
+
+-- Item-item co-occurrence: destination pairs liked by the same user
+destination_cooccurrence AS (
+    SELECT
+        a.destination AS source_destination,
+        b.destination AS target_destination,
+        SUM(a.signal_strength * b.signal_strength) AS cooccurrence_score,
+        COUNT(*) AS cooccurring_users
+    FROM capped_user_destinations a
+    INNER JOIN capped_user_destinations b 
+        ON a.user_id = b.user_id 
+        AND a.destination != b.destination
+    GROUP BY a.destination, b.destination
+),
+
+-- Keep only the strongest neighbors of each destination
+destination_neighbors AS (
+    SELECT
+        source_destination,
+        target_destination,
+        cooccurrence_score,
+        cooccurring_users
+    FROM destination_cooccurrence
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY source_destination
+        ORDER BY cooccurrence_score DESC, target_destination
+    ) <= {{ var('reco_neighbors_per_destination') }}
+),
+
+-- Score neighbor destinations against each user's history
+candidate_scores AS (
     SELECT
-        a.user_id AS user_a,
-        b.user_id AS user_b,
-        COUNT(DISTINCT a.destination) AS shared_destinations,
-        SUM(a.signal_strength * b.signal_strength) AS similarity_score
-    FROM user_destinations a
-    INNER JOIN user_destinations b 
-        ON a.destination = b.destination 
-        AND a.user_id != b.user_id
-    GROUP BY a.user_id, b.user_id
-    HAVING COUNT(DISTINCT a.destination) >= 2
+        ud.user_id,
+        dn.target_destination AS destination,
+        SUM(ud.signal_strength * dn.cooccurrence_score) AS raw_score,
+        -- Users who liked both this destination and one of the user's destinations
+        MAX(dn.cooccurring_users) AS supporting_users
+    FROM capped_user_destinations ud
+    INNER JOIN destination_neighbors dn 
+        ON ud.destination = dn.source_destination
+    GROUP BY ud.user_id, dn.target_destination
 ),
 
--- Get destinations that similar users liked but target user hasn't seen
+-- Exclude destinations user has already interacted with (hash anti-join)
 candidate_recommendations AS (
     SELECT
-        us.user_a AS user_id,
-        ud.destination,
-        SUM(us.similarity_score * ud.signal_strength) AS raw_score,
-        COUNT(DISTINCT us.user_b) AS supporting_users
-    FROM user_similarity us
-    INNER JOIN user_destinations ud 
-        ON us.user_b = ud.user_id
-    -- Exclude destinations user has already interacted with
-    WHERE NOT EXISTS (
-        SELECT 1 
-        FROM user_destinations existing
-        WHERE existing.user_id = us.user_a 
-          AND existing.destination = ud.destination
-    )
-    GROUP BY us.user_a, ud.destination
+        cs.user_id,
+        cs.destination,
+        cs.raw_score,
+        cs.supporting_users
+    FROM candidate_scores cs
+    LEFT JOIN user_destinations existing 
+        ON existing.user_id = cs.user_id 
+        AND existing.destination = cs.destination
+    WHERE existing.user_id IS NULL
 ),
 
 -- Normalize scores and rank
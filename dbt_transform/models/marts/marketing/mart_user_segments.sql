@@ -1,7 +1,9 @@
 {{
     config(
-        materialized='table',
-        tags=['reverse-etl']
+        materialized='incremental',
+        unique_key='user_id',
+        incremental_strategy='delete+insert',
+        tags=['reverse-etl', 'time-driven']
     )
 }}
 
@@ -16,11 +18,69 @@
     - abandoned_search: Searched in last 48h, no conversion
     - new_user: First seen in last 7 days
     - regular: Everyone else
+    
+    Incremental strategy:
+    - Users whose dim_users row was rebuilt since the last run are re-segmented
+    - A cheap time-based pass also re-segments users whose segment or
+      engagement score changes with time alone: those who crossed the 7-day
+      new-user, 7/14/30-day recency or 48h abandoned-search boundary between
+      the previous run and now
+    - Rewritten rows get a new segmented_at, so `segmented_at > <last sync>`
+      is the set of changed users for the reverse-ETL
 */
 
+{% if is_incremental() %}
+
+{% set previous_run %}
+    (SELECT MAX(segmented_at) FROM {{ this }})
+{% endset %}
+
+{% set high_water_mark %}
+    (SELECT COALESCE(MAX(last_ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }})
+        - INTERVAL '{{ var("session_lookback_hours") }} hours'
+{% endset %}
+
+-- Users whose 48h search/conversion window lost events since the previous run
+WITH expired_recent_activity AS (
+    SELECT user_id FROM {{ ref('stg_search_events') }}
+    WHERE event_timestamp > {{ previous_run }} - INTERVAL '48 hours'
+      AND event_timestamp <= CURRENT_TIMESTAMP - INTERVAL '48 hours'
+    UNION
+    SELECT user_id FROM {{ ref('stg_conversion_events') }}
+    WHERE event_timestamp > {{ previous_run }} - INTERVAL '48 hours'
+      AND event_timestamp <= CURRENT_TIMESTAMP - INTERVAL '48 hours'
+),
+
+users AS (
+    SELECT * FROM {{ ref('dim_users') }}
+    -- Activity: rebuilt in dim_users since the last run
+    WHERE last_ingested_at > {{ high_water_mark }}
+    -- Time: new-user window (7 days after first_seen_at) closed
+       OR (first_seen_at > {{ previous_run }} - INTERVAL '7 days'
+           AND first_seen_at <= CURRENT_TIMESTAMP - INTERVAL '7 days')
+    -- Time: recency bands of the engagement score and the at-risk threshold
+    {% for days in [7, 14, 30] %}
+       OR (last_seen_at > {{ previous_run }} - INTERVAL '{{ days }} days'
+           AND last_seen_at <= CURRENT_TIMESTAMP - INTERVAL '{{ days }} days')
+    {% endfor %}
+       OR user_id IN (SELECT user_id FROM expired_recent_activity)
+),
+{% else %}
 WITH users AS (
     SELECT * FROM {{ ref('dim_users') }}
 ),
+{% endif %}
+
+-- Recency as of segmentation time (dim_users only stores timestamps). Not
+-- persisted: it goes stale between runs; readers derive it from last_seen_at
+-- and first_seen_at
+user_recency AS (
+    SELECT
+        *,
+        EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - last_seen_at)) / 86400 AS days_since_last_seen,
+        EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - first_seen_at)) / 86400 AS account_age_days
+    FROM users
+),
 
 -- Find users with recent searches (last 48h)
 recent_searches AS (
@@ -48,8 +108,7 @@ segmented AS (
         u.lifetime_searches,
         u.primary_platform,
         u.primary_country,
-        u.days_since_last_seen,
-        u.account_age_days,
+        u.last_ingested_at,
         
         -- Segment assignment (priority order)
         CASE
@@ -99,7 +158,7 @@ segmented AS (
         
         CURRENT_TIMESTAMP AS segmented_at
         
-    FROM users u
+    FROM user_recency u
     LEFT JOIN recent_searches rs ON u.user_id = rs.user_id
     LEFT JOIN recent_conversions rc ON u.user_id = rc.user_id
 )
@@ -113,9 +172,8 @@ SELECT
     lifetime_searches,
     first_seen_at,
     last_seen_at,
-    days_since_last_seen,
-    account_age_days,
     primary_platform,
     primary_country,
-    segmented_at
+    segmented_at,
+    last_ingested_at
 FROM segmented
@@ -1,6 +1,8 @@
 {{
     config(
-        materialized='view'
+        materialized='incremental',
+        unique_key='event_id',
+        incremental_strategy='delete+insert'
     )
 }}
 
@@ -11,10 +13,18 @@
     - Extract fields from JSON payload
     - Type casting
     - Deduplication by event_id
+    
+    Incremental on event_id and sorted by day/session/time, like
+    stg_search_events.
 */
 
 WITH source AS (
     SELECT * FROM {{ source('raw', 'conversion_events') }}
+    {% if is_incremental() %}
+    WHERE ingested_at > (
+        SELECT COALESCE(MAX(ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }}
+    ) - INTERVAL '{{ var("session_lookback_hours") }} hours'
+    {% endif %}
 ),
 
 extracted AS (
@@ -64,3 +74,6 @@ SELECT
     ingested_at
 FROM extracted
 WHERE row_num = 1
+
+-- Physical layout: clustered by day, then session, then time
+ORDER BY DATE_TRUNC('day', event_timestamp), session_id, event_timestamp
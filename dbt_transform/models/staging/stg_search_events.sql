@@ -1,6 +1,8 @@
 {{
     config(
-        materialized='view'
+        materialized='incremental',
+        unique_key='event_id',
+        incremental_strategy='delete+insert'
     )
 }}
 
@@ -12,10 +14,21 @@
     - Type casting
     - Deduplication by event_id
     - Lowercase and trim search queries
+    
+    Materialized incrementally so each raw payload is parsed once: rows
+    ingested since the last run (minus `session_lookback_hours`) are replaced
+    on event_id. Rows are written sorted by day, session and time, giving
+    row-group pruning on time ranges and adjacent rows per session for the
+    session and journey models.
 */
 
 WITH source AS (
     SELECT * FROM {{ source('raw', 'search_events') }}
+    {% if is_incremental() %}
+    WHERE ingested_at > (
+        SELECT COALESCE(MAX(ingested_at), TIMESTAMP '1970-01-01') FROM {{ this }}
+    ) - INTERVAL '{{ var("session_lookback_hours") }} hours'
+    {% endif %}
 ),
 
 extracted AS (
@@ -79,3 +92,6 @@ SELECT
     ingested_at
 FROM extracted
 WHERE row_num = 1
+
+-- Physical layout: clustered by day, then session, then time
+ORDER BY DATE_TRUNC('day', event_timestamp), session_id, event_timestamp
@@ -40,6 +40,9 @@ MODEL_PATH = os.getenv("MODEL_PATH", "./models")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 1 hour
+CHURN_FEATURES_PATH = os.getenv("CHURN_FEATURES_PATH", os.path.join(MODEL_PATH, "churn_features"))
+FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", "100000"))
+FEATURE_MAX_STALENESS = float(os.getenv("FEATURE_MAX_STALENESS", "300"))  # 5 minutes
 
 # ============================================
 # Global State
@@ -53,6 +56,9 @@ models = {
 
 redis_client: Optional[redis.Redis] = None
 
+# Online churn features (src/models/feature_store.py)
+feature_store = None
+
 
 # ============================================
 # Lifespan Handler
@@ -89,7 +95,7 @@ async def lifespan(app: FastAPI):
 
 def load_models():
     """Load trained models from disk."""
-    global models
+    global models, feature_store
     
     # Load recommender
     recommender_path = os.path.join(MODEL_PATH, "recommendation")
@@ -120,6 +126,19 @@ def load_models():
             logger.info("  ✅ Churn model loaded")
         except Exception as e:
             logger.warning(f"  ⚠️ Churn not loaded: {e}")
+    
+    # Open churn feature store
+    if os.path.exists(CHURN_FEATURES_PATH):
+        try:
+            from src.models.feature_store import FeatureStore
+            feature_store = FeatureStore(
+                CHURN_FEATURES_PATH,
+                cache_size=FEATURE_CACHE_SIZE,
+                max_staleness_seconds=FEATURE_MAX_STALENESS
+            )
+            logger.info(f"  ✅ Churn features loaded ({len(feature_store):,} users)")
+        except Exception as e:
+            logger.warning(f"  ⚠️ Churn features not loaded: {e}")
 
 
 # ============================================
@@ -181,6 +200,7 @@ async def health_check():
             "recommender": models["recommender"] is not None,
             "sentiment": models["sentiment"] is not None,
             "churn": models["churn"] is not None,
+            "churn_features": feature_store is not None,
         },
         version="1.0.0"
     )
@@ -321,7 +341,7 @@ async def predict_churn(user_id: str, request: ChurnRequest = ChurnRequest()):
             cached=False
         )
     
-    # Get user features (from request or fetch from warehouse)
+    # Get user features (from request or the feature store)
     features = request.features or get_user_features(user_id)
     
     result = models["churn"].predict(user_id, features)
@@ -343,25 +363,14 @@ async def predict_churn(user_id: str, request: ChurnRequest = ChurnRequest()):
 
 
 def get_user_features(user_id: str) -> dict:
-    """Fetch user features from warehouse (placeholder)."""
-    # In production, this would query DuckDB
-    import random
-    return {
-        'sessions_7d': random.randint(0, 5),
-        'sessions_30d': random.randint(5, 20),
-        'sessions_90d': random.randint(20, 50),
-        'searches_total': random.randint(10, 100),
-        'clicks_total': random.randint(5, 50),
-        'conversions_total': random.randint(0, 5),
-        'search_to_click_ratio': random.uniform(0.1, 0.5),
-        'click_to_conversion_ratio': random.uniform(0, 0.2),
-        'avg_session_duration_mins': random.uniform(5, 30),
-        'days_since_last_activity': random.randint(1, 60),
-        'lifetime_value': random.uniform(0, 2000),
-        'unique_destinations_searched': random.randint(1, 10),
-        'mobile_session_ratio': random.uniform(0, 1),
-        'weekend_session_ratio': random.uniform(0.2, 0.4),
-    }
+    """Fetch user features from the churn feature store."""
+    if feature_store is None:
+        raise HTTPException(status_code=503, detail="Churn feature store not loaded")
+    
+    features = feature_store.get(user_id)
+    if features is None:
+        raise HTTPException(status_code=404, detail=f"No churn features for user '{user_id}'")
+    return features
 
 
 # ============================================
@@ -387,7 +396,8 @@ async def get_metrics():
         "inference": {
             "target_throughput": "1000+ req/sec",
             "cache_ttl_seconds": CACHE_TTL
-        }
+        },
+        "churn_features": feature_store.stats() if feature_store else None
     }
 
 
@@ -1,9 +1,217 @@
 """
 Evaluation metrics for ML models.
+
+Ranking metrics are computed in batch by ranking_metrics: rankings are a
+(users x K) matrix of item indices and relevance is a sparse (users x
+items) matrix, so a whole population is scored with a few array
+operations. The list-based functions below wrap it for single users or
+small lists.
 """
 
 import numpy as np
-from typing import List, Set
+import pandas as pd
+import scipy.sparse as sp
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def encode_rankings(
+    predicted_lists: List[List[str]],
+    actual_lists: Optional[List[List[str]]] = None,
+    k: int = 10
+) -> Tuple[np.ndarray, sp.csr_matrix, pd.Index]:
+    """
+    Encode ranked item lists for ranking_metrics.
+    
+    Args:
+        predicted_lists: Ranked predictions per user
+        actual_lists: Relevant items per user (defaults to none)
+        k: Number of top predictions to keep
+        
+    Missing item IDs (None/NaN) are kept in place but never match:
+    predicted ones get a reserved code that is never relevant, actual
+    ones a reserved code that is never ranked. Both codes lie past the
+    end of the item index.
+    
+    Returns:
+        Tuple of (users x k rankings padded with -1, users x items
+        relevance, item index mapping codes to item IDs)
+    """
+    actual_lists = actual_lists if actual_lists is not None else [[] for _ in predicted_lists]
+    
+    predicted = [list(p[:k]) for p in predicted_lists]
+    actual = [list(a) for a in actual_lists]
+    n_predicted = np.array([len(p) for p in predicted], dtype=np.int64)
+    n_actual = np.array([len(a) for a in actual], dtype=np.int64)
+    
+    flat = [it for p in predicted for it in p] + [it for a in actual for it in a]
+    codes, items = pd.factorize(pd.Series(flat, dtype=object))
+    predicted_codes, actual_codes = codes[:n_predicted.sum()], codes[n_predicted.sum():]
+    predicted_codes = np.where(predicted_codes < 0, len(items), predicted_codes)
+    actual_codes = np.where(actual_codes < 0, len(items) + 1, actual_codes)
+    
+    rankings = np.full((len(predicted), k), -1, dtype=np.int64)
+    rows = np.repeat(np.arange(len(predicted)), n_predicted)
+    cols = np.arange(len(predicted_codes)) - np.repeat(np.cumsum(n_predicted) - n_predicted, n_predicted)
+    rankings[rows, cols] = predicted_codes
+    
+    relevance = sp.csr_matrix(
+        (np.ones(len(actual_codes), dtype=np.float32),
+         (np.repeat(np.arange(len(actual)), n_actual), actual_codes)),
+        shape=(len(actual), len(items) + 2)
+    )
+    return rankings, relevance, items
+
+
+def ranking_hits(
+    rankings: np.ndarray,
+    relevance: sp.csr_matrix,
+    repeats: bool = False
+) -> np.ndarray:
+    """
+    Whether each ranked item is relevant to its user.
+    
+    Padding (-1) is never a hit. Repeats of an item already ranked higher
+    for the same user are not hits either, unless repeats is set.
+    
+    Args:
+        rankings: (users x K) item indices, -1 for padding
+        relevance: (users x items) sparse relevance, nonzero = relevant
+        repeats: Count every occurrence of a relevant item (the list-based
+            ndcg_at_k and mean_average_precision do)
+        
+    Returns:
+        (users x K) boolean matrix
+    """
+    n_users = rankings.shape[0]
+    n_items = relevance.shape[1]
+    
+    # Relevant (user, item) pairs as sorted flat keys
+    relevance = _canonical(relevance)
+    relevant_keys = (
+        np.repeat(np.arange(n_users, dtype=np.int64), np.diff(relevance.indptr)) * n_items
+        + relevance.indices
+    )
+    
+    keys = np.arange(n_users, dtype=np.int64)[:, None] * n_items + rankings
+    found = np.minimum(np.searchsorted(relevant_keys, keys), max(len(relevant_keys) - 1, 0))
+    hits = (rankings >= 0) & (len(relevant_keys) > 0)
+    if len(relevant_keys):
+        hits &= relevant_keys[found] == keys
+    if repeats:
+        return hits
+    
+    # Count each item once per user, at its best rank
+    order = np.argsort(rankings, axis=1, kind='stable')
+    ranked = np.take_along_axis(rankings, order, axis=1)
+    repeat = np.zeros_like(hits)
+    repeat[:, 1:] = ranked[:, 1:] == ranked[:, :-1]
+    np.put_along_axis(repeat, order, repeat.copy(), axis=1)
+    
+    return hits & ~repeat
+
+
+def ranking_metrics(
+    rankings: np.ndarray,
+    relevance: sp.csr_matrix,
+    k: Optional[int] = None,
+    repeats: bool = False
+) -> Dict[str, np.ndarray]:
+    """
+    Per-user ranking metrics for a whole population at once.
+    
+    Args:
+        rankings: (users x K) item indices, best first, -1 for padding
+        relevance: (users x items) sparse relevance, nonzero = relevant
+        k: Cutoff (defaults to K); precision always divides by k
+        repeats: Count repeated relevant items as hits (see ranking_hits)
+        
+    Returns:
+        Dict of per-user arrays: precision, recall, ndcg,
+        average_precision, hit and n_relevant. Users without relevant
+        items score 0 on everything.
+    """
+    k = k or rankings.shape[1]
+    hits = ranking_hits(rankings[:, :k], relevance, repeats).astype(np.float64)
+    if hits.shape[1] < k:
+        hits = np.hstack([hits, np.zeros((len(hits), k - hits.shape[1]))])
+    
+    relevance = _canonical(relevance)
+    n_relevant = np.diff(relevance.indptr)
+    capped = np.minimum(n_relevant, k)
+    
+    n_hits = hits.sum(axis=1)
+    discounts = 1.0 / np.log2(np.arange(k) + 2)
+    ideal = np.concatenate(([0.0], np.cumsum(discounts)))[capped]
+    precision_at = np.cumsum(hits, axis=1) / np.arange(1, k + 1)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        recall = np.where(n_relevant > 0, n_hits / n_relevant, 0.0)
+        ndcg = np.where(ideal > 0, (hits @ discounts) / ideal, 0.0)
+        average_precision = np.where(capped > 0, (precision_at * hits).sum(axis=1) / capped, 0.0)
+    
+    return {
+        'precision': np.where(n_relevant > 0, n_hits / k, 0.0),
+        'recall': recall,
+        'ndcg': ndcg,
+        'average_precision': average_precision,
+        'hit': (n_hits > 0).astype(np.float64),
+        'n_relevant': n_relevant,
+    }
+
+
+def evaluate_rankings(
+    rankings: np.ndarray,
+    relevance: sp.csr_matrix,
+    k: Optional[int] = None,
+    n_items: Optional[int] = None
+) -> Dict[str, float]:
+    """
+    Population-level ranking metrics.
+    
+    Args:
+        rankings: (users x K) item indices, best first, -1 for padding
+        relevance: (users x items) sparse relevance, nonzero = relevant
+        k: Cutoff (defaults to K)
+        n_items: Catalog size for coverage (defaults to relevance columns)
+        
+    Returns:
+        Mean precision, recall, ndcg, map and hit_rate over users with at
+        least one relevant item, catalog coverage, and the user count
+    """
+    k = k or rankings.shape[1]
+    per_user = ranking_metrics(rankings, relevance, k)
+    evaluated = per_user['n_relevant'] > 0
+    
+    def mean(values: np.ndarray) -> float:
+        return float(values[evaluated].mean()) if evaluated.any() else 0.0
+    
+    return {
+        'precision': mean(per_user['precision']),
+        'recall': mean(per_user['recall']),
+        'ndcg': mean(per_user['ndcg']),
+        'map': mean(per_user['average_precision']),
+        'hit_rate': mean(per_user['hit']),
+        'coverage': catalog_coverage(rankings[:, :k], n_items or relevance.shape[1]),
+        'users': int(evaluated.sum()),
+    }
+
+
+def _canonical(relevance: sp.csr_matrix) -> sp.csr_matrix:
+    """CSR with sorted, unique indices and no stored zeros (copied only if needed)."""
+    relevance = sp.csr_matrix(relevance)
+    if relevance.has_canonical_format and np.all(relevance.data != 0):
+        return relevance
+    relevance = relevance.copy()
+    relevance.sum_duplicates()
+    relevance.eliminate_zeros()
+    return relevance
+
+
+def catalog_coverage(rankings: np.ndarray, n_items: int) -> float:
+    """Share of the catalog appearing in at least one ranking."""
+    if n_items == 0:
+        return 0.0
+    return len(np.unique(rankings[rankings >= 0])) / n_items
 
 
 def precision_at_k(predicted: List[str], actual: List[str], k: int = 10) -> float:
@@ -21,11 +229,8 @@ def precision_at_k(predicted: List[str], actual: List[str], k: int = 10) -> floa
     if not predicted or not actual:
         return 0.0
     
-    predicted_k = set(predicted[:k])
-    actual_set = set(actual)
-    
-    hits = len(predicted_k & actual_set)
-    return hits / k
+    rankings, relevance, _ = encode_rankings([predicted], [actual], k)
+    return float(ranking_metrics(rankings, relevance, k)['precision'][0])
 
 
 def recall_at_k(predicted: List[str], actual: List[str], k: int = 10) -> float:
@@ -43,17 +248,17 @@ def recall_at_k(predicted: List[str], actual: List[str], k: int = 10) -> float:
     if not predicted or not actual:
         return 0.0
     
-    predicted_k = set(predicted[:k])
-    actual_set = set(actual)
-    
-    hits = len(predicted_k & actual_set)
-    return hits / len(actual_set)
+    rankings, relevance, _ = encode_rankings([predicted], [actual], k)
+    return float(ranking_metrics(rankings, relevance, k)['recall'][0])
 
 
 def ndcg_at_k(predicted: List[str], actual: List[str], k: int = 10) -> float:
     """
     Calculate Normalized Discounted Cumulative Gain at K.
     
+    Unlike ranking_metrics, every occurrence of a relevant item in
+    predicted adds gain, and the ideal DCG counts duplicates in actual.
+    
     Args:
         predicted: List of predicted items (ranked)
         actual: List of relevant items
@@ -65,18 +270,13 @@ def ndcg_at_k(predicted: List[str], actual: List[str], k: int = 10) -> float:
     if not predicted or not actual:
         return 0.0
     
-    actual_set = set(actual)
+    rankings, relevance, _ = encode_rankings([predicted], [actual], k)
+    hits = ranking_hits(rankings, relevance, repeats=True)[0]
     
-    # DCG
-    dcg = 0.0
-    for i, item in enumerate(predicted[:k]):
-        if item in actual_set:
-            dcg += 1.0 / np.log2(i + 2)  # i+2 because log2(1) = 0
+    discounts = 1.0 / np.log2(np.arange(k) + 2)
+    idcg = discounts[:min(len(actual), k)].sum()
     
-    # Ideal DCG
-    idcg = sum(1.0 / np.log2(i + 2) for i in range(min(len(actual), k)))
-    
-    return dcg / idcg if idcg > 0 else 0.0
+    return float(hits @ discounts / idcg) if idcg > 0 else 0.0
 
 
 def mean_average_precision(
@@ -87,6 +287,9 @@ def mean_average_precision(
     """
     Calculate Mean Average Precision at K.
     
+    Unlike evaluate_rankings, every occurrence of a relevant item in a
+    prediction list counts as a hit.
+    
     Args:
         predicted_lists: List of prediction lists per user
         actual_lists: List of actual item lists per user
@@ -98,24 +301,11 @@ def mean_average_precision(
     if not predicted_lists or not actual_lists:
         return 0.0
     
-    aps = []
-    for predicted, actual in zip(predicted_lists, actual_lists):
-        if not actual:
-            continue
-        
-        actual_set = set(actual)
-        hits = 0
-        sum_precisions = 0.0
-        
-        for i, item in enumerate(predicted[:k]):
-            if item in actual_set:
-                hits += 1
-                sum_precisions += hits / (i + 1)
-        
-        ap = sum_precisions / min(len(actual_set), k)
-        aps.append(ap)
-    
-    return np.mean(aps) if aps else 0.0
+    n = min(len(predicted_lists), len(actual_lists))
+    rankings, relevance, _ = encode_rankings(predicted_lists[:n], actual_lists[:n], k)
+    per_user = ranking_metrics(rankings, relevance, k, repeats=True)
+    evaluated = per_user['n_relevant'] > 0
+    return float(per_user['average_precision'][evaluated].mean()) if evaluated.any() else 0.0
 
 
 def hit_rate(predicted_lists: List[List[str]], actual_lists: List[List[str]], k: int = 10) -> float:
@@ -133,17 +323,9 @@ def hit_rate(predicted_lists: List[List[str]], actual_lists: List[List[str]], k:
     if not predicted_lists or not actual_lists:
         return 0.0
     
-    hits = 0
-    for predicted, actual in zip(predicted_lists, actual_lists):
-        if not actual:
-            continue
-        
-        predicted_k = set(predicted[:k])
-        actual_set = set(actual)
-        
-        if predicted_k & actual_set:
-            hits += 1
-    
+    n = min(len(predicted_lists), len(actual_lists))
+    rankings, relevance, _ = encode_rankings(predicted_lists[:n], actual_lists[:n], k)
+    hits = ranking_metrics(rankings, relevance, k)['hit'].sum()
     return hits / len(predicted_lists)
 
 
@@ -162,8 +344,5 @@ def coverage(predicted_lists: List[List[str]], all_items: Set[str], k: int = 10)
     if not predicted_lists or not all_items:
         return 0.0
     
-    recommended_items = set()
-    for predicted in predicted_lists:
-        recommended_items.update(predicted[:k])
-    
-    return len(recommended_items) / len(all_items)
+    rankings, _, _ = encode_rankings(predicted_lists, k=k)
+    return catalog_coverage(rankings, len(all_items))
@@ -0,0 +1,125 @@
+"""
+Memory-mapped model artifacts.
+
+A model is saved as a directory of plain .npy arrays plus a manifest.json
+that records the format version, the model configuration and the array
+names. Loading opens every array with np.load(mmap_mode='r'). Nothing is
+deserialized, so API workers that load the same artifact share its pages
+through the OS page cache instead of each holding a private copy.
+
+Sparse matrices are stored as their CSR data/indices/indptr arrays and IDs
+as fixed-width string arrays (object arrays cannot be memory-mapped).
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+
+def id_array(ids: Iterable) -> np.ndarray:
+    """IDs as a memory-mappable array (strings become fixed-width unicode)."""
+    ids = np.asarray(list(ids) if not isinstance(ids, np.ndarray) else ids)
+    if ids.dtype == object:
+        ids = ids.astype(str)
+    return ids
+
+
+def csr_arrays(name: str, matrix: Optional[sp.csr_matrix]) -> Dict[str, np.ndarray]:
+    """A CSR matrix as {name_data, name_indices, name_indptr} arrays ({} for None)."""
+    if matrix is None:
+        return {}
+    return {
+        f"{name}_data": matrix.data,
+        f"{name}_indices": matrix.indices,
+        f"{name}_indptr": matrix.indptr,
+    }
+
+
+def csr_from_arrays(arrays: Dict[str, np.ndarray], name: str, shape) -> Optional[sp.csr_matrix]:
+    """Rebuild a CSR matrix around the (possibly memory-mapped) arrays, without copying."""
+    if f"{name}_data" not in arrays:
+        return None
+    return sp.csr_matrix(
+        (arrays[f"{name}_data"], arrays[f"{name}_indices"], arrays[f"{name}_indptr"]),
+        shape=tuple(shape),
+        copy=False
+    )
+
+
+def save_artifact(path: str, manifest: Dict, arrays: Dict[str, Optional[np.ndarray]]):
+    """
+    Write arrays and the manifest to an artifact directory.
+
+    Every file is written under a temporary name and moved into place, so a
+    worker that still maps the previous version keeps reading its old
+    file. The manifest goes last, after all the arrays it lists.
+
+    Args:
+        path: Artifact directory
+        manifest: JSON-serializable model configuration
+        arrays: Named arrays; None entries are skipped
+    """
+    os.makedirs(path, exist_ok=True)
+
+    written = {}
+    for name, array in arrays.items():
+        if array is None:
+            continue
+        array = np.asarray(array)
+        if array.dtype == object:
+            raise ValueError(f"Array '{name}' has object dtype and cannot be memory-mapped")
+
+        target = os.path.join(path, f"{name}.npy")
+        with open(target + ".tmp", "wb") as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(target + ".tmp", target)
+        written[name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+
+    manifest = {**manifest, "format_version": ARTIFACT_FORMAT_VERSION, "arrays": written}
+    target = os.path.join(path, MANIFEST_FILE)
+    with open(target + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(target + ".tmp", target)
+
+
+def is_artifact(path: str) -> bool:
+    """Whether path holds a manifest-based artifact."""
+    return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def load_artifact(path: str, mmap_mode: Optional[str] = "r"):
+    """
+    Read an artifact's manifest and open its arrays.
+
+    Args:
+        path: Artifact directory
+        mmap_mode: Passed to np.load; None reads the arrays into memory
+
+    Returns:
+        Tuple of (manifest dict, {name: array})
+    """
+    with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+        manifest = json.load(f)
+
+    version = manifest.get("format_version")
+    if version != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format version {version} in {path} "
+            f"(expected {ARTIFACT_FORMAT_VERSION})"
+        )
+
+    arrays = {}
+    for name, meta in manifest["arrays"].items():
+        file = os.path.join(path, f"{name}.npy")
+        # Zero-length arrays cannot be mapped
+        mode = mmap_mode if np.prod(meta["shape"]) > 0 else None
+        arrays[name] = np.load(file, mmap_mode=mode, allow_pickle=False)
+
+    return manifest, arrays
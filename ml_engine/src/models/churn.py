@@ -11,6 +11,7 @@ from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import os
 import json
+from datetime import datetime, timedelta
 
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
@@ -19,6 +20,8 @@ from sklearn.metrics import roc_auc_score, classification_report
 import shap
 import joblib
 
+from .id_map import IdMap
+
 
 @dataclass
 class ChurnPrediction:
@@ -283,85 +286,123 @@ class ChurnPredictor:
         return predictor
 
 
-def build_churn_features(user_events_df: pd.DataFrame) -> pd.DataFrame:
+def build_churn_features(
+    user_events_df: pd.DataFrame,
+    now: Optional[datetime] = None
+) -> pd.DataFrame:
     """
     Build churn prediction features from user event data.
     
+    All users are computed together: one groupby over (user, session) gives
+    each session's first and last event, one groupby over users gives the
+    per-user totals, and the windowed session counts are masks over the
+    session table.
+    
     Args:
         user_events_df: DataFrame with user events
+        now: Reference time for windows and recency (default: utcnow)
         
     Returns:
-        DataFrame with computed features per user
+        DataFrame with computed features per user, sorted by user_id
     """
-    from datetime import datetime, timedelta
+    if now is None:
+        now = datetime.utcnow()
     
-    now = datetime.utcnow()
+    # Dense user codes (IdMap positions follow sorted user order)
+    users = IdMap(np.sort(user_events_df['user_id'].dropna().unique()))
+    user_codes = users.lookup(user_events_df['user_id'].to_numpy())
+    known = user_codes >= 0
+    events = user_events_df[known]
+    user_codes = user_codes[known]
+    n_users = len(users)
     
-    features = []
+    timestamps = events['timestamp']
+    event_type = events['event_type']
+    n_events = np.bincount(user_codes, minlength=n_users)
     
-    for user_id, events in user_events_df.groupby('user_id'):
-        user_features = {'user_id': user_id}
-        
-        # Session counts
-        user_features['sessions_7d'] = len(
-            events[events['timestamp'] > now - timedelta(days=7)]
-            .groupby('session_id')
-        )
-        user_features['sessions_30d'] = len(
-            events[events['timestamp'] > now - timedelta(days=30)]
-            .groupby('session_id')
-        )
-        user_features['sessions_90d'] = len(
-            events[events['timestamp'] > now - timedelta(days=90)]
-            .groupby('session_id')
-        )
-        
-        # Event counts
-        user_features['searches_total'] = len(events[events['event_type'] == 'search'])
-        user_features['clicks_total'] = len(events[events['event_type'] == 'click'])
-        user_features['conversions_total'] = len(events[events['event_type'] == 'conversion'])
-        
-        # Ratios
-        user_features['search_to_click_ratio'] = (
-            user_features['clicks_total'] / max(user_features['searches_total'], 1)
-        )
-        user_features['click_to_conversion_ratio'] = (
-            user_features['conversions_total'] / max(user_features['clicks_total'], 1)
-        )
-        
-        # Session duration (placeholder)
-        user_features['avg_session_duration_mins'] = 15.0  # Would compute from events
-        
-        # Recency
-        last_event = events['timestamp'].max()
-        user_features['days_since_last_activity'] = (now - last_event).days
-        
-        # Value
-        if 'booking_value' in events.columns:
-            user_features['lifetime_value'] = events['booking_value'].sum()
-        else:
-            user_features['lifetime_value'] = 0
-        
-        # Diversity
-        if 'query' in events.columns:
-            user_features['unique_destinations_searched'] = events['query'].nunique()
-        else:
-            user_features['unique_destinations_searched'] = 0
-        
-        # Platform patterns
-        if 'platform' in events.columns:
-            mobile = events['platform'].isin(['ios', 'android']).sum()
-            user_features['mobile_session_ratio'] = mobile / len(events)
-        else:
-            user_features['mobile_session_ratio'] = 0
-        
-        # Time patterns
-        if 'timestamp' in events.columns:
-            weekend = events['timestamp'].dt.dayofweek.isin([5, 6]).sum()
-            user_features['weekend_session_ratio'] = weekend / len(events)
-        else:
-            user_features['weekend_session_ratio'] = 0
-        
-        features.append(user_features)
+    per_event = pd.DataFrame({
+        'timestamp': timestamps.to_numpy(),
+        'searches_total': (event_type == 'search').to_numpy(),
+        'clicks_total': (event_type == 'click').to_numpy(),
+        'conversions_total': (event_type == 'conversion').to_numpy(),
+        'weekend': timestamps.dt.dayofweek.isin([5, 6]).to_numpy(),
+    })
+    aggregations = {
+        'last_event': ('timestamp', 'max'),
+        'searches_total': ('searches_total', 'sum'),
+        'clicks_total': ('clicks_total', 'sum'),
+        'conversions_total': ('conversions_total', 'sum'),
+        'weekend': ('weekend', 'sum'),
+    }
+    if 'booking_value' in events.columns:
+        per_event['booking_value'] = events['booking_value'].to_numpy()
+        aggregations['lifetime_value'] = ('booking_value', 'sum')
+    if 'query' in events.columns:
+        per_event['query'] = events['query'].to_numpy()
+        aggregations['unique_destinations_searched'] = ('query', 'nunique')
+    if 'platform' in events.columns:
+        per_event['mobile'] = events['platform'].isin(['ios', 'android']).to_numpy()
+        aggregations['mobile'] = ('mobile', 'sum')
+    
+    totals = per_event.groupby(user_codes).agg(**aggregations)
+    
+    # Sessions: first/last event per (user, session); a session falls in a
+    # window when its last event does
+    session_codes, _ = pd.factorize(events['session_id'])
+    in_session = session_codes >= 0
+    sessions = (
+        pd.DataFrame({
+            'user': user_codes[in_session],
+            'session': session_codes[in_session],
+            'timestamp': timestamps.to_numpy()[in_session],
+        })
+        .groupby(['user', 'session'])['timestamp']
+        .agg(['min', 'max'])
+    )
+    session_users = sessions.index.get_level_values('user').to_numpy()
+    
+    def sessions_since(days: int) -> np.ndarray:
+        recent = (sessions['max'] > now - timedelta(days=days)).to_numpy()
+        return np.bincount(session_users[recent], minlength=n_users)
+    
+    # Mean session length over sessions with a known duration
+    durations = ((sessions['max'] - sessions['min']) / pd.Timedelta(minutes=1)).to_numpy()
+    timed = ~np.isnan(durations)
+    duration_sum = np.bincount(session_users[timed], weights=durations[timed], minlength=n_users)
+    duration_count = np.bincount(session_users[timed], minlength=n_users)
+    avg_duration = np.divide(
+        duration_sum, duration_count,
+        out=np.zeros(n_users), where=duration_count > 0
+    )
+    
+    searches = totals['searches_total'].to_numpy()
+    clicks = totals['clicks_total'].to_numpy()
+    conversions = totals['conversions_total'].to_numpy()
+    zeros = np.zeros(n_users, dtype=np.int64)
+    
+    features = pd.DataFrame({
+        'user_id': users.decode().tolist(),
+        'sessions_7d': sessions_since(7),
+        'sessions_30d': sessions_since(30),
+        'sessions_90d': sessions_since(90),
+        'searches_total': searches,
+        'clicks_total': clicks,
+        'conversions_total': conversions,
+        'search_to_click_ratio': clicks / np.maximum(searches, 1),
+        'click_to_conversion_ratio': conversions / np.maximum(clicks, 1),
+        'avg_session_duration_mins': avg_duration,
+        'days_since_last_activity': (now - totals['last_event']).dt.days.to_numpy(),
+        'lifetime_value': (
+            totals['lifetime_value'].to_numpy() if 'lifetime_value' in totals else zeros
+        ),
+        'unique_destinations_searched': (
+            totals['unique_destinations_searched'].to_numpy()
+            if 'unique_destinations_searched' in totals else zeros
+        ),
+        'mobile_session_ratio': (
+            totals['mobile'].to_numpy() / n_events if 'mobile' in totals else zeros
+        ),
+        'weekend_session_ratio': totals['weekend'].to_numpy() / n_events,
+    })
     
-    return pd.DataFrame(features)
+    return features
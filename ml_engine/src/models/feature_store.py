@@ -0,0 +1,180 @@
+"""
+Online feature store for per-user features.
+
+A batch job materializes the features and exports them as a memory-mapped
+artifact (see artifacts.py). The artifact holds one float64 row per user in
+a (n_users, n_features) matrix, plus the user IDs as an IdMap. Rows are
+written in sorted ID order, so the IDs are their own search array: a lookup
+is a binary search over the mapped IDs followed by a read of one contiguous
+row, so it costs a few microseconds and touches a few pages.
+
+FeatureStore reads the artifact through an in-process LRU cache. A cached
+entry is served for at most max_staleness_seconds. After that it is re-read
+from the artifact. If the batch job has rebuilt the artifact in the
+meantime, the new build is opened first.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .artifacts import MANIFEST_FILE, load_artifact, save_artifact
+from .id_map import IdMap
+
+
+FEATURE_STORE_MODEL = "feature_store"
+
+
+def save_feature_store(
+    path: str,
+    features_df: pd.DataFrame,
+    feature_names: List[str],
+    built_at: Optional[datetime] = None,
+    id_column: str = 'user_id'
+):
+    """
+    Export a feature table as a feature store artifact.
+
+    Args:
+        path: Artifact directory
+        features_df: One row per entity, with id_column and feature_names columns
+        feature_names: Feature columns to store, in order
+        built_at: When the features were computed (default: utcnow)
+        id_column: Column holding the entity IDs
+    """
+    if built_at is None:
+        built_at = datetime.utcnow()
+
+    missing = [name for name in feature_names if name not in features_df.columns]
+    if missing:
+        raise ValueError(f"Feature table is missing columns {missing}")
+
+    # Rows in sorted ID order: position order is search order, no sorted copy
+    ids = IdMap(features_df[id_column].to_numpy())
+    values = features_df[feature_names].to_numpy(dtype=np.float64, na_value=np.nan)[ids.order]
+    ids = IdMap(ids.sorted_ids)
+
+    manifest = {
+        "model": FEATURE_STORE_MODEL,
+        "feature_names": list(feature_names),
+        "built_at": built_at.isoformat(),
+        "shapes": {"features": list(values.shape)},
+    }
+    save_artifact(path, manifest, {**ids.to_arrays("ids"), "features": values})
+
+
+class FeatureStore:
+    """
+    Read-through LRU cache over a feature store artifact.
+
+    Args:
+        path: Artifact directory written by save_feature_store
+        cache_size: Maximum number of cached entities
+        max_staleness_seconds: Longest time a cached entry is served, and how
+            often the artifact is checked for a newer build
+        clock: Monotonic time source in seconds
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cache_size: int = 100_000,
+        max_staleness_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.path = path
+        self.cache_size = cache_size
+        self.max_staleness_seconds = max_staleness_seconds
+        self.clock = clock
+
+        self._cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self._open()
+
+    def _manifest_version(self) -> int:
+        return os.stat(os.path.join(self.path, MANIFEST_FILE)).st_mtime_ns
+
+    def _open(self):
+        """Map the current build of the artifact."""
+        version = self._manifest_version()
+        manifest, arrays = load_artifact(self.path, mmap_mode='r')
+        if manifest.get("model") != FEATURE_STORE_MODEL:
+            raise ValueError(f"{self.path} is not a feature store artifact")
+
+        self.feature_names: List[str] = manifest["feature_names"]
+        self.built_at = datetime.fromisoformat(manifest["built_at"])
+        self.ids = IdMap.from_arrays(arrays, "ids")
+        self.values = arrays["features"]
+        self._version = version
+        self._checked_at = self.clock()
+
+    def _refresh(self, now: float):
+        """Reopen the artifact if it was rebuilt, at most once per staleness window."""
+        if now - self._checked_at < self.max_staleness_seconds:
+            return
+        self._checked_at = now
+        try:
+            rebuilt = self._manifest_version() != self._version
+        except FileNotFoundError:
+            # Mid-rewrite; keep serving the mapped build
+            return
+        if rebuilt:
+            self._open()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, entity_id) -> bool:
+        return self.get(entity_id) is not None
+
+    def get(self, entity_id) -> Optional[Dict[str, float]]:
+        """
+        Features of one entity.
+
+        Args:
+            entity_id: Entity (user) ID
+
+        Returns:
+            Dict of feature name to value, or None for an unknown entity
+        """
+        now = self.clock()
+        entry = self._cache.get(entity_id)
+        if entry is not None and now - entry[0] <= self.max_staleness_seconds:
+            self._cache.move_to_end(entity_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        self._refresh(now)
+
+        position = self.ids.get(entity_id)
+        features = None
+        if position is not None:
+            features = dict(zip(self.feature_names, self.values[position].tolist()))
+
+        # Unknown entities are cached too, so repeated misses stay cheap
+        self._cache[entity_id] = (now, features)
+        self._cache.move_to_end(entity_id)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return features
+
+    def stats(self) -> Dict:
+        """Cache and build statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entities": len(self.ids),
+            "built_at": self.built_at.isoformat(),
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,149 @@
+"""
+Compact mapping between external IDs and dense integer positions.
+
+IdMap replaces Python dicts of ID strings. It holds flat arrays: the IDs in
+position order, the same IDs sorted, and the permutation between the two.
+Lookups are a plain binary search (np.searchsorted) over the sorted IDs, so
+one ID costs O(log n) and a whole array of IDs is resolved in one vectorized
+call. There are no per-key Python objects, and all arrays can be saved to
+and memory-mapped from .npy files.
+
+String IDs are stored as fixed-width UTF-8 bytes ('S'), a quarter of the
+size of NumPy's UTF-32 'U' strings. decode() turns positions back into str
+IDs. When positions are already in sorted ID order, the sorted copy is the
+position array itself and is not stored twice.
+"""
+
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+from .artifacts import id_array
+
+
+def encode_ids(ids: np.ndarray) -> np.ndarray:
+    """String IDs as fixed-width UTF-8 bytes; other dtypes are returned as is."""
+    if ids.dtype.kind != 'U':
+        return ids
+    try:
+        return ids.astype('S')
+    except UnicodeEncodeError:
+        return np.char.encode(ids, 'utf-8')
+
+
+def decode_ids(ids: np.ndarray) -> np.ndarray:
+    """Inverse of encode_ids: UTF-8 byte IDs back to str."""
+    if ids.dtype.kind != 'S':
+        return ids
+    return np.char.decode(ids, 'utf-8')
+
+
+class IdMap:
+    """
+    IDs <-> positions 0..n-1, backed by sorted arrays.
+
+    Supports the read side of a dict (len, in, [], get, iteration in
+    position order) plus vectorized lookup().
+
+    Args:
+        ids: Unique IDs in position order
+        order: Permutation that sorts ids (computed if not given)
+        sorted_ids: ids[order] (derived if not given)
+    """
+
+    def __init__(
+        self,
+        ids: Iterable = (),
+        order: Optional[np.ndarray] = None,
+        sorted_ids: Optional[np.ndarray] = None
+    ):
+        self.ids = encode_ids(id_array(ids))
+        if len(self.ids) == 0:
+            self.ids = self.ids.astype('S1')
+
+        if order is None:
+            order = np.argsort(self.ids, kind='stable')
+            if len(order) < np.iinfo(np.int32).max:
+                order = order.astype(np.int32)
+            sorted_ids = None
+        self.order = order
+
+        if sorted_ids is None:
+            if np.array_equal(order, np.arange(len(order))):
+                sorted_ids = self.ids
+            else:
+                sorted_ids = self.ids[order]
+            if len(sorted_ids) > 1 and np.any(sorted_ids[1:] == sorted_ids[:-1]):
+                raise ValueError("IdMap ids must be unique")
+        self.sorted_ids = sorted_ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.decode().tolist())
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key) -> int:
+        position = self.get(key)
+        if position is None:
+            raise KeyError(key)
+        return position
+
+    def get(self, key, default=None) -> Optional[int]:
+        """Position of a single ID, or default if it is unknown."""
+        position = self.lookup([key])[0]
+        return int(position) if position >= 0 else default
+
+    def lookup(self, keys: Iterable) -> np.ndarray:
+        """
+        Positions of many IDs at once.
+
+        Args:
+            keys: IDs to resolve
+
+        Returns:
+            int64 array of positions, -1 where an ID is unknown
+        """
+        keys = np.asarray(keys if isinstance(keys, np.ndarray) else list(keys))
+        if self.ids.dtype.kind == 'S' and keys.dtype.kind != 'S':
+            keys = encode_ids(keys.astype(str))
+
+        if len(self.ids) == 0 or len(keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+
+        try:
+            found = np.searchsorted(self.sorted_ids, keys)
+        except TypeError:
+            # Keys of a type the IDs cannot be compared with
+            return np.full(len(keys), -1, dtype=np.int64)
+
+        found = np.minimum(found, len(self.ids) - 1)
+        positions = self.order[found].astype(np.int64)
+        positions[self.sorted_ids[found] != keys] = -1
+        return positions
+
+    def decode(self, positions=None) -> np.ndarray:
+        """IDs at positions (all if None), with string IDs as str."""
+        return decode_ids(self.ids if positions is None else self.ids[positions])
+
+    def append(self, new_ids: Iterable) -> 'IdMap':
+        """New map with the unknown IDs among new_ids added after the existing ones."""
+        new_ids = encode_ids(id_array(new_ids))
+        new_ids = new_ids[self.lookup(new_ids) < 0]
+        _, first = np.unique(new_ids, return_index=True)
+        return IdMap(np.concatenate([self.ids, new_ids[np.sort(first)]]))
+
+    def to_arrays(self, name: str) -> Dict[str, np.ndarray]:
+        """The map as {name: ids, name_order: order[, name_sorted: sorted ids]} for saving."""
+        arrays = {name: self.ids, f"{name}_order": self.order}
+        if self.sorted_ids is not self.ids:
+            arrays[f"{name}_sorted"] = self.sorted_ids
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], name: str) -> 'IdMap':
+        """Rebuild a map around saved (possibly memory-mapped) arrays."""
+        return cls(arrays[name], arrays.get(f"{name}_order"), arrays.get(f"{name}_sorted"))
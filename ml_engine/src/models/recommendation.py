@@ -7,14 +7,23 @@ personalized destination recommendations with 89% precision@10.
 
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.decomposition import TruncatedSVD
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import StandardScaler
+import inspect
 import joblib
 import os
 
+from .ann import IVFIndex, top_k, top_k_rows
+from .artifacts import (
+    csr_arrays, csr_from_arrays, id_array, is_artifact, load_artifact, save_artifact
+)
+from .id_map import IdMap, decode_ids
+
 
 @dataclass
 class RecommendationResult:
@@ -31,18 +40,63 @@ class CollaborativeFilter:
     
     Learns latent factors from user-item interactions to find
     similar users and recommend items they liked.
+    
+    Top-N items are served from an IVFIndex over item_factors (maximum
+    inner product search), built at fit and saved with the model. Its
+    n_probe trades recall for latency; small catalogs are scored exactly.
+    
+    user_index and item_index are IdMaps from IDs to factor rows.
     """
     
-    def __init__(self, n_factors: int = 50, random_state: int = 42):
+    def __init__(
+        self,
+        n_factors: int = 50,
+        random_state: int = 42,
+        duplicate_aggregation: str = "max",
+        index_params: Optional[Dict] = None
+    ):
         self.n_factors = n_factors
         self.random_state = random_state
+        self.duplicate_aggregation = duplicate_aggregation
+        self.index_params = index_params or {}
         self.svd = TruncatedSVD(n_components=n_factors, random_state=random_state)
         self.user_factors = None
         self.item_factors = None
-        self.user_index = {}
-        self.item_index = {}
-        self.index_to_item = {}
+        self.user_index = IdMap()
+        self.item_index = IdMap()
+        self.index = None
+        
+    def _build_matrix(self, interactions_df: pd.DataFrame) -> sp.csr_matrix:
+        """
+        Build the sparse user-item matrix and the user/item indices.
+        
+        Users and items are coded with pd.factorize (first-seen order).
+        Repeated (user, item) pairs are combined with duplicate_aggregation
+        ('max' keeps the strongest signal, 'sum' accumulates repeats)
+        before the CSR matrix is built.
+        """
+        user_codes, users = pd.factorize(interactions_df['user_id'])
+        item_codes, items = pd.factorize(interactions_df['item_id'])
         
+        self.user_index = IdMap(users.to_numpy())
+        self.item_index = IdMap(items.to_numpy())
+        
+        return self._aggregate(
+            user_codes, item_codes, interactions_df['rating'], (len(users), len(items))
+        )
+    
+    def _aggregate(self, rows: np.ndarray, cols: np.ndarray, ratings, shape) -> sp.csr_matrix:
+        """CSR matrix of ratings with repeated (row, col) pairs combined by duplicate_aggregation."""
+        ratings = (
+            pd.Series(np.asarray(ratings, dtype=np.float32))
+            .groupby([rows, cols], sort=False)
+            .agg(self.duplicate_aggregation)
+        )
+        rows = ratings.index.get_level_values(0).to_numpy()
+        cols = ratings.index.get_level_values(1).to_numpy()
+        
+        return sp.csr_matrix((ratings.to_numpy(), (rows, cols)), shape=shape, dtype=np.float32)
+    
     def fit(self, interactions_df: pd.DataFrame) -> 'CollaborativeFilter':
         """
         Fit the collaborative filter on user-item interactions.
@@ -50,54 +104,329 @@ class CollaborativeFilter:
         Args:
             interactions_df: DataFrame with columns [user_id, item_id, rating]
         """
-        # Create user and item indices
-        users = interactions_df['user_id'].unique()
-        items = interactions_df['item_id'].unique()
+        matrix = self._build_matrix(interactions_df)
+        
+        # Factorize (TruncatedSVD works on the sparse matrix directly)
+        self.user_factors = self.svd.fit_transform(matrix)
+        self.item_factors = self.svd.components_.T
+        
+        self.build_index()
+        return self
+    
+    def build_index(self) -> IVFIndex:
+        """
+        (Re)build the item index from item_factors.
         
-        self.user_index = {u: i for i, u in enumerate(users)}
-        self.item_index = {it: i for i, it in enumerate(items)}
-        self.index_to_item = {i: it for it, i in self.item_index.items()}
+        Items are then renumbered into the index's list order, so that
+        item_factors and index.vectors are one array and the model holds
+        (and saves) a single copy of the item factors.
+        """
+        self.index = IVFIndex(**self.index_params).build(self.item_factors)
+        order = self.index.item_ids
+        self.item_index = IdMap(self.item_index.ids[order])
+        self.item_factors = self.index.vectors
+        self.index.item_ids = np.arange(len(order))
+        return self.index
+    
+    def partial_fit(self, interactions_df: pd.DataFrame) -> 'CollaborativeFilter':
+        """
+        Fold users into the fitted model without refitting item factors.
         
-        # Build user-item matrix
-        n_users = len(users)
-        n_items = len(items)
-        matrix = np.zeros((n_users, n_items))
+        Each user in interactions_df gets factors solved against the fixed
+        item factors from their interactions there, which should be their
+        full history: known users have their factors replaced, new users
+        are appended to user_index. Items unseen at fit are ignored until
+        the next full fit, and users with no item seen at fit are skipped
+        (new ones stay unknown, known ones keep their factors) rather than
+        folded in with zero factors.
         
-        for _, row in interactions_df.iterrows():
-            u_idx = self.user_index[row['user_id']]
-            i_idx = self.item_index[row['item_id']]
-            matrix[u_idx, i_idx] = row['rating']
+        Args:
+            interactions_df: DataFrame with columns [user_id, item_id, rating]
+        """
+        cols = self.item_index.lookup(interactions_df['item_id'].to_numpy())
+        known = cols >= 0
+        if not known.any():
+            return self
+        
+        user_codes, users = pd.factorize(interactions_df['user_id'][known])
+        matrix = self._aggregate(
+            user_codes, cols[known], interactions_df['rating'].to_numpy()[known],
+            (len(users), len(self.item_index))
+        )
+        factors = self.fold_in(matrix)
         
-        # Factorize
-        self.user_factors = self.svd.fit_transform(matrix)
-        self.item_factors = self.svd.components_.T
+        self.user_index = self.user_index.append(users.to_numpy())
+        rows = self.user_index.lookup(users.to_numpy())
         
+        # A new array: the loaded one may be a read-only memory map
+        user_factors = np.zeros((len(self.user_index), self.user_factors.shape[1]), dtype=self.user_factors.dtype)
+        user_factors[:len(self.user_factors)] = self.user_factors
+        user_factors[rows] = factors
+        self.user_factors = user_factors
         return self
     
-    def predict(self, user_id: str, top_n: int = 10) -> List[Tuple[str, float]]:
+    def fold_in(self, matrix: sp.csr_matrix) -> np.ndarray:
+        """
+        User factors for rating rows, by least squares against item_factors.
+        
+        Solves min_u ||r - V u||^2 for every row at once:
+        u = (V^T V)^-1 V^T r. With SVD's orthonormal components this is the
+        same projection TruncatedSVD.transform applies.
+        
+        Args:
+            matrix: (users x items) ratings in item_index order
+            
+        Returns:
+            (users x n_factors) factors
+        """
+        V = np.asarray(self.item_factors, dtype=np.float64)
+        return np.linalg.solve(V.T @ V, (matrix @ V).T).T.astype(self.user_factors.dtype)
+    
+    def predict(
+        self,
+        user_id: str,
+        top_n: int = 10,
+        n_probe: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
         """
         Predict top-N items for a user.
         
         Args:
             user_id: User identifier
             top_n: Number of recommendations
+            n_probe: Index lists to scan (overrides the index's n_probe)
             
         Returns:
             List of (item_id, score) tuples
         """
-        if user_id not in self.user_index:
-            return []
+        top_indices, scores = self.predict_indices(user_id, top_n, n_probe)
         
-        u_idx = self.user_index[user_id]
-        user_vec = self.user_factors[u_idx]
+        return list(zip(self.item_index.decode(top_indices).tolist(), scores.tolist()))
+    
+    def predict_indices(
+        self,
+        user_id: str,
+        top_n: int = 10,
+        n_probe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-N as (item indices, scores) arrays, highest first; empty for unknown users."""
+        row = self.user_index.get(user_id)
+        if row is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        user_vec = self.user_factors[row]
+        return self.index.search(user_vec, top_n, n_probe=n_probe)
+
+
+class ImplicitALSFilter(CollaborativeFilter):
+    """
+    Collaborative filtering with implicit-feedback ALS (Hu, Koren & Volinsky).
+    
+    Interaction weights (search=1, click=3, conversion=5) are treated as
+    confidence c = 1 + alpha * r in an observed preference of 1, and every
+    missing entry is a preference of 0 with confidence 1. The user and item
+    factors are updated in turn. Each update takes a few conjugate-gradient
+    steps per row, warm-started from the current factors, so no k x k
+    system is solved per row.
+    
+    The CG steps are batched over blocks of users (or items) with about
+    block_nnz nonzeros each. Every step is a handful of NumPy/BLAS calls,
+    and the blocks run on a thread pool. An iteration costs
+    O(nnz * k + (users + items) * k^2).
+    
+    With warm_start=True, a refit starts from the previous factors of users
+    and items seen before; new ones are randomly initialized.
+    """
+    
+    # Memory for the per-interaction k x k outer products of one fold_in block
+    FOLD_IN_BLOCK_BYTES = 64 << 20
+    
+    def __init__(
+        self,
+        n_factors: int = 50,
+        regularization: float = 0.01,
+        alpha: float = 40.0,
+        iterations: int = 15,
+        cg_steps: int = 3,
+        n_threads: Optional[int] = None,
+        block_nnz: int = 1 << 18,
+        warm_start: bool = False,
+        random_state: int = 42,
+        duplicate_aggregation: str = "sum",
+        index_params: Optional[Dict] = None
+    ):
+        super().__init__(
+            n_factors=n_factors,
+            random_state=random_state,
+            duplicate_aggregation=duplicate_aggregation,
+            index_params=index_params
+        )
+        self.svd = None
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        # None: all cores of the host that fits, resolved at fit time
+        self.n_threads = n_threads
+        self.block_nnz = block_nnz
+        self.warm_start = warm_start
+    
+    def fit(self, interactions_df: pd.DataFrame) -> 'ImplicitALSFilter':
+        """
+        Fit user and item factors on implicit interactions.
+        
+        Args:
+            interactions_df: DataFrame with columns [user_id, item_id, rating]
+        """
+        previous = (self.user_index, self.user_factors, self.item_index, self.item_factors)
+        
+        matrix = self._build_matrix(interactions_df)
+        
+        # Confidence minus one: the extra weight of observed entries
+        Cui = matrix.copy()
+        Cui.data *= self.alpha
+        Ciu = Cui.T.tocsr()
+        
+        rng = np.random.default_rng(self.random_state)
+        user_factors = self._init_factors(self.user_index, previous[0], previous[1], rng)
+        item_factors = self._init_factors(self.item_index, previous[2], previous[3], rng)
+        
+        n_threads = self.n_threads or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            for _ in range(self.iterations):
+                self._update(pool, Cui, user_factors, item_factors)
+                self._update(pool, Ciu, item_factors, user_factors)
+        
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        
+        self.build_index()
+        return self
+    
+    def fold_in(self, matrix: sp.csr_matrix, block_nnz: Optional[int] = None) -> np.ndarray:
+        """
+        User factors for rating rows with item factors fixed.
+        
+        Solves each user's weighted least squares exactly:
+        (YtY + reg*I + Yt (Cu - I) Y) x_u = Yt Cu p_u. The k x k systems of
+        a block of users (about block_nnz interactions) are assembled from
+        per-interaction outer products and solved in one batched call.
+        
+        Args:
+            matrix: (users x items) ratings in item_index order
+            block_nnz: Interactions per block. Each one holds a float64
+                k x k outer product, so the default fits a block in
+                FOLD_IN_BLOCK_BYTES.
+            
+        Returns:
+            (users x n_factors) factors
+        """
+        Y = np.asarray(self.item_factors, dtype=np.float64)
+        if block_nnz is None:
+            block_nnz = max(1, self.FOLD_IN_BLOCK_BYTES // (8 * Y.shape[1] ** 2))
+        YtY = Y.T @ Y
+        YtY[np.diag_indices_from(YtY)] += self.regularization
+        
+        Cui = matrix.copy()
+        Cui.data *= self.alpha
+        factors = np.zeros((Cui.shape[0], Y.shape[1]), dtype=np.float32)
+        
+        bounds = np.searchsorted(Cui.indptr, np.arange(0, Cui.nnz, block_nnz), side='right') - 1
+        bounds = np.unique(np.concatenate(([0], bounds, [Cui.shape[0]])))
+        
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            block = Cui[start:end]
+            filled = np.flatnonzero(np.diff(block.indptr))
+            if len(filled) == 0:
+                continue
+            
+            # Yt (Cu - I) Y per user: outer products summed per row segment
+            Y_nz = Y[block.indices]
+            outer = np.einsum('ni,nj->nij', Y_nz * block.data[:, None], Y_nz)
+            A = YtY + np.add.reduceat(outer, block.indptr[filled], axis=0)
+            b = sp.csr_matrix(
+                (block.data + 1, block.indices, block.indptr), shape=block.shape
+            )[filled] @ Y
+            
+            factors[start + filled] = np.linalg.solve(A, b[:, :, None])[:, :, 0]
+        
+        return factors
+    
+    def _init_factors(
+        self,
+        index: IdMap,
+        previous_index: IdMap,
+        previous_factors: Optional[np.ndarray],
+        rng: np.random.Generator
+    ) -> np.ndarray:
+        """Random factors, overwritten by previous ones for known IDs on warm start."""
+        factors = rng.normal(0, 0.01, size=(len(index), self.n_factors)).astype(np.float32)
+        
+        if self.warm_start and previous_factors is not None and previous_factors.shape[1] == self.n_factors:
+            old_rows = previous_index.lookup(index.ids)
+            known = old_rows >= 0
+            factors[known] = previous_factors[old_rows[known]]
+        
+        return factors
+    
+    def _update(
+        self,
+        pool: ThreadPoolExecutor,
+        Cui: sp.csr_matrix,
+        X: np.ndarray,
+        Y: np.ndarray
+    ):
+        """Update the rows of X in place with Y fixed, block by block."""
+        YtY = Y.T @ Y
+        YtY[np.diag_indices_from(YtY)] += self.regularization
         
-        # Score all items
-        scores = np.dot(self.item_factors, user_vec)
+        # Row blocks with roughly block_nnz nonzeros each
+        bounds = np.searchsorted(Cui.indptr, np.arange(0, Cui.nnz, self.block_nnz), side='right') - 1
+        bounds = np.unique(np.concatenate(([0], bounds, [Cui.shape[0]])))
         
-        # Get top-N
-        top_indices = np.argsort(scores)[::-1][:top_n]
+        blocks = zip(bounds[:-1], bounds[1:])
+        list(pool.map(lambda b: self._solve_block(Cui[b[0]:b[1]], X, b[0], Y, YtY), blocks))
+    
+    def _solve_block(
+        self,
+        Cui: sp.csr_matrix,
+        X: np.ndarray,
+        start: int,
+        Y: np.ndarray,
+        YtY: np.ndarray
+    ):
+        """
+        Batched conjugate gradient on (YtY + reg*I + Yt (Cu - I) Y) x_u = Yt Cu p_u.
         
-        return [(self.index_to_item[i], float(scores[i])) for i in top_indices]
+        Each row's residual, step and direction are carried as arrays, so
+        every CG step updates the whole block at once.
+        """
+        x = X[start:start + Cui.shape[0]]
+        rows = np.repeat(np.arange(Cui.shape[0]), np.diff(Cui.indptr))
+        Y_nz = Y[Cui.indices]
+        
+        def apply_A(v: np.ndarray) -> np.ndarray:
+            # Yt (Cu - I) Y v through the nonzeros only
+            weights = Cui.data * np.sum(Y_nz * v[rows], axis=1)
+            extra = sp.csr_matrix((weights, Cui.indices, Cui.indptr), shape=Cui.shape) @ Y
+            return v @ YtY + extra
+        
+        # Yt Cu p_u = sum over observed items of (1 + (c - 1)) y_i
+        confidence = sp.csr_matrix((Cui.data + 1, Cui.indices, Cui.indptr), shape=Cui.shape)
+        r = confidence @ Y - apply_A(x)
+        p = r.copy()
+        rs_old = np.sum(r * r, axis=1)
+        
+        for _ in range(self.cg_steps):
+            Ap = apply_A(p)
+            pAp = np.sum(p * Ap, axis=1)
+            step = np.divide(rs_old, pAp, out=np.zeros_like(rs_old), where=pAp > 0)
+            x += step[:, None] * p
+            r -= step[:, None] * Ap
+            rs_new = np.sum(r * r, axis=1)
+            beta = np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=rs_old > 0)
+            p = r + beta[:, None] * p
+            rs_old = rs_new
 
 
 class ContentBasedFilter:
@@ -106,14 +435,33 @@ class ContentBasedFilter:
     
     Recommends items similar to those the user has interacted with,
     based on item attributes (destination features, price, etc.).
+    
+    A user's score for an item is its mean cosine similarity to the liked
+    items. How similarities are held is set by `similarity`:
+    - "vectors" (default): only L2-normalized item vectors are stored. The
+      mean similarity is one matvec against the mean liked vector, so
+      memory is O(items x features)
+    - "graph": a sparse graph of each item's n_neighbors most similar
+      items. Similarities outside the graph count as 0, so only neighbors
+      of liked items score. Memory is O(items x n_neighbors)
+    - "dense": the full item x item similarity matrix (O(items^2))
     """
     
-    def __init__(self):
+    SIMILARITY_MODES = ("vectors", "graph", "dense")
+    
+    def __init__(self, similarity: str = "vectors", n_neighbors: int = 100):
+        if similarity not in self.SIMILARITY_MODES:
+            raise ValueError(
+                f"Unknown similarity '{similarity}', expected one of {list(self.SIMILARITY_MODES)}"
+            )
+        self.similarity = similarity
+        self.n_neighbors = n_neighbors
         self.item_features = None
-        self.item_index = {}
-        self.index_to_item = {}
+        self.item_vectors = None
+        self.item_index = IdMap()
         self.scaler = StandardScaler()
         self.similarity_matrix = None
+        self.neighbor_graph = None
         
     def fit(self, items_df: pd.DataFrame, feature_cols: List[str]) -> 'ContentBasedFilter':
         """
@@ -123,18 +471,68 @@ class ContentBasedFilter:
             items_df: DataFrame with item features
             feature_cols: Columns to use as features
         """
-        self.item_index = {it: i for i, it in enumerate(items_df['item_id'])}
-        self.index_to_item = {i: it for it, i in self.item_index.items()}
+        self.item_index = IdMap(items_df['item_id'].to_numpy())
         
         # Extract and normalize features
         features = items_df[feature_cols].values
         self.item_features = self.scaler.fit_transform(features)
         
-        # Compute similarity matrix
-        self.similarity_matrix = cosine_similarity(self.item_features)
+        if self.similarity == "dense":
+            self.similarity_matrix = cosine_similarity(self.item_features)
+            return self
+        
+        self.item_vectors = self._unit_vectors(self.item_features)
+        
+        if self.similarity == "graph":
+            self.neighbor_graph = self._build_neighbor_graph(self.item_vectors, self.n_neighbors)
         
         return self
     
+    @staticmethod
+    def _unit_vectors(features: np.ndarray) -> np.ndarray:
+        """L2-normalized float32 rows of features (zero rows stay zero)."""
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return (features / np.where(norms > 0, norms, 1)).astype(np.float32)
+    
+    @staticmethod
+    def _build_neighbor_graph(vectors: np.ndarray, n_neighbors: int, block_size: int = 2048) -> sp.csr_matrix:
+        """Sparse graph of each item's n_neighbors highest cosine similarities (self included)."""
+        n_items = len(vectors)
+        k = min(n_neighbors, n_items)
+        
+        cols = np.empty((n_items, k), dtype=np.int64)
+        vals = np.empty((n_items, k), dtype=np.float32)
+        for start in range(0, n_items, block_size):
+            sims = vectors[start:start + block_size] @ vectors.T
+            top = top_k_rows(sims, k)
+            cols[start:start + block_size] = top
+            vals[start:start + block_size] = np.take_along_axis(sims, top, axis=1)
+        
+        indptr = np.arange(0, n_items * k + 1, k)
+        return sp.csr_matrix((vals.ravel(), cols.ravel(), indptr), shape=(n_items, n_items))
+    
+    def mean_similarity(self, history: sp.csr_matrix) -> np.ndarray:
+        """
+        Mean similarity of every item to each user's liked items.
+        
+        Args:
+            history: (users x items) interaction counts; repeats weigh in
+            
+        Returns:
+            Dense (users x items) scores; NaN rows for empty histories
+        """
+        counts = np.asarray(history.sum(axis=1)).ravel()
+        
+        if self.similarity == "vectors":
+            totals = (history @ self.item_vectors) @ self.item_vectors.T
+        elif self.similarity == "graph":
+            totals = (history @ self.neighbor_graph).toarray()
+        else:
+            totals = history @ self.similarity_matrix
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return totals / counts[:, None]
+    
     def predict(self, liked_items: List[str], top_n: int = 10) -> List[Tuple[str, float]]:
         """
         Predict similar items based on user's liked items.
@@ -146,26 +544,37 @@ class ContentBasedFilter:
         Returns:
             List of (item_id, score) tuples
         """
-        if not liked_items:
-            return []
-        
         # Get indices of liked items
-        liked_indices = [self.item_index[it] for it in liked_items if it in self.item_index]
+        liked_indices = self.item_index.lookup(liked_items)
+        liked_indices = liked_indices[liked_indices >= 0]
+        
+        top_indices, scores = self.predict_indices(liked_indices, top_n)
         
-        if not liked_indices:
-            return []
+        return list(zip(self.item_index.decode(top_indices).tolist(), scores.tolist()))
+    
+    def predict_indices(self, liked_indices, top_n: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-N as (item indices, scores) arrays, highest first.
         
-        # Average similarity to liked items
-        avg_similarity = np.mean(self.similarity_matrix[liked_indices], axis=0)
+        Args:
+            liked_indices: Item indices (into item_index) the user interacted with
+            top_n: Number of recommendations
+        """
+        if len(liked_indices) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
         
-        # Exclude already liked items
-        for idx in liked_indices:
-            avg_similarity[idx] = -1
+        history = sp.csr_matrix(
+            (np.ones(len(liked_indices), dtype=np.float32),
+             (np.zeros(len(liked_indices), dtype=np.int64), liked_indices)),
+            shape=(1, len(self.item_index))
+        )
         
-        # Get top-N
-        top_indices = np.argsort(avg_similarity)[::-1][:top_n]
+        # Average similarity to liked items, excluding the liked items
+        avg_similarity = self.mean_similarity(history)[0]
+        avg_similarity[liked_indices] = -1
         
-        return [(self.index_to_item[i], float(avg_similarity[i])) for i in top_indices]
+        top_indices = top_k(avg_similarity, top_n)
+        return top_indices, avg_similarity[top_indices]
 
 
 class HybridRecommender:
@@ -175,19 +584,47 @@ class HybridRecommender:
     Achieves 89% precision@10 by blending both approaches:
     - Collaborative: Captures user behavior patterns
     - Content-based: Handles cold-start with item features
+    
+    The collaborative side is TruncatedSVD on the rating matrix
+    (algorithm="svd") or implicit-feedback ALS (algorithm="als").
+    
+    Both filters' items are mapped onto one shared item index at fit, so
+    their top candidates are blended as aligned arrays and the final top-N
+    is an argpartition over the candidates. predict_many scores whole
+    blocks of users the same way with matrix products.
+    
+    user_history is a CSR matrix of interaction counts, one row per user
+    in collaborative.user_index order and one column per content item.
+    
+    save() writes a memory-mapped artifact directory (see artifacts.py).
     """
     
+    ALGORITHMS = {
+        "svd": CollaborativeFilter,
+        "als": ImplicitALSFilter,
+    }
+    
     def __init__(
         self,
         n_factors: int = 50,
         collab_weight: float = 0.6,
-        content_weight: float = 0.4
+        content_weight: float = 0.4,
+        algorithm: str = "svd",
+        content_similarity: str = "vectors"
     ):
-        self.collaborative = CollaborativeFilter(n_factors=n_factors)
-        self.content_based = ContentBasedFilter()
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(
+                f"Unknown algorithm '{algorithm}', expected one of {list(self.ALGORITHMS)}"
+            )
+        self.algorithm = algorithm
+        self.collaborative = self.ALGORITHMS[algorithm](n_factors=n_factors)
+        self.content_based = ContentBasedFilter(similarity=content_similarity)
         self.collab_weight = collab_weight
         self.content_weight = content_weight
-        self.user_history = {}  # user_id -> list of item_ids
+        self.user_history = None  # CSR (collab users x content items) interaction counts
+        self.item_ids = None  # shared item index: position -> item_id (encoded, see id_map)
+        self.collab_to_shared = None
+        self.content_to_shared = None
         
     def fit(
         self,
@@ -209,12 +646,74 @@ class HybridRecommender:
         # Fit content-based filter
         self.content_based.fit(items_df, feature_cols)
         
-        # Build user history
-        for user_id, group in interactions_df.groupby('user_id'):
-            self.user_history[user_id] = group['item_id'].tolist()
+        self._build_shared_index()
+        self._build_user_history(interactions_df)
+        return self
+    
+    def partial_fit(self, interactions_df: pd.DataFrame) -> 'HybridRecommender':
+        """
+        Fold new or updated users in without a full retrain.
         
+        The collaborative filter solves their factors against the fixed
+        item factors (see CollaborativeFilter.partial_fit) and their
+        user_history rows are replaced. interactions_df should hold each
+        such user's full history, e.g. every interaction of the users
+        active since the last run.
+        
+        Args:
+            interactions_df: User-item interactions [user_id, item_id, rating]
+        """
+        self.collaborative.partial_fit(interactions_df)
+        
+        n_users = len(self.collaborative.user_index)
+        old = self.user_history
+        old = sp.vstack([old, sp.csr_matrix((n_users - old.shape[0], old.shape[1]))], format='csr')
+        
+        # New users the collaborative filter skipped have no row, and users
+        # with no known item keep their current history
+        rows = self.collaborative.user_index.lookup(interactions_df['user_id'].to_numpy())
+        cols = self.content_based.item_index.lookup(interactions_df['item_id'].to_numpy())
+        keep = (rows >= 0) & (cols >= 0)
+        
+        kept = np.ones(n_users, dtype=np.float32)
+        kept[rows[keep]] = 0
+        new = sp.csr_matrix(
+            (_interaction_counts(interactions_df)[keep], (rows[keep], cols[keep])),
+            shape=old.shape
+        )
+        self.user_history = (sp.diags(kept) @ old + new).tocsr()
+        self.user_history.eliminate_zeros()
         return self
     
+    def _build_user_history(self, interactions_df: pd.DataFrame):
+        """
+        Sparse per-user counts of interactions with content-indexed items.
+        
+        Rows pre-aggregated per (user, item) carry their count in an
+        n_interactions column; otherwise each row counts once.
+        """
+        users = self.collaborative.user_index
+        items = self.content_based.item_index
+        
+        rows = users.lookup(interactions_df['user_id'].to_numpy())
+        cols = items.lookup(interactions_df['item_id'].to_numpy())
+        keep = (rows >= 0) & (cols >= 0)
+        
+        self.user_history = sp.csr_matrix(
+            (_interaction_counts(interactions_df)[keep], (rows[keep], cols[keep])),
+            shape=(len(users), len(items))
+        )
+    
+    def _build_shared_index(self):
+        """Map each filter's item positions onto one shared item index."""
+        collab_items = self.collaborative.item_index.ids
+        content_items = self.content_based.item_index.ids
+        shared = IdMap(collab_items).append(content_items)
+        
+        self.item_ids = shared.ids
+        self.collab_to_shared = shared.lookup(collab_items)
+        self.content_to_shared = shared.lookup(content_items)
+    
     def predict(self, user_id: str, top_n: int = 10) -> RecommendationResult:
         """
         Generate hybrid recommendations for a user.
@@ -226,33 +725,33 @@ class HybridRecommender:
         Returns:
             RecommendationResult with recommendations and scores
         """
-        collab_recs = self.collaborative.predict(user_id, top_n * 2)
-        
-        # Get content-based recommendations
-        user_items = self.user_history.get(user_id, [])
-        content_recs = self.content_based.predict(user_items, top_n * 2)
+        collab_idx, collab_scores = self.collaborative.predict_indices(user_id, top_n * 2)
         
-        # Combine scores
-        combined_scores = {}
+        # Get content-based recommendations from the user's history row
+        row = self.collaborative.user_index.get(user_id)
+        liked = []
+        if row is not None:
+            history = self.user_history[row]
+            liked = np.repeat(history.indices, history.data.astype(np.int64))
+        content_idx, content_scores = self.content_based.predict_indices(liked, top_n * 2)
         
-        for item_id, score in collab_recs:
-            combined_scores[item_id] = self.collab_weight * score
+        # Blend on the shared item index: candidates are the union of both lists
+        collab_shared = self.collab_to_shared[collab_idx]
+        content_shared = self.content_to_shared[content_idx]
+        candidates = np.union1d(collab_shared, content_shared)
         
-        for item_id, score in content_recs:
-            if item_id in combined_scores:
-                combined_scores[item_id] += self.content_weight * score
-            else:
-                combined_scores[item_id] = self.content_weight * score
+        combined = np.zeros(len(candidates))
+        combined[np.searchsorted(candidates, collab_shared)] += self.collab_weight * collab_scores
+        combined[np.searchsorted(candidates, content_shared)] += self.content_weight * content_scores
         
-        # Sort and get top-N
-        sorted_items = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
-        top_items = sorted_items[:top_n]
+        top = top_k(combined, top_n)
+        top_items = decode_ids(self.item_ids[candidates[top]]).tolist()
+        scores = combined[top].tolist()
         
         recommendations = [
             {"item_id": item_id, "destination": item_id, "score": score}
-            for item_id, score in top_items
+            for item_id, score in zip(top_items, scores)
         ]
-        scores = [score for _, score in top_items]
         
         return RecommendationResult(
             user_id=user_id,
@@ -261,12 +760,249 @@ class HybridRecommender:
             algorithm="hybrid"
         )
     
+    def predict_many(
+        self,
+        user_ids: List[str],
+        top_n: int = 10,
+        block_size: int = 1024
+    ) -> pd.DataFrame:
+        """
+        Hybrid recommendations for many users, scored in blocks.
+        
+        Per block of users: collaborative scores are one U_block @ V.T
+        product, content scores are the mean similarity to liked items
+        computed from the block's sparse history counts, and each side keeps
+        its top 2N per row. The two candidate lists are then blended on the
+        shared item index exactly as in predict. Memory is
+        O(block_size * n_items).
+        
+        Collaborative candidates come from an exact scan, so for catalogs
+        large enough to use the ANN index they may differ slightly from
+        predict.
+        
+        Args:
+            user_ids: Users to score
+            top_n: Number of recommendations per user
+            block_size: Users per block
+            
+        Returns:
+            DataFrame [user_id, item_id, score, rank] (rank 1 = best);
+            users without any candidates are absent
+        """
+        collab = self.collaborative
+        content = self.content_based
+        n_candidates = top_n * 2
+        
+        user_ids = np.asarray(user_ids, dtype=object)
+        user_rows = collab.user_index.lookup(user_ids)
+        
+        frames = []
+        for start in range(0, len(user_ids), block_size):
+            rows = user_rows[start:start + block_size]
+            known = rows >= 0
+            
+            # Collaborative: one matmul for the block
+            collab_scores = np.full((len(rows), len(collab.item_index)), -np.inf, dtype=np.float32)
+            collab_scores[known] = collab.user_factors[rows[known]] @ collab.item_factors.T
+            collab_top = top_k_rows(collab_scores, n_candidates)
+            collab_top_scores = np.take_along_axis(collab_scores, collab_top, axis=1)
+            
+            # Content: mean similarity to liked items for the block's histories
+            history = self.user_history[np.where(known, rows, 0)]
+            history = sp.diags(known.astype(np.float32)) @ history
+            content_scores = content.mean_similarity(history)
+            content_scores[np.isnan(content_scores)] = -np.inf
+            history = history.tocoo()
+            content_scores[history.row, history.col] = -1
+            content_top = top_k_rows(content_scores, n_candidates)
+            content_top_scores = np.take_along_axis(content_scores, content_top, axis=1)
+            
+            # Blend: concatenate both candidate lists on the shared index and
+            # merge items present in both (each appears at most once per list)
+            items = np.hstack([self.collab_to_shared[collab_top], self.content_to_shared[content_top]])
+            blended = np.hstack([
+                self.collab_weight * collab_top_scores,
+                self.content_weight * content_top_scores
+            ]).astype(np.float64)
+            
+            order = np.argsort(items, axis=1, kind='stable')
+            items = np.take_along_axis(items, order, axis=1)
+            blended = np.take_along_axis(blended, order, axis=1)
+            valid = np.isfinite(blended)
+            blended[~valid] = 0
+            duplicate = np.zeros_like(items, dtype=bool)
+            duplicate[:, 1:] = items[:, 1:] == items[:, :-1]
+            blended[:, :-1] += np.where(duplicate[:, 1:], blended[:, 1:], 0)
+            valid[:, :-1] |= duplicate[:, 1:] & valid[:, 1:]
+            blended[duplicate | ~valid] = -np.inf
+            
+            top = top_k_rows(blended, top_n)
+            top_items = np.take_along_axis(items, top, axis=1)
+            top_scores = np.take_along_axis(blended, top, axis=1)
+            
+            valid = np.isfinite(top_scores)
+            frames.append(pd.DataFrame({
+                "user_id": np.repeat(user_ids[start:start + block_size], top.shape[1])[valid.ravel()],
+                "item_id": decode_ids(self.item_ids[top_items[valid]]),
+                "score": top_scores[valid],
+                "rank": np.tile(np.arange(1, top.shape[1] + 1), len(rows))[valid.ravel()],
+            }))
+        
+        if not frames:
+            return pd.DataFrame(columns=["user_id", "item_id", "score", "rank"])
+        return pd.concat(frames, ignore_index=True)
+    
     def save(self, path: str):
-        """Save model to disk."""
-        os.makedirs(path, exist_ok=True)
-        joblib.dump(self, os.path.join(path, 'recommender.joblib'))
+        """
+        Save model to disk as a memory-mapped artifact directory.
+        
+        Factors, the item index, content features and user histories are
+        written as .npy arrays and the configuration as manifest.json.
+        The fitted TruncatedSVD object is not kept: its components are
+        item_factors. Arrays derived from others are not written either:
+        the index's vectors are item_factors and the content item vectors
+        are recomputed from item_features at load.
+        """
+        collab = self.collaborative
+        content = self.content_based
+        index = collab.index
+        
+        manifest = {
+            "model": type(self).__name__,
+            "algorithm": self.algorithm,
+            "collab_weight": self.collab_weight,
+            "content_weight": self.content_weight,
+            "collaborative": _init_params(collab),
+            "content_based": _init_params(content),
+            "shapes": {
+                "user_history": list(self.user_history.shape),
+                "content_neighbor_graph": (
+                    list(content.neighbor_graph.shape)
+                    if content.neighbor_graph is not None else None
+                ),
+            },
+        }
+        
+        arrays = {
+            **collab.user_index.to_arrays("collab_user_ids"),
+            **collab.item_index.to_arrays("collab_item_ids"),
+            "collab_user_factors": collab.user_factors,
+            "collab_item_factors": collab.item_factors,
+            **{
+                f"index_{name}": getattr(index, name)
+                for name in IVFIndex.ARRAYS if name != "vectors"
+            },
+            **content.item_index.to_arrays("content_item_ids"),
+            "content_item_features": content.item_features,
+            "content_similarity_matrix": content.similarity_matrix,
+            **csr_arrays("content_neighbor_graph", content.neighbor_graph),
+            "item_ids": id_array(self.item_ids),
+            "collab_to_shared": self.collab_to_shared,
+            "content_to_shared": self.content_to_shared,
+            **csr_arrays("user_history", self.user_history),
+        }
+        
+        save_artifact(path, manifest, arrays)
+        joblib.dump(content.scaler, os.path.join(path, 'content_scaler.joblib'))
     
     @classmethod
-    def load(cls, path: str) -> 'HybridRecommender':
-        """Load model from disk."""
-        return joblib.load(os.path.join(path, 'recommender.joblib'))
+    def load(cls, path: str, mmap_mode: Optional[str] = 'r') -> 'HybridRecommender':
+        """
+        Load model from disk.
+        
+        Arrays are memory-mapped read-only (mmap_mode=None reads them into
+        memory). Directories holding only a pickled recommender.joblib
+        from before the artifact format are still loaded.
+        """
+        if not is_artifact(path):
+            return cls._load_pickle(path)
+        
+        manifest, arrays = load_artifact(path, mmap_mode=mmap_mode)
+        
+        model = cls(
+            collab_weight=manifest["collab_weight"],
+            content_weight=manifest["content_weight"],
+            algorithm=manifest["algorithm"]
+        )
+        
+        collab = cls.ALGORITHMS[model.algorithm](**manifest["collaborative"])
+        collab.user_index = IdMap.from_arrays(arrays, "collab_user_ids")
+        collab.item_index = IdMap.from_arrays(arrays, "collab_item_ids")
+        collab.user_factors = arrays["collab_user_factors"]
+        collab.item_factors = arrays["collab_item_factors"]
+        collab.index = IVFIndex(**collab.index_params)
+        for name in IVFIndex.ARRAYS:
+            setattr(collab.index, name, arrays.get(f"index_{name}"))
+        collab.index.vectors = collab.item_factors
+        model.collaborative = collab
+        
+        content = ContentBasedFilter(**manifest["content_based"])
+        content.item_index = IdMap.from_arrays(arrays, "content_item_ids")
+        content.item_features = arrays["content_item_features"]
+        if content.similarity != "dense":
+            content.item_vectors = content._unit_vectors(content.item_features)
+        content.similarity_matrix = arrays.get("content_similarity_matrix")
+        content.neighbor_graph = csr_from_arrays(
+            arrays, "content_neighbor_graph", manifest["shapes"]["content_neighbor_graph"]
+        )
+        content.scaler = joblib.load(os.path.join(path, 'content_scaler.joblib'))
+        model.content_based = content
+        
+        model.item_ids = arrays["item_ids"]
+        model.collab_to_shared = arrays["collab_to_shared"]
+        model.content_to_shared = arrays["content_to_shared"]
+        model.user_history = csr_from_arrays(arrays, "user_history", manifest["shapes"]["user_history"])
+        return model
+    
+    @classmethod
+    def _load_pickle(cls, path: str) -> 'HybridRecommender':
+        """
+        Load a model pickled whole by the original save().
+        
+        That format held dict ID indices, a dense content similarity matrix
+        and user_history as {user_id: [item_id, ...]}. They are converted
+        once here to the current attributes; the item index and shared
+        index it had no equivalent for are built.
+        """
+        model = joblib.load(os.path.join(path, 'recommender.joblib'))
+        collab = model.collaborative
+        content = model.content_based
+        
+        model.algorithm = "svd"
+        
+        collab.duplicate_aggregation = "max"
+        collab.index_params = {}
+        collab.user_index = IdMap(list(collab.user_index))
+        collab.item_index = IdMap(list(collab.item_index))
+        del collab.index_to_item
+        collab.build_index()
+        
+        content.similarity = "dense"
+        content.n_neighbors = 100
+        content.item_vectors = None
+        content.neighbor_graph = None
+        content.item_index = IdMap(list(content.item_index))
+        del content.index_to_item
+        
+        model._build_shared_index()
+        
+        history = model.user_history
+        lengths = [len(items) for items in history.values()]
+        model._build_user_history(pd.DataFrame({
+            'user_id': np.repeat(list(history), lengths),
+            'item_id': [item for items in history.values() for item in items],
+        }))
+        return model
+
+
+def _interaction_counts(interactions_df: pd.DataFrame) -> np.ndarray:
+    """Interactions per row: the n_interactions column if present, else 1."""
+    if 'n_interactions' in interactions_df.columns:
+        return interactions_df['n_interactions'].to_numpy(dtype=np.float32)
+    return np.ones(len(interactions_df), dtype=np.float32)
+
+
+def _init_params(obj) -> Dict:
+    """Constructor arguments of obj, read back from its attributes."""
+    params = inspect.signature(type(obj).__init__).parameters
+    return {name: getattr(obj, name) for name in params if name != 'self'}
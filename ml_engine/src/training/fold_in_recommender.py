@@ -0,0 +1,105 @@
+"""
+Fold recently active users into the trained recommender.
+
+Meant to run periodically between full retrains: pulls the complete
+interaction history of every user with activity in the last N hours from
+DuckDB, folds them into the saved model with HybridRecommender.partial_fit
+(item factors stay fixed) and saves it back in place.
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+# Add parent to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.models.recommendation import HybridRecommender
+from src.training.train_recommender import interactions_query, read_interaction_batches
+
+
+def load_recent_user_interactions(
+    duckdb_path: str,
+    since_hours: float,
+    aggregation: str = "max",
+    batch_size: int = 1_000_000
+) -> pd.DataFrame:
+    """
+    All interactions of users with a search or click in the last since_hours.
+    
+    Rated and aggregated like load_interaction_data, so folded-in users are
+    scored the same way as trained ones.
+    
+    Args:
+        duckdb_path: Warehouse file
+        since_hours: Activity window
+        aggregation: The model's duplicate_aggregation ('max' or 'sum')
+        batch_size: Rows per Arrow record batch
+        
+    Returns:
+        DataFrame [user_id, item_id, rating, n_interactions], one row per pair
+    """
+    import duckdb
+
+    since = datetime.utcnow() - timedelta(hours=since_hours)
+    query = interactions_query(aggregation, active_since=True)
+
+    conn = duckdb.connect(duckdb_path, read_only=True)
+    try:
+        return read_interaction_batches(conn.execute(query, [since]).fetch_record_batch(batch_size))
+    finally:
+        conn.close()
+
+
+def fold_in_recommender(
+    duckdb_path: str = "/data/searchflow.duckdb",
+    model_path: str = "./models/recommendation",
+    since_hours: float = 24.0
+):
+    """Fold recently active users into the saved model."""
+    print("=" * 50)
+    print("Folding recent users into the recommender")
+    print("=" * 50)
+
+    start = time.time()
+
+    print(f"\n[1/3] Loading interactions of users active in the last {since_hours:g}h...")
+    recommender = HybridRecommender.load(model_path)
+    interactions_df = load_recent_user_interactions(
+        duckdb_path, since_hours, aggregation=recommender.collaborative.duplicate_aggregation
+    )
+    print(f"  Loaded {len(interactions_df):,} interactions")
+    print(f"  Users: {interactions_df['user_id'].nunique():,}")
+
+    if interactions_df.empty:
+        print("\n  Nothing to fold in")
+        return None
+
+    print("\n[2/3] Folding in...")
+    n_known = len(recommender.collaborative.user_index)
+    recommender.partial_fit(interactions_df)
+    n_new = len(recommender.collaborative.user_index) - n_known
+    print(f"  New users: {n_new:,}")
+    print(f"  Updated users: {interactions_df['user_id'].nunique() - n_new:,}")
+
+    print(f"\n[3/3] Saving model to {model_path}...")
+    recommender.save(model_path)
+
+    print(f"\n✅ Fold-in done in {time.time() - start:.1f}s")
+
+    return recommender
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duckdb-path", default="/data/searchflow.duckdb")
+    parser.add_argument("--model-path", default="./models/recommendation")
+    parser.add_argument("--since-hours", type=float, default=24.0)
+    args = parser.parse_args()
+
+    fold_in_recommender(args.duckdb_path, args.model_path, args.since_hours)
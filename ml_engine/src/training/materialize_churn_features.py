@@ -0,0 +1,204 @@
+"""
+Materialize churn features for online serving.
+
+Batch job: loads user events from the DuckDB staging models, computes the
+churn features of every user with build_churn_features, writes them to the
+ml.churn_features warehouse table and exports them as the feature store
+artifact that the API reads (see src/models/feature_store.py). Scheduled by
+the searchflow_transformation DAG after the staging models are built.
+
+Only events of the last lookback_days are read. Users with no event in that
+window keep their row from the previous run: their totals stay as last
+computed, days_since_last_activity is advanced from their last activity and
+their windowed session counts drop to zero.
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+# Add parent to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.models.churn import ChurnPredictor, build_churn_features
+from src.models.feature_store import save_feature_store
+
+
+CHURN_FEATURES_TABLE = "ml.churn_features"
+
+# Longest session-count window of build_churn_features (sessions_90d)
+SESSION_WINDOWS = {'sessions_7d': 7, 'sessions_30d': 30, 'sessions_90d': 90}
+
+
+def load_user_events(duckdb_path: str, since: datetime) -> pd.DataFrame:
+    """
+    Search, click and conversion events from since onwards.
+
+    Click and conversion events take their platform from the search events
+    of the same session.
+    """
+    import duckdb
+
+    conn = duckdb.connect(duckdb_path, read_only=True)
+
+    query = """
+    WITH session_platforms AS (
+        SELECT session_id, ANY_VALUE(platform) AS platform
+        FROM main_staging.stg_search_events
+        WHERE session_id IS NOT NULL
+        GROUP BY session_id
+    ),
+
+    events AS (
+        SELECT user_id, session_id, 'search' AS event_type, event_timestamp,
+               CAST(NULL AS DOUBLE) AS booking_value, search_query AS query
+        FROM main_staging.stg_search_events
+        UNION ALL
+        SELECT user_id, session_id, 'click' AS event_type, event_timestamp,
+               NULL, NULL
+        FROM main_staging.stg_click_events
+        UNION ALL
+        SELECT user_id, session_id, 'conversion' AS event_type, event_timestamp,
+               CAST(booking_value AS DOUBLE), NULL
+        FROM main_staging.stg_conversion_events
+    )
+
+    SELECT
+        e.user_id,
+        e.session_id,
+        e.event_type,
+        e.event_timestamp AS timestamp,
+        e.booking_value,
+        e.query,
+        p.platform
+    FROM events e
+    LEFT JOIN session_platforms p USING (session_id)
+    WHERE e.user_id IS NOT NULL
+      AND e.event_timestamp >= ?
+    """
+
+    try:
+        df = conn.execute(query, [since]).fetchdf()
+    finally:
+        conn.close()
+
+    return df
+
+
+def load_previous_features(duckdb_path: str) -> pd.DataFrame:
+    """The features of the last run, empty if there is none yet."""
+    import duckdb
+
+    conn = duckdb.connect(duckdb_path, read_only=True)
+    try:
+        return conn.execute(f"SELECT * FROM {CHURN_FEATURES_TABLE}").fetchdf()
+    except duckdb.CatalogException:
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+
+def carry_over_inactive(
+    previous_df: pd.DataFrame,
+    features_df: pd.DataFrame,
+    built_at: datetime
+) -> pd.DataFrame:
+    """
+    Previous rows of the users missing from features_df, aged to built_at.
+
+    They had no event in the lookback window, which covers every session
+    window, so those counts are zero; recency is recomputed from
+    last_activity_at and everything else is kept.
+    """
+    if previous_df.empty:
+        return previous_df
+
+    inactive = previous_df[~previous_df['user_id'].isin(features_df['user_id'])]
+    inactive = inactive[features_df.columns].copy()
+    inactive['days_since_last_activity'] = (built_at - inactive['last_activity_at']).dt.days
+    for column in SESSION_WINDOWS:
+        inactive[column] = 0
+    return inactive
+
+
+def write_features_table(duckdb_path: str, features_df: pd.DataFrame, built_at: datetime):
+    """Replace the warehouse churn_features table with features_df."""
+    import duckdb
+
+    schema = CHURN_FEATURES_TABLE.split('.')[0]
+    conn = duckdb.connect(duckdb_path)
+    try:
+        conn.register("features_df", features_df)
+        conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        conn.execute(
+            f"CREATE OR REPLACE TABLE {CHURN_FEATURES_TABLE} AS "
+            f"SELECT *, CAST(? AS TIMESTAMP) AS built_at FROM features_df",
+            [built_at]
+        )
+    finally:
+        conn.close()
+
+
+def materialize_churn_features(
+    duckdb_path: str = "/data/searchflow.duckdb",
+    store_path: str = "./models/churn_features",
+    lookback_days: int = 365
+):
+    """Compute churn features for all users and export them for serving."""
+    if lookback_days < max(SESSION_WINDOWS.values()):
+        raise ValueError(
+            f"lookback_days must cover the longest session window "
+            f"({max(SESSION_WINDOWS.values())} days), got {lookback_days}"
+        )
+
+    print("=" * 50)
+    print("Materializing churn features")
+    print("=" * 50)
+
+    start = time.time()
+    built_at = datetime.utcnow()
+
+    print(f"\n[1/4] Loading events of the last {lookback_days} days...")
+    events_df = load_user_events(duckdb_path, built_at - timedelta(days=lookback_days))
+    print(f"  Loaded {len(events_df):,} events")
+
+    previous_df = load_previous_features(duckdb_path)
+    if events_df.empty and previous_df.empty:
+        print("\n  No events, nothing to materialize")
+        return None
+
+    print("\n[2/4] Computing features...")
+    stage = time.time()
+    features_df = build_churn_features(events_df, now=built_at)
+    last_activity = events_df.groupby('user_id')['timestamp'].max()
+    features_df['last_activity_at'] = last_activity.reindex(features_df['user_id']).to_numpy()
+
+    inactive_df = carry_over_inactive(previous_df, features_df, built_at)
+    features_df = pd.concat([features_df, inactive_df], ignore_index=True)
+    print(f"  Users: {len(features_df):,}, {len(inactive_df):,} carried over "
+          f"without recent events ({time.time() - stage:.1f}s)")
+
+    print(f"\n[3/4] Writing {CHURN_FEATURES_TABLE}...")
+    write_features_table(duckdb_path, features_df, built_at)
+
+    print(f"\n[4/4] Exporting feature store to {store_path}...")
+    save_feature_store(store_path, features_df, ChurnPredictor.FEATURE_NAMES, built_at)
+
+    print(f"\n✅ Churn features materialized in {time.time() - start:.1f}s")
+
+    return features_df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duckdb-path", default="/data/searchflow.duckdb")
+    parser.add_argument("--store-path", default="./models/churn_features")
+    parser.add_argument("--lookback-days", type=int, default=365)
+    args = parser.parse_args()
+
+    materialize_churn_features(args.duckdb_path, args.store_path, args.lookback_days)
@@ -0,0 +1,606 @@
+"""
+Parallel hyperparameter sweeps for the recommender, churn and sentiment models.
+
+A sweep prepares its task's data once and writes it as a memory-mapped
+artifact (see src/models/artifacts.py). It then runs the trials (a full grid,
+or a random sample of it) on a process pool. Workers open the shared arrays
+with mmap_mode='r' instead of receiving a pickled copy each.
+
+Every finished trial is stored as trials/<config hash>.json, so rerunning a
+sweep only runs configurations without a result. The hash covers the task,
+the configuration, the data parameters and a fingerprint of the source data
+(e.g. the warehouse's row counts and latest ingestion time), so new data
+gets new trials. Synthetic fallback data is never cached. report.json and report.md rank
+the trials by score and compare accuracy with training time: the best
+trial, the cheapest trial within 1% of it, the time/score Pareto front and
+the parallel speedup.
+
+Usage:
+    python -m src.training.sweep recommender --workers 4
+    python -m src.training.sweep churn --search random --n-trials 10
+    python -m src.training.sweep sentiment --param clf__C=0.5,1,2
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Add parent to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.models.artifacts import id_array, is_artifact, load_artifact, save_artifact
+
+
+def config_hash(task: str, config: Dict, data_params: Dict) -> str:
+    """Stable short hash identifying a trial."""
+    key = json.dumps({"task": task, "config": config, "data": data_params}, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+class SweepTask(ABC):
+    """
+    A model family that can be swept.
+
+    Subclasses define the default search space, how to prepare the shared
+    arrays once, and how to train and score one configuration on them.
+    Higher scores are better.
+    """
+
+    name = ""
+    metric = ""
+    space: Dict[str, List] = {}
+    data_defaults: Dict = {}
+
+    def fingerprint(self, **data_params) -> Optional[Dict]:
+        """
+        Identity of the source data prepare() reads, part of every cache key.
+
+        Data fully determined by data_params needs none ({}). None means
+        prepare() falls back to synthetic data, which is never cached.
+        """
+        return {}
+
+    @abstractmethod
+    def prepare(self, **data_params) -> Dict[str, np.ndarray]:
+        """Build the shared arrays (no object dtypes)."""
+
+    @abstractmethod
+    def run(self, config: Dict, arrays: Dict[str, np.ndarray], n_threads: int) -> Dict[str, float]:
+        """Train one configuration; returns metrics including `metric`."""
+
+
+class RecommenderTask(SweepTask):
+    """
+    HybridRecommender on warehouse interactions.
+
+    20% of the (user, item) pairs are held out. Unlike train_recommender,
+    which holds out whole users, every test user therefore has
+    collaborative factors. Config keys are HybridRecommender arguments.
+    Other keys (e.g. alpha, regularization, iterations for ALS) are set on
+    the collaborative filter. content_weight defaults to 1 - collab_weight.
+    """
+
+    name = "recommender"
+    metric = "ndcg"
+    space = {
+        "algorithm": ["svd", "als"],
+        "n_factors": [16, 32, 50, 64],
+        "collab_weight": [0.4, 0.6, 0.8],
+    }
+    data_defaults = {"duckdb_path": "/data/searchflow.duckdb", "test_size": 0.2, "seed": 42}
+
+    HYBRID_ARGS = ("n_factors", "collab_weight", "content_weight", "algorithm", "content_similarity")
+    SOURCE_TABLES = ("main_staging.stg_search_events", "main_staging.stg_click_events")
+
+    def fingerprint(self, duckdb_path: str, **data_params) -> Optional[Dict]:
+        """Row count and latest ingested_at of each source table; None without a warehouse."""
+        import duckdb
+
+        try:
+            conn = duckdb.connect(duckdb_path, read_only=True)
+        except Exception:
+            return None
+        try:
+            fingerprint = {}
+            for table in self.SOURCE_TABLES:
+                rows, last_ingested_at = conn.execute(
+                    f"SELECT COUNT(*), MAX(ingested_at) FROM {table}"
+                ).fetchone()
+                fingerprint[table] = [rows, str(last_ingested_at)]
+            return fingerprint
+        except Exception:
+            return None
+        finally:
+            conn.close()
+
+    def prepare(self, duckdb_path: str, test_size: float, seed: int) -> Dict[str, np.ndarray]:
+        from src.training.train_recommender import (
+            generate_item_features, generate_synthetic_interactions, load_interaction_data
+        )
+
+        # Both aggregations, aligned on the same (user, item) rows
+        if self.fingerprint(duckdb_path) is None:
+            print("  Using synthetic data (warehouse not available)")
+            df = summed = generate_synthetic_interactions()
+        else:
+            # No fallback here: the data is cached under the warehouse
+            # fingerprint, so a load error (duckdb.Error) fails the sweep
+            df = load_interaction_data(duckdb_path, aggregation="max")
+            summed = load_interaction_data(duckdb_path, aggregation="sum")
+        df = df.merge(
+            summed[["user_id", "item_id", "rating"]].rename(columns={"rating": "rating_sum"}),
+            on=["user_id", "item_id"], how="left"
+        )
+        if "n_interactions" not in df.columns:
+            df["n_interactions"] = 1
+
+        user_codes, users = pd.factorize(df["user_id"])
+        item_codes, items = pd.factorize(df["item_id"])
+        features = generate_item_features(items.tolist())
+
+        rng = np.random.default_rng(seed)
+        return {
+            "user_ids": id_array(users.to_numpy()),
+            "item_ids": id_array(items.to_numpy()),
+            "user_codes": user_codes.astype(np.int32),
+            "item_codes": item_codes.astype(np.int32),
+            "rating_max": df["rating"].to_numpy(dtype=np.float32),
+            "rating_sum": df["rating_sum"].fillna(df["rating"]).to_numpy(dtype=np.float32),
+            "n_interactions": df["n_interactions"].to_numpy(dtype=np.float32),
+            "is_test": rng.random(len(df)) < test_size,
+            "item_features": features.drop(columns="item_id").to_numpy(dtype=np.float32),
+            "feature_names": id_array(features.columns.drop("item_id")),
+        }
+
+    def run(self, config: Dict, arrays: Dict[str, np.ndarray], n_threads: int) -> Dict[str, float]:
+        from src.models.recommendation import HybridRecommender
+        from src.training.train_recommender import evaluate_recommender
+
+        config = dict(config)
+        config.setdefault("content_weight", 1 - config.get("collab_weight", 0.6))
+        hybrid_args = {k: v for k, v in config.items() if k in self.HYBRID_ARGS}
+        recommender = HybridRecommender(**hybrid_args)
+
+        collab = recommender.collaborative
+        for name, value in config.items():
+            if name in self.HYBRID_ARGS:
+                continue
+            if not hasattr(collab, name):
+                raise ValueError(f"Unknown recommender parameter '{name}'")
+            setattr(collab, name, value)
+        if hasattr(collab, "n_threads"):
+            collab.n_threads = n_threads
+
+        rating = arrays["rating_sum"] if collab.duplicate_aggregation == "sum" else arrays["rating_max"]
+        interactions = pd.DataFrame({
+            "user_id": arrays["user_ids"][arrays["user_codes"]],
+            "item_id": arrays["item_ids"][arrays["item_codes"]],
+            "rating": rating,
+            "n_interactions": arrays["n_interactions"],
+        })
+        is_test = np.asarray(arrays["is_test"])
+        feature_cols = arrays["feature_names"].tolist()
+        items_df = pd.DataFrame(arrays["item_features"], columns=feature_cols)
+        items_df.insert(0, "item_id", arrays["item_ids"])
+
+        recommender.fit(interactions[~is_test], items_df, feature_cols)
+
+        test_df = interactions[is_test]
+        results = evaluate_recommender(recommender, test_df, test_df["user_id"].unique(), k=10)
+        return {name: float(results[name]) for name in ("ndcg", "precision", "recall", "map", "coverage")}
+
+
+class ChurnTask(SweepTask):
+    """ChurnPredictor (XGBoost) on the synthetic churn features, scored by AUC."""
+
+    name = "churn"
+    metric = "auc"
+    space = {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [4, 6, 8],
+        "learning_rate": [0.05, 0.1, 0.2],
+    }
+    data_defaults = {"n_users": 10000, "test_size": 0.2, "seed": 42}
+
+    def prepare(self, n_users: int, test_size: float, seed: int) -> Dict[str, np.ndarray]:
+        from sklearn.model_selection import train_test_split
+        from src.models.churn import ChurnPredictor
+        from src.training.train_churn import generate_synthetic_churn_data
+
+        df = generate_synthetic_churn_data(n_users)
+        train_idx, test_idx = train_test_split(
+            np.arange(len(df)), test_size=test_size, random_state=seed, stratify=df["churned"]
+        )
+        return {
+            "X": df[ChurnPredictor.FEATURE_NAMES].to_numpy(dtype=np.float32),
+            "y": df["churned"].to_numpy(dtype=np.int8),
+            "train_idx": train_idx,
+            "test_idx": test_idx,
+        }
+
+    def run(self, config: Dict, arrays: Dict[str, np.ndarray], n_threads: int) -> Dict[str, float]:
+        from src.models.churn import ChurnPredictor
+
+        predictor = ChurnPredictor(**config)
+        predictor.model.set_params(n_jobs=n_threads)
+
+        X = pd.DataFrame(arrays["X"], columns=ChurnPredictor.FEATURE_NAMES)
+        y = pd.Series(arrays["y"])
+        train, test = arrays["train_idx"], arrays["test_idx"]
+
+        predictor.fit(X.iloc[train], y.iloc[train])
+        metrics = predictor.evaluate(X.iloc[test], y.iloc[test])
+        return {"auc": metrics.auc, "accuracy": metrics.accuracy, "f1": metrics.f1}
+
+
+class SentimentTask(SweepTask):
+    """
+    TF-IDF + logistic regression sentiment model, scored by accuracy.
+
+    Config keys are pipeline parameters (tfidf__*, clf__*).
+    """
+
+    name = "sentiment"
+    metric = "accuracy"
+    space = {
+        "tfidf__max_features": [2000, 5000, 10000],
+        "tfidf__ngram_range": [[1, 1], [1, 2]],
+        "clf__C": [0.5, 1.0, 2.0],
+    }
+    data_defaults = {"n_samples": 25000, "test_size": 0.2, "seed": 42}
+
+    def prepare(self, n_samples: int, test_size: float, seed: int) -> Dict[str, np.ndarray]:
+        from sklearn.model_selection import train_test_split
+        from src.data.generate_reviews import generate_dataset
+
+        random.seed(seed)
+        texts, labels = generate_dataset(n_samples)
+        train_idx, test_idx = train_test_split(
+            np.arange(len(texts)), test_size=test_size, random_state=seed, stratify=labels
+        )
+        return {
+            "texts": id_array(texts),
+            "labels": id_array(labels),
+            "train_idx": train_idx,
+            "test_idx": test_idx,
+        }
+
+    def run(self, config: Dict, arrays: Dict[str, np.ndarray], n_threads: int) -> Dict[str, float]:
+        from src.models.sentiment import TfidfSentimentModel
+
+        params = {k: tuple(v) if isinstance(v, list) else v for k, v in config.items()}
+        model = TfidfSentimentModel()
+        model.pipeline.set_params(**params)
+
+        texts, labels = arrays["texts"], arrays["labels"]
+        train, test = arrays["train_idx"], arrays["test_idx"]
+
+        model.fit(texts[train].tolist(), labels[train].tolist())
+        accuracy = model.pipeline.score(texts[test].tolist(), labels[test].tolist())
+        return {"accuracy": float(accuracy)}
+
+
+TASKS = {
+    task.name: task for task in (RecommenderTask, ChurnTask, SentimentTask)
+}
+
+
+def _run_trial(task_name: str, config: Dict, data_dir: str, n_threads: int) -> Dict:
+    """Worker entry point: open the shared data, train, time it."""
+    from threadpoolctl import threadpool_limits
+
+    task = TASKS[task_name]()
+    _, arrays = load_artifact(data_dir, mmap_mode="r")
+
+    start = time.time()
+    with threadpool_limits(limits=n_threads):
+        metrics = task.run(config, arrays, n_threads)
+    return {"metrics": metrics, "seconds": time.time() - start}
+
+
+def expand_space(space: Dict[str, List], search: str = "grid", n_trials: Optional[int] = None, seed: int = 42) -> List[Dict]:
+    """
+    Configurations to try.
+
+    Args:
+        space: Parameter name -> candidate values
+        search: 'grid' for every combination, 'random' for a sample of them
+        n_trials: Number of random configurations (all if None or larger)
+        seed: Random search seed
+
+    Returns:
+        List of config dicts
+    """
+    if search not in ("grid", "random"):
+        raise ValueError(f"Unknown search '{search}', expected one of ['grid', 'random']")
+
+    names = list(space)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+    if search == "random" and n_trials is not None and n_trials < len(configs):
+        picked = np.random.default_rng(seed).choice(len(configs), size=n_trials, replace=False)
+        configs = [configs[i] for i in sorted(picked)]
+    return configs
+
+
+def prepare_data(task: SweepTask, sweep_dir: str, data_key: Dict) -> str:
+    """
+    Prepare the task's shared arrays; returns the artifact dir.
+
+    data_key is the data parameters plus their source fingerprint
+    (see data_key()). The artifact is reused while the key is unchanged,
+    except for synthetic data, which is rebuilt on every sweep.
+    """
+    data_params = {k: v for k, v in data_key.items() if k != "source"}
+    synthetic = data_key["source"] == "synthetic"
+
+    data_dir = os.path.join(sweep_dir, task.name, f"data-{config_hash(task.name, {}, data_key)}")
+    if synthetic or not is_artifact(data_dir):
+        manifest = {"task": task.name, "data_params": data_params, "source": data_key["source"]}
+        save_artifact(data_dir, manifest, task.prepare(**data_params))
+    return data_dir
+
+
+def data_key(task: SweepTask, data_params: Dict) -> Dict:
+    """Data parameters plus the task's source fingerprint ('synthetic' if it has none)."""
+    source = task.fingerprint(**data_params)
+    return {**data_params, "source": "synthetic" if source is None else source}
+
+
+def run_sweep(
+    task_name: str,
+    space: Optional[Dict[str, List]] = None,
+    search: str = "grid",
+    n_trials: Optional[int] = None,
+    workers: Optional[int] = None,
+    threads_per_worker: int = 1,
+    sweep_dir: str = "./sweeps",
+    data_params: Optional[Dict] = None,
+    seed: int = 42
+) -> Dict:
+    """
+    Run a sweep, skipping configurations already in the result cache.
+
+    Args:
+        task_name: One of TASKS
+        space: Search space (defaults to the task's)
+        search: 'grid' or 'random'
+        n_trials: Random search sample size
+        workers: Worker processes (defaults to CPU count / threads_per_worker)
+        threads_per_worker: BLAS/OpenMP threads per trial
+        sweep_dir: Root for data, trial results and reports
+        data_params: Overrides for the task's data_defaults
+        seed: Random search seed
+
+    Returns:
+        The report dict (also written to report.json / report.md)
+    """
+    if task_name not in TASKS:
+        raise ValueError(f"Unknown task '{task_name}', expected one of {list(TASKS)}")
+
+    task = TASKS[task_name]()
+    space = space or task.space
+    data_params = {**task.data_defaults, **(data_params or {})}
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    task_dir = os.path.join(sweep_dir, task.name)
+    trials_dir = os.path.join(task_dir, "trials")
+    os.makedirs(trials_dir, exist_ok=True)
+
+    print("=" * 50)
+    print(f"Sweep: {task.name} ({search})")
+    print("=" * 50)
+
+    start = time.time()
+    print("\n[1/3] Preparing shared data...")
+    key = data_key(task, data_params)
+    data_dir = prepare_data(task, sweep_dir, key)
+    print(f"  {data_dir} ({time.time() - start:.1f}s)")
+
+    # Results on synthetic data say nothing about the real data: never cached
+    cache = key["source"] != "synthetic"
+    if not cache:
+        print("  Synthetic data: trial results are not cached")
+
+    configs = expand_space(space, search, n_trials, seed)
+    trials = {config_hash(task.name, c, key): c for c in configs}
+    pending = {
+        h: c for h, c in trials.items()
+        if not (cache and os.path.exists(os.path.join(trials_dir, f"{h}.json")))
+    }
+
+    print(f"\n[2/3] Running {len(pending)} of {len(trials)} trials on {workers} workers...")
+    sweep_start = time.time()
+    run_seconds = 0.0
+    finished = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_run_trial, task.name, config, data_dir, threads_per_worker): h
+            for h, config in pending.items()
+        }
+        for future in as_completed(futures):
+            h = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # Failures are reported but not cached, so a rerun retries them
+                print(f"  ✗ {pending[h]}: {e}")
+                continue
+
+            run_seconds += outcome["seconds"]
+            finished[h] = {"hash": h, "config": pending[h], **outcome}
+            if cache:
+                with open(os.path.join(trials_dir, f"{h}.json"), "w") as f:
+                    json.dump(finished[h], f)
+            print(f"  {task.metric}={outcome['metrics'][task.metric]:.4f} "
+                  f"({outcome['seconds']:.1f}s) {pending[h]}")
+    wall_seconds = time.time() - sweep_start
+
+    print("\n[3/3] Writing report...")
+    results = []
+    for h in trials:
+        path = os.path.join(trials_dir, f"{h}.json")
+        if h in finished:
+            results.append(finished[h])
+        elif cache and os.path.exists(path):
+            with open(path) as f:
+                results.append(json.load(f))
+
+    report = build_report(task, results, wall_seconds, run_seconds, n_cached=len(trials) - len(pending))
+    with open(os.path.join(task_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(task_dir, "report.md"), "w") as f:
+        f.write(format_report(report))
+
+    if report["best"]:
+        print(f"\n✅ Best {task.metric}: {report['best']['score']:.4f} with {report['best']['config']}")
+    print(f"   Report: {os.path.join(task_dir, 'report.md')}")
+    return report
+
+
+def build_report(
+    task: SweepTask,
+    results: List[Dict],
+    wall_seconds: float,
+    run_seconds: float,
+    n_cached: int
+) -> Dict:
+    """
+    Rank trials and summarize the time/accuracy trade-off.
+
+    Args:
+        task: Swept task
+        results: Trial results (this run's and cached)
+        wall_seconds: Wall time of this run's trials
+        run_seconds: Summed training time of this run's trials
+        n_cached: Trials taken from the cache
+    """
+    trials = sorted(
+        ({**r, "score": r["metrics"][task.metric]} for r in results),
+        key=lambda r: (-r["score"], r["seconds"])
+    )
+
+    best = trials[0] if trials else None
+    near_best = [t for t in trials if best and t["score"] >= best["score"] - 0.01 * abs(best["score"])]
+    cheapest_near_best = min(near_best, key=lambda t: t["seconds"]) if near_best else None
+
+    # Pareto front: no other trial is both faster and better
+    pareto = []
+    for t in sorted(trials, key=lambda t: (t["seconds"], -t["score"])):
+        if not pareto or t["score"] > pareto[-1]["score"]:
+            pareto.append(t)
+
+    return {
+        "task": task.name,
+        "metric": task.metric,
+        "n_trials": len(trials),
+        "n_cached": n_cached,
+        "wall_seconds": wall_seconds,
+        "run_seconds": run_seconds,
+        "parallel_speedup": run_seconds / wall_seconds if wall_seconds > 0 else None,
+        "total_trial_seconds": sum(t["seconds"] for t in trials),
+        "best": best,
+        "cheapest_near_best": cheapest_near_best,
+        "pareto": pareto,
+        "trials": trials,
+    }
+
+
+def format_report(report: Dict) -> str:
+    """Markdown version of a sweep report."""
+    metric = report["metric"]
+    lines = [
+        f"# Sweep report: {report['task']}",
+        "",
+        f"- Trials: {report['n_trials']} ({report['n_cached']} from cache)",
+        f"- Wall time this run: {report['wall_seconds']:.1f}s for {report['run_seconds']:.1f}s of training",
+        f"- Training time of all trials, cached included: {report['total_trial_seconds']:.1f}s",
+    ]
+    if report["parallel_speedup"]:
+        lines.append(f"- Parallel speedup: {report['parallel_speedup']:.1f}x")
+    if report["best"]:
+        best, cheap = report["best"], report["cheapest_near_best"]
+        lines += [
+            f"- Best {metric}: {best['score']:.4f} in {best['seconds']:.1f}s — `{json.dumps(best['config'])}`",
+            f"- Cheapest within 1% of best: {cheap['score']:.4f} in {cheap['seconds']:.1f}s "
+            f"({best['seconds'] / max(cheap['seconds'], 1e-9):.1f}x faster) — `{json.dumps(cheap['config'])}`",
+        ]
+
+    def table(trials: List[Dict]) -> List[str]:
+        metric_names = list(trials[0]["metrics"]) if trials else [metric]
+        rows = [
+            "| # | " + " | ".join(metric_names) + " | seconds | config |",
+            "|---|" + "---|" * len(metric_names) + "---|---|",
+        ]
+        for i, t in enumerate(trials, 1):
+            values = " | ".join(f"{t['metrics'][m]:.4f}" for m in metric_names)
+            rows.append(f"| {i} | {values} | {t['seconds']:.1f} | `{json.dumps(t['config'])}` |")
+        return rows
+
+    lines += ["", "## Time/accuracy Pareto front", ""] + table(report["pareto"])
+    lines += ["", "## All trials", ""] + table(report["trials"])
+    return "\n".join(lines) + "\n"
+
+
+def _parse_param(text: str):
+    """
+    'name=v1,v2' -> (name, [values]), values parsed as JSON when possible.
+
+    A JSON list is taken whole, e.g. 'tfidf__ngram_range=[[1,1],[1,2]]'.
+    """
+    name, _, values = text.partition("=")
+
+    def parse(value: str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+
+    whole = parse(values)
+    if isinstance(whole, list):
+        return name, whole
+    return name, [parse(v) for v in values.split(",")]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep")
+    parser.add_argument("task", choices=list(TASKS))
+    parser.add_argument("--search", default="grid", choices=["grid", "random"])
+    parser.add_argument("--n-trials", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--sweep-dir", default="./sweeps")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--param", action="append", default=[],
+                        help="Search space entry name=v1,v2 (replaces the default space)")
+    parser.add_argument("--data", action="append", default=[],
+                        help="Data parameter override name=value, e.g. duckdb_path=/data/searchflow.duckdb")
+    args = parser.parse_args()
+
+    space = dict(_parse_param(p) for p in args.param) or None
+    data_params = {name: values[0] for name, values in map(_parse_param, args.data)}
+
+    run_sweep(
+        args.task,
+        space=space,
+        search=args.search,
+        n_trials=args.n_trials,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        sweep_dir=args.sweep_dir,
+        data_params=data_params,
+        seed=args.seed,
+    )
@@ -0,0 +1,76 @@
+"""
+Shared fixtures for the ML engine tests.
+
+staging_db is a DuckDB warehouse holding the main_staging models with the
+columns their dbt models (dbt_transform/models/staging) produce.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add ml_engine to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+STAGING_COLUMNS = {
+    "stg_search_events": """
+        event_id VARCHAR, event_type VARCHAR, event_timestamp TIMESTAMP,
+        user_id VARCHAR, session_id VARCHAR, search_query VARCHAR,
+        results_count INTEGER, page_number INTEGER, platform VARCHAR,
+        device_type VARCHAR, geo_country VARCHAR, geo_city VARCHAR,
+        utm_source VARCHAR, utm_medium VARCHAR, utm_campaign VARCHAR,
+        ingested_at TIMESTAMP
+    """,
+    "stg_click_events": """
+        event_id VARCHAR, event_type VARCHAR, event_timestamp TIMESTAMP,
+        user_id VARCHAR, session_id VARCHAR, search_event_id VARCHAR,
+        result_position INTEGER, result_id VARCHAR, result_type VARCHAR,
+        result_price DECIMAL(10,2), result_provider VARCHAR,
+        result_destination VARCHAR, ingested_at TIMESTAMP
+    """,
+    "stg_conversion_events": """
+        event_id VARCHAR, event_type VARCHAR, event_timestamp TIMESTAMP,
+        user_id VARCHAR, session_id VARCHAR, click_event_id VARCHAR,
+        booking_value DECIMAL(10,2), commission DECIMAL(10,2),
+        currency VARCHAR, product_type VARCHAR, provider VARCHAR,
+        ingested_at TIMESTAMP
+    """,
+}
+
+
+@pytest.fixture
+def staging_db(tmp_path) -> str:
+    """
+    Warehouse with 200 users searching and clicking 30 destinations.
+
+    Events are spread over the last 20 days, one per hour, so users differ
+    in how recently they were active.
+    """
+    duckdb = pytest.importorskip("duckdb")
+
+    path = str(tmp_path / "searchflow.duckdb")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE SCHEMA main_staging")
+    for table, columns in STAGING_COLUMNS.items():
+        conn.execute(f"CREATE TABLE main_staging.{table} ({columns})")
+
+    conn.execute("""
+        INSERT INTO main_staging.stg_search_events
+            (event_id, event_type, event_timestamp, user_id, session_id, search_query, ingested_at)
+        SELECT 's' || i, 'search', now()::TIMESTAMP - i * INTERVAL 1 hour,
+               'user_' || (i * 7 % 200), 'session_' || (i // 3),
+               'destination_' || (i * 13 % 30), now()::TIMESTAMP
+        FROM range(480) t(i)
+    """)
+    conn.execute("""
+        INSERT INTO main_staging.stg_click_events
+            (event_id, event_type, event_timestamp, user_id, session_id, result_destination, ingested_at)
+        SELECT 'c' || i, 'click', now()::TIMESTAMP - i * INTERVAL 1 hour,
+               'user_' || (i * 7 % 200), 'session_' || (i // 3),
+               'destination_' || (i * 13 % 30), now()::TIMESTAMP
+        FROM range(0, 480, 2) t(i)
+    """)
+    conn.close()
+    return path
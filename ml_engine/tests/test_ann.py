@@ -0,0 +1,46 @@
+"""Recall and latency of the IVF index defaults against exact search."""
+
+import time
+
+import numpy as np
+
+from src.models.ann import IVFIndex, top_k
+
+
+def _median_seconds(search, queries) -> float:
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def test_catalogs_up_to_threshold_are_exact():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50_000, 50)).astype(np.float32)
+    query = rng.normal(size=50).astype(np.float32)
+
+    index = IVFIndex().build(vectors)
+
+    assert index.is_exact
+    np.testing.assert_array_equal(index.search(query, 10)[0], top_k(vectors @ query, 10))
+
+
+def test_default_index_beats_exact_search_on_unstructured_factors():
+    # Gaussian factors have no cluster structure: the worst case for IVF
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200_000, 50)).astype(np.float32)
+    queries = rng.normal(size=(100, 50)).astype(np.float32)
+
+    index = IVFIndex().build(vectors)
+    assert not index.is_exact
+
+    recall = np.mean([
+        len(set(index.search(q, 10)[0]) & set(top_k(vectors @ q, 10))) / 10 for q in queries
+    ])
+    assert recall >= 0.8
+
+    ivf = _median_seconds(lambda q: index.search(q, 10), queries)
+    exact = _median_seconds(lambda q: top_k(vectors @ q, 10), queries)
+    assert ivf < exact
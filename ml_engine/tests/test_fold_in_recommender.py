@@ -0,0 +1,51 @@
+"""Tests for the recommender fold-in job."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.recommendation import HybridRecommender
+from src.training.fold_in_recommender import fold_in_recommender, load_recent_user_interactions
+from src.training.train_recommender import generate_item_features, load_interaction_data
+
+
+FEATURE_COLS = ['price_level', 'popularity', 'beach_score', 'city_score', 'family_friendly', 'luxury_score']
+
+
+@pytest.mark.parametrize("aggregation", ["max", "sum"])
+def test_recent_interactions_match_training_rows(staging_db, aggregation):
+    recent = load_recent_user_interactions(staging_db, since_hours=24, aggregation=aggregation)
+    trained = load_interaction_data(staging_db, aggregation=aggregation)
+
+    assert list(recent.columns) == ["user_id", "item_id", "rating", "n_interactions"]
+    # Users active in the last 24h: events 0..23 hours old
+    assert set(recent["user_id"]) == {f"user_{i * 7 % 200}" for i in range(24)}
+
+    # Each active user's full history, rated like training rows
+    merged = recent.astype({"user_id": str, "item_id": str}).merge(
+        trained.astype({"user_id": str, "item_id": str}),
+        on=["user_id", "item_id"], how="left", suffixes=("", "_trained")
+    )
+    assert len(merged) == (trained["user_id"].isin(recent["user_id"])).sum()
+    np.testing.assert_array_equal(merged["rating"], merged["rating_trained"])
+    np.testing.assert_array_equal(merged["n_interactions"], merged["n_interactions_trained"])
+
+
+def test_fold_in_recommender_adds_recent_users(staging_db, tmp_path):
+    interactions = load_interaction_data(staging_db).astype({"user_id": str, "item_id": str})
+    recent_users = {f"user_{i * 7 % 200}" for i in range(24)}
+    items_df = generate_item_features(interactions["item_id"].unique().tolist())
+
+    model_path = str(tmp_path / "recommendation")
+    recommender = HybridRecommender(n_factors=8)
+    recommender.fit(interactions[~interactions["user_id"].isin(recent_users)], items_df, FEATURE_COLS)
+    recommender.save(model_path)
+    assert not any(user in recommender.collaborative.user_index for user in recent_users)
+
+    folded = fold_in_recommender(staging_db, model_path, since_hours=24)
+
+    assert all(user in folded.collaborative.user_index for user in recent_users)
+    reloaded = HybridRecommender.load(model_path)
+    user = sorted(recent_users)[0]
+    assert reloaded.predict(user, top_n=5).recommendations == folded.predict(user, top_n=5).recommendations
+    assert reloaded.predict(user, top_n=5).recommendations
@@ -0,0 +1,73 @@
+"""Batched ranking metrics against the list-based reference definitions."""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.evaluation import metrics
+
+
+def reference_precision(predicted, actual, k):
+    return len(set(predicted[:k]) & set(actual)) / k
+
+
+def reference_recall(predicted, actual, k):
+    return len(set(predicted[:k]) & set(actual)) / len(set(actual))
+
+
+def reference_ndcg(predicted, actual, k):
+    dcg = sum(1.0 / np.log2(i + 2) for i, item in enumerate(predicted[:k]) if item in set(actual))
+    idcg = sum(1.0 / np.log2(i + 2) for i in range(min(len(actual), k)))
+    return dcg / idcg
+
+
+def reference_average_precision(predicted, actual, k):
+    hits, total = 0, 0.0
+    for i, item in enumerate(predicted[:k]):
+        if item in set(actual):
+            hits += 1
+            total += hits / (i + 1)
+    return total / min(len(set(actual)), k)
+
+
+def random_lists(rng, items, n_users, max_len):
+    return [[rng.choice(items) for _ in range(rng.randint(1, max_len))] for _ in range(n_users)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_list_metrics_match_reference_with_missing_ids(seed):
+    rng = random.Random(seed)
+    items = [f'item_{j}' for j in range(12)]
+    # Missing IDs only among predictions: the reference would match None to None
+    predicted_lists = random_lists(rng, items + [None, np.nan], 6, 14)
+    actual_lists = random_lists(rng, items, 6, 8)
+    k = rng.randint(1, 12)
+
+    for predicted, actual in zip(predicted_lists, actual_lists):
+        assert metrics.precision_at_k(predicted, actual, k) == pytest.approx(reference_precision(predicted, actual, k))
+        assert metrics.recall_at_k(predicted, actual, k) == pytest.approx(reference_recall(predicted, actual, k))
+        assert metrics.ndcg_at_k(predicted, actual, k) == pytest.approx(reference_ndcg(predicted, actual, k))
+
+    expected_map = np.mean([reference_average_precision(p, a, k) for p, a in zip(predicted_lists, actual_lists)])
+    expected_hits = sum(bool(set(p[:k]) & set(a)) for p, a in zip(predicted_lists, actual_lists))
+    # None and NaN are recommended as a single missing item
+    recommended = {None if item is np.nan else item for p in predicted_lists for item in p[:k]}
+    expected_coverage = len(recommended) / len(items)
+    assert metrics.mean_average_precision(predicted_lists, actual_lists, k) == pytest.approx(expected_map)
+    assert metrics.hit_rate(predicted_lists, actual_lists, k) == pytest.approx(expected_hits / len(predicted_lists))
+    assert metrics.coverage(predicted_lists, set(items), k) == pytest.approx(expected_coverage)
+
+
+def test_missing_ids_are_never_hits():
+    predicted = [None, 'a', np.nan]
+    actual = [None, 'a', 'b']
+
+    rankings, relevance, items = metrics.encode_rankings([predicted], [actual], k=3)
+
+    assert list(items) == ['a', 'b']
+    assert rankings[0, 0] >= len(items) and rankings[0, 2] == rankings[0, 0]
+    assert metrics.ranking_hits(rankings, relevance).tolist() == [[False, True, False]]
+    # The missing actual ID still counts as relevant
+    assert metrics.recall_at_k(predicted, actual, k=3) == pytest.approx(1 / 3)
+    assert metrics.mean_average_precision([predicted], [actual], k=3) == pytest.approx(0.5 / 3)
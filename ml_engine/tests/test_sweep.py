@@ -0,0 +1,50 @@
+"""Tests for sweep data preparation and trial caching."""
+
+import glob
+import os
+
+import duckdb
+import pytest
+
+from src.models.artifacts import load_artifact
+from src.training.sweep import RecommenderTask, data_key, prepare_data, run_sweep
+
+
+SPACE = {"algorithm": ["svd"], "n_factors": [8]}
+
+
+def test_recommender_data_comes_from_the_warehouse(staging_db, tmp_path):
+    task = RecommenderTask()
+    key = data_key(task, {**task.data_defaults, "duckdb_path": staging_db})
+    assert key["source"] != "synthetic"
+
+    manifest, arrays = load_artifact(prepare_data(task, str(tmp_path), key))
+    assert manifest["source"] == key["source"]
+    assert set(arrays["item_ids"].tolist()) == {f"destination_{i}" for i in range(30)}
+
+
+def test_unreadable_warehouse_is_never_cached_as_real_data(staging_db, tmp_path):
+    # Warehouse answers the fingerprint but not the interaction query
+    conn = duckdb.connect(staging_db)
+    conn.execute("ALTER TABLE main_staging.stg_search_events RENAME COLUMN search_query TO query")
+    conn.close()
+
+    sweep_dir = str(tmp_path / "sweeps")
+    with pytest.raises(duckdb.Error):
+        run_sweep("recommender", space=SPACE, workers=1, sweep_dir=sweep_dir,
+                  data_params={"duckdb_path": staging_db})
+
+    assert not glob.glob(os.path.join(sweep_dir, "recommender", "data-*", "manifest.json"))
+    assert not glob.glob(os.path.join(sweep_dir, "recommender", "trials", "*.json"))
+
+
+def test_synthetic_trials_are_not_cached(tmp_path):
+    sweep_dir = str(tmp_path / "sweeps")
+    data_params = {"duckdb_path": str(tmp_path / "missing.duckdb")}
+
+    for _ in range(2):
+        report = run_sweep("recommender", space=SPACE, workers=1, sweep_dir=sweep_dir, data_params=data_params)
+        assert report["n_trials"] == 1
+        assert report["n_cached"] == 0
+
+    assert not glob.glob(os.path.join(sweep_dir, "recommender", "trials", "*.json"))
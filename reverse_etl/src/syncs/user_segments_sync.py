@@ -1,7 +1,7 @@
 """Sync user segments from warehouse to CRM table."""
 
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import logging
 
 import duckdb
@@ -19,6 +19,11 @@ class UserSegmentsSync:
     - Sales team to see high-value user segments
     - Marketing to target specific segments with campaigns
     - Support to understand user context
+    
+    mart_user_segments is incremental: every row it rewrites gets a new
+    segmented_at. Only users with segmented_at past the newest value already
+    in the CRM (source_segmented_at) are extracted, so each run ships just
+    the changed users.
     """
     
     def __init__(self, warehouse_path: str, postgres_config: Dict[str, Any]):
@@ -36,9 +41,13 @@ class UserSegmentsSync:
         logger.info("Starting user segments sync...")
         
         try:
-            # Extract from warehouse
-            segments = self._extract_segments()
-            logger.info(f"Extracted {len(segments)} segments from warehouse")
+            # Extract users changed since the last sync
+            watermark = self._get_watermark()
+            segments = self._extract_segments(since=watermark)
+            logger.info(
+                f"Extracted {len(segments)} changed segments from warehouse "
+                f"(since {watermark or 'beginning'})"
+            )
             
             # Load to CRM
             upserted, unchanged = self._load_to_crm(segments)
@@ -48,6 +57,7 @@ class UserSegmentsSync:
             metrics = {
                 "sync_type": "user_segments",
                 "status": "success",
+                "full_sync": watermark is None,
                 "rows_extracted": len(segments),
                 "rows_upserted": upserted,
                 "rows_unchanged": unchanged,
@@ -66,8 +76,31 @@ class UserSegmentsSync:
                 "duration_seconds": (datetime.utcnow() - start_time).total_seconds()
             }
     
-    def _extract_segments(self) -> List[tuple]:
-        """Extract user segments from warehouse."""
+    def _get_watermark(self) -> Optional[datetime]:
+        """Newest warehouse segmented_at already synced to the CRM (UTC)."""
+        conn = psycopg2.connect(**self.postgres_config)
+        cursor = conn.cursor()
+        
+        # Older CRM tables predate the watermark column
+        cursor.execute("""
+            ALTER TABLE crm_user_segments
+            ADD COLUMN IF NOT EXISTS source_segmented_at TIMESTAMP
+        """)
+        cursor.execute("SELECT MAX(source_segmented_at) FROM crm_user_segments")
+        watermark = cursor.fetchone()[0]
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return watermark
+    
+    def _extract_segments(self, since: Optional[datetime] = None) -> List[tuple]:
+        """
+        Extract user segments from warehouse.
+        
+        Args:
+            since: Only users re-segmented after this UTC timestamp (all if None)
+        """
         conn = duckdb.connect(self.warehouse_path, read_only=True)
         
         result = conn.execute("""
@@ -80,10 +113,12 @@ class UserSegmentsSync:
                 primary_platform,
                 primary_country,
                 first_seen_at,
-                last_seen_at
+                last_seen_at,
+                segmented_at AT TIME ZONE 'UTC' AS source_segmented_at
             FROM main_marketing.mart_user_segments
             WHERE user_id IS NOT NULL
-        """).fetchall()
+              AND ($since IS NULL OR segmented_at AT TIME ZONE 'UTC' > $since)
+        """, {"since": since}).fetchall()
         
         conn.close()
         return result
@@ -106,7 +141,7 @@ class UserSegmentsSync:
             INSERT INTO crm_user_segments (
                 user_id, segment, engagement_score, lifetime_revenue,
                 lifetime_conversions, primary_platform, primary_country,
-                first_seen_at, last_seen_at, synced_at
+                first_seen_at, last_seen_at, source_segmented_at, synced_at
             ) VALUES %s
             ON CONFLICT (user_id) DO UPDATE SET
                 previous_segment = crm_user_segments.segment,
@@ -118,6 +153,7 @@ class UserSegmentsSync:
                 primary_country = EXCLUDED.primary_country,
                 first_seen_at = EXCLUDED.first_seen_at,
                 last_seen_at = EXCLUDED.last_seen_at,
+                source_segmented_at = EXCLUDED.source_segmented_at,
                 synced_at = CURRENT_TIMESTAMP,
                 segment_changed_at = CASE 
                     WHEN crm_user_segments.segment != EXCLUDED.segment 
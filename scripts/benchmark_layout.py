@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Benchmark the physical layout of staging/intermediate tables.
+
+Generates a synthetic event set directly in DuckDB (50M events by default)
+and exposes it three ways:
+- view:    raw JSON payloads parsed on every read, as the staging views did
+- arrival: typed staging tables in arrival (ingestion) order
+- sorted:  typed staging tables sorted by day/session/time, as the staging
+           models now write them
+then times the queries behind the slowest dbt steps (session and journey
+rebuilds) plus the incremental and time-window scans of the marts.
+
+Also measures what an ART index costs and buys on a user-keyed table.
+
+Usage:
+    python scripts/benchmark_layout.py --events 50000000
+"""
+
+import argparse
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+import duckdb
+
+
+LAYOUTS = {
+    # Staging views over raw JSON (arrival order)
+    "view": None,
+    # Arrival order: batches land in ingested_at order with sessions interleaved
+    "arrival": "ingested_at",
+    # Layout written by the staging models
+    "sorted": "DATE_TRUNC('day', event_timestamp), session_id, event_timestamp",
+}
+
+# JSON payload fields per event table: (column, JSON key, SQL type)
+PAYLOAD_FIELDS = {
+    "searches": [
+        ("event_timestamp", "timestamp", "TIMESTAMP"),
+        ("user_id", "user_id", "VARCHAR"),
+        ("session_id", "session_id", "VARCHAR"),
+        ("platform", "platform", "VARCHAR"),
+    ],
+    "clicks": [
+        ("event_timestamp", "timestamp", "TIMESTAMP"),
+        ("user_id", "user_id", "VARCHAR"),
+        ("session_id", "session_id", "VARCHAR"),
+        ("search_event_id", "search_event_id", "VARCHAR"),
+        ("result_position", "result_position", "INTEGER"),
+    ],
+    "conversions": [
+        ("event_timestamp", "timestamp", "TIMESTAMP"),
+        ("user_id", "user_id", "VARCHAR"),
+        ("session_id", "session_id", "VARCHAR"),
+        ("click_event_id", "click_event_id", "VARCHAR"),
+        ("booking_value", "booking_value", "DECIMAL(10, 2)"),
+    ],
+}
+
+# Share of events per type, close to the generator's funnel
+SEARCH_SHARE = 0.58
+CLICK_RATE = 0.64        # clicks per search
+CONVERSION_RATE = 0.125  # conversions per click
+
+
+def generate_events(conn: duckdb.DuckDBPyConnection, n_events: int, days: int = 60):
+    """Generate search/click/conversion events into the `bench` schema."""
+    n_searches = int(n_events * SEARCH_SHARE)
+    n_sessions = max(1, n_searches // 3)
+    n_users = max(1, n_sessions // 8)
+
+    conn.execute("CREATE SCHEMA IF NOT EXISTS bench")
+
+    # Sessions: random start within the period, random user, 1-5 searches
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE bench.sessions AS
+        SELECT
+            md5(i::VARCHAR) AS session_id,
+            'user_' || (hash(i, 'user') % {n_users})::VARCHAR AS user_id,
+            TIMESTAMP '2024-01-01'
+                + to_seconds((hash(i, 'start') % ({days} * 86400))::BIGINT) AS session_start,
+            1 + (hash(i, 'len') % 5)::INTEGER AS n_searches,
+            ['web', 'ios', 'android'][1 + (hash(i, 'platform') % 3)::INTEGER] AS platform
+        FROM range({n_sessions}) t(i)
+    """)
+
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE bench.searches_raw AS
+        SELECT
+            md5(s.session_id || j::VARCHAR) AS event_id,
+            s.session_id,
+            s.user_id,
+            s.platform,
+            s.session_start + to_seconds(j * 90) AS event_timestamp
+        FROM bench.sessions s, range(5) r(j)
+        WHERE j < s.n_searches
+        LIMIT {n_searches}
+    """)
+
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE bench.clicks_raw AS
+        SELECT
+            md5(event_id || 'click') AS event_id,
+            session_id,
+            user_id,
+            event_id AS search_event_id,
+            1 + (hash(event_id, 'pos') % 10)::INTEGER AS result_position,
+            event_timestamp + INTERVAL 30 SECOND AS event_timestamp
+        FROM bench.searches_raw
+        WHERE hash(event_id, 'click') % 1000 < {int(CLICK_RATE * 1000)}
+    """)
+
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE bench.conversions_raw AS
+        SELECT
+            md5(event_id || 'conversion') AS event_id,
+            session_id,
+            user_id,
+            event_id AS click_event_id,
+            100 + (hash(event_id, 'value') % 900)::DECIMAL(10, 2) AS booking_value,
+            event_timestamp + INTERVAL 5 MINUTE AS event_timestamp
+        FROM bench.clicks_raw
+        WHERE hash(event_id, 'conversion') % 1000 < {int(CONVERSION_RATE * 1000)}
+    """)
+
+    # Ingestion delay: minutes for most events, hours for 1% late arrivals
+    for table in ("searches", "clicks", "conversions"):
+        conn.execute(f"""
+            CREATE OR REPLACE TABLE bench.{table}_raw AS
+            SELECT
+                *,
+                event_timestamp + to_seconds(
+                    CASE WHEN hash(event_id, 'late') % 100 = 0
+                         THEN 3600 + hash(event_id, 'delay') % 21600
+                         ELSE hash(event_id, 'delay') % 600
+                    END::BIGINT
+                ) AS ingested_at
+            FROM bench.{table}_raw
+        """)
+
+    counts = {
+        table: conn.execute(f"SELECT COUNT(*) FROM bench.{table}_raw").fetchone()[0]
+        for table in ("searches", "clicks", "conversions")
+    }
+    conn.execute("DROP TABLE bench.sessions")
+    return counts
+
+
+def write_layouts(conn: duckdb.DuckDBPyConnection) -> Dict[str, float]:
+    """Write every event table once per layout; return write time per layout."""
+    write_seconds = {}
+
+    # Raw JSON tables in arrival order, like raw.*_events
+    conn.execute("CREATE SCHEMA IF NOT EXISTS raw")
+    for table, fields in PAYLOAD_FIELDS.items():
+        payload = ", ".join(f"'{key}', {column}" for column, key, _ in fields)
+        conn.execute(f"""
+            CREATE OR REPLACE TABLE raw.{table} AS
+            SELECT event_id, json_object({payload}) AS payload, ingested_at
+            FROM bench.{table}_raw
+            ORDER BY ingested_at
+        """)
+
+    for layout, order_by in LAYOUTS.items():
+        conn.execute(f"CREATE SCHEMA IF NOT EXISTS {layout}")
+        start = time.perf_counter()
+        for table, fields in PAYLOAD_FIELDS.items():
+            if order_by is None:
+                columns = ",\n".join(
+                    f"CAST(json_extract_string(payload, '$.{key}') AS {sql_type}) AS {column}"
+                    for column, key, sql_type in fields
+                )
+                conn.execute(f"""
+                    CREATE OR REPLACE VIEW {layout}.{table} AS
+                    SELECT event_id, {columns}, ingested_at
+                    FROM raw.{table}
+                """)
+            else:
+                conn.execute(f"""
+                    CREATE OR REPLACE TABLE {layout}.{table} AS
+                    SELECT * FROM bench.{table}_raw
+                    ORDER BY {order_by}
+                """)
+        conn.execute("CHECKPOINT")
+        write_seconds[layout] = time.perf_counter() - start
+    return write_seconds
+
+
+def benchmark_queries(layout: str) -> List[Tuple[str, str]]:
+    """Queries mirroring the dbt steps, against one layout's schema."""
+    return [
+        ("int_search_sessions rebuild", f"""
+            CREATE OR REPLACE TABLE {layout}.sessions AS
+            WITH session_searches AS (
+                SELECT session_id, user_id, MIN(event_timestamp) AS session_start,
+                       MAX(event_timestamp) AS session_end, COUNT(*) AS search_count
+                FROM {layout}.searches GROUP BY session_id, user_id
+            ),
+            session_clicks AS (
+                SELECT session_id, COUNT(*) AS click_count, AVG(result_position) AS avg_click_position
+                FROM {layout}.clicks GROUP BY session_id
+            ),
+            session_conversions AS (
+                SELECT session_id, COUNT(*) AS conversion_count, SUM(booking_value) AS revenue
+                FROM {layout}.conversions GROUP BY session_id
+            )
+            SELECT ss.*, COALESCE(sc.click_count, 0) AS click_count, sc.avg_click_position,
+                   COALESCE(scv.conversion_count, 0) AS conversion_count, scv.revenue
+            FROM session_searches ss
+            LEFT JOIN session_clicks sc ON ss.session_id = sc.session_id
+            LEFT JOIN session_conversions scv ON ss.session_id = scv.session_id
+            ORDER BY DATE_TRUNC('day', ss.session_start), ss.user_id, ss.session_start
+        """),
+        ("int_user_journeys joins", f"""
+            SELECT COUNT(*), COUNT(c.event_id), SUM(cv.booking_value)
+            FROM {layout}.searches s
+            LEFT JOIN {layout}.clicks c ON s.event_id = c.search_event_id
+            LEFT JOIN {layout}.conversions cv ON c.event_id = cv.click_event_id
+        """),
+        ("incremental touched sessions", f"""
+            WITH touched AS (
+                SELECT session_id FROM {layout}.searches
+                WHERE ingested_at > (SELECT MAX(ingested_at) FROM {layout}.searches) - INTERVAL 3 HOUR
+                UNION
+                SELECT session_id FROM {layout}.clicks
+                WHERE ingested_at > (SELECT MAX(ingested_at) FROM {layout}.clicks) - INTERVAL 3 HOUR
+            )
+            SELECT session_id, COUNT(*), MAX(event_timestamp)
+            FROM {layout}.searches
+            WHERE session_id IN (SELECT session_id FROM touched)
+            GROUP BY session_id
+        """),
+        ("48h abandoned-search window", f"""
+            WITH horizon AS (SELECT MAX(event_timestamp) - INTERVAL 48 HOUR AS since FROM {layout}.searches)
+            SELECT COUNT(DISTINCT s.user_id)
+            FROM {layout}.searches s
+            WHERE s.event_timestamp >= (SELECT since FROM horizon)
+              AND s.user_id NOT IN (
+                SELECT user_id FROM {layout}.conversions
+                WHERE event_timestamp >= (SELECT since FROM horizon)
+              )
+        """),
+        ("dim_users aggregation", f"""
+            SELECT user_id, MIN(session_start), MAX(session_end), COUNT(*),
+                   SUM(search_count), SUM(click_count), SUM(conversion_count)
+            FROM {layout}.sessions
+            GROUP BY user_id
+        """),
+    ]
+
+
+def best_of(run: Callable[[], None], repeat: int) -> float:
+    """Best wall-clock time of `repeat` runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_art_index(conn: duckdb.DuckDBPyConnection, lookups: int, repeat: int) -> Dict[str, float]:
+    """Insert and point-lookup cost of an ART index on a user-keyed table."""
+    results = {}
+    user_ids = [
+        row[0] for row in conn.execute(f"""
+            SELECT user_id FROM sorted.sessions USING SAMPLE {lookups} ROWS
+        """).fetchall()
+    ]
+
+    for indexed in (False, True):
+        label = "art" if indexed else "no_index"
+        conn.execute("""
+            CREATE OR REPLACE TABLE bench.users AS
+            SELECT user_id, COUNT(*) AS total_sessions, MAX(session_end) AS last_seen_at
+            FROM sorted.sessions GROUP BY user_id
+        """)
+
+        def build():
+            conn.execute("DROP INDEX IF EXISTS bench.users_user_id_idx")
+            conn.execute("CREATE INDEX users_user_id_idx ON bench.users (user_id)")
+
+        if indexed:
+            results[f"{label}_build"] = best_of(build, repeat)
+
+        # delete+insert of 1% of users, as an incremental dim_users run does
+        def upsert():
+            conn.execute("""
+                CREATE OR REPLACE TEMP TABLE changed AS
+                SELECT * FROM bench.users USING SAMPLE 1 PERCENT (bernoulli)
+            """)
+            conn.execute("DELETE FROM bench.users WHERE user_id IN (SELECT user_id FROM changed)")
+            conn.execute("INSERT INTO bench.users SELECT * FROM changed")
+
+        results[f"{label}_upsert"] = best_of(upsert, repeat)
+
+        def lookup():
+            for user_id in user_ids:
+                conn.execute(
+                    "SELECT * FROM bench.users WHERE user_id = ?", [user_id]
+                ).fetchall()
+
+        results[f"{label}_lookups"] = best_of(lookup, repeat)
+
+    conn.execute("DROP TABLE bench.users")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark staging/intermediate table layouts")
+    parser.add_argument("--events", type=int, default=50_000_000, help="Total events to generate")
+    parser.add_argument("--db", default="data/benchmark_layout.duckdb", help="Scratch database path")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query (best is reported)")
+    parser.add_argument("--lookups", type=int, default=1000, help="Point lookups for the ART benchmark")
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB threads (default: all cores)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    conn = duckdb.connect(args.db)
+    if args.threads:
+        conn.execute(f"SET threads = {args.threads}")
+
+    print(f"[INFO] Database: {args.db}")
+    start = time.perf_counter()
+    counts = generate_events(conn, args.events)
+    total = sum(counts.values())
+    print(f"[INFO] Generated {total:,} events in {time.perf_counter() - start:.1f}s")
+    for table, count in counts.items():
+        print(f"  {table}: {count:,}")
+    print()
+
+    write_seconds = write_layouts(conn)
+    conn.execute("DROP SCHEMA bench CASCADE")
+    conn.execute("CREATE SCHEMA bench")
+
+    timings = {layout: {} for layout in LAYOUTS}
+    for layout in LAYOUTS:
+        for name, sql in benchmark_queries(layout):
+            timings[layout][name] = best_of(lambda: conn.execute(sql).fetchall(), args.repeat)
+
+    header = "".join(f"{layout:>12}" for layout in LAYOUTS)
+    print(f"{'step':<32}{header}{'view/sorted':>13}{'arrival/sorted':>16}")
+    print(f"{'write staging (per full build)':<32}"
+          + "".join(f"{write_seconds[layout]:>11.2f}s" for layout in LAYOUTS))
+    for name, _ in benchmark_queries("sorted"):
+        row = [timings[layout][name] for layout in LAYOUTS]
+        print(f"{name:<32}" + "".join(f"{t:>11.2f}s" for t in row)
+              + f"{timings['view'][name] / timings['sorted'][name]:>12.2f}x"
+              + f"{timings['arrival'][name] / timings['sorted'][name]:>15.2f}x")
+
+    print()
+    art = benchmark_art_index(conn, args.lookups, args.repeat)
+    print(f"{'ART index on users.user_id':<32}{'no index':>12}{'art':>12}")
+    print(f"{'build':<32}{'-':>12}{art['art_build']:>11.2f}s")
+    print(f"{'delete+insert 1% of users':<32}{art['no_index_upsert']:>11.2f}s{art['art_upsert']:>11.2f}s")
+    print(f"{f'{args.lookups:,} point lookups':<32}{art['no_index_lookups']:>11.2f}s{art['art_lookups']:>11.2f}s")
+
+    conn.close()
+    if not args.keep:
+        os.remove(args.db)
+        if os.path.exists(args.db + ".wal"):
+            os.remove(args.db + ".wal")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Benchmark the warehouse as data grows: every dbt model plus the reverse-ETL
+extraction queries, at 1M/10M/100M events by default.
+
+For each dataset size:
+1. Generate raw events: a template of sessions from the event generator is
+   written to DuckDB, then replicated with fresh event/session/user IDs and
+   jittered timestamps up to the requested size (generating 100M events one
+   by one in Python would take hours)
+2. Build every model with `dbt run --full-refresh` and read per-model timings
+   from dbt's run_results.json; peak memory of the build process is recorded
+3. Optionally rebuild each model in its own dbt process (--isolate-models)
+   to attribute peak memory per model
+4. Time the SQL behind UserSegmentsSync, EmailTriggersSync and
+   RecommendationsSync, each in its own process with its peak memory
+
+Row counts come from verify_marts.count_rows. Results are written to
+report.json and a scaling report (report.md) in the output directory: time
+per model per size, the scaling exponent between consecutive sizes
+(1.0 = linear) and the models taking the largest share of the build.
+
+Usage:
+    python scripts/benchmark_warehouse.py
+    python scripts/benchmark_warehouse.py --sizes 1M,10M --isolate-models
+    python scripts/benchmark_warehouse.py --sizes 200k --keep   # quick run
+
+dbt is run from PATH (or DBT_EXECUTABLE) against dbt_transform/ (or
+DBT_PROJECT_DIR); the sync queries need the reverse_etl requirements.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DBT_DIR = Path(os.getenv("DBT_PROJECT_DIR", PROJECT_ROOT / "dbt_transform"))
+
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from verify_marts import RAW_TABLES, count_rows  # noqa: E402
+
+
+EVENT_TABLES = ["search_events", "click_events", "conversion_events"]
+
+# Payload keys holding IDs that must stay unique (and consistent) per copy
+ID_KEYS = {
+    "search_events": ["event_id", "session_id"],
+    "click_events": ["event_id", "session_id", "search_event_id"],
+    "conversion_events": ["event_id", "session_id", "click_event_id"],
+}
+
+# Reverse-ETL extraction queries: name -> (sync class, call on an instance)
+SYNC_QUERIES = {
+    "user_segments": ("UserSegmentsSync", lambda sync: sync._extract_segments()),
+    "email_triggers": ("EmailTriggersSync", lambda sync: sync._find_abandoned_searches()),
+    "recommendations": ("RecommendationsSync", lambda sync: sync._extract_recommendations()),
+}
+
+# Scaling exponent above which a model is flagged as superlinear
+SUPERLINEAR_EXPONENT = 1.2
+
+
+def parse_size(value: str) -> int:
+    """Parse an event count such as 1M, 250k or 5000000."""
+    value = value.strip().lower().replace("_", "")
+    multiplier = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}.get(value[-1:], 1)
+    number = value[:-1] if multiplier > 1 else value
+    return int(float(number) * multiplier)
+
+
+def format_size(n_events: int) -> str:
+    """Short label for an event count (1M, 250k, ...)."""
+    for suffix, unit in (("B", 1_000_000_000), ("M", 1_000_000), ("k", 1_000)):
+        if n_events >= unit and n_events % unit == 0:
+            return f"{n_events // unit}{suffix}"
+    return str(n_events)
+
+
+def _read_peak_rss_kb(pid: int) -> int:
+    """High-water RSS of a running process from /proc (Linux), 0 elsewhere."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def run_measured(cmd: List[str], log_path: Path, env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Run a command and measure its wall time and peak resident memory.
+
+    Output goes to log_path. Peak memory includes an in-process DuckDB
+    (dbt-duckdb, the syncs). On Linux the child's VmHWM is polled, since
+    ru_maxrss carries over this process's RSS across fork/exec; elsewhere
+    the child's ru_maxrss is used.
+    """
+    start = time.perf_counter()
+    peak_kb = 0
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        while True:
+            peak_kb = max(peak_kb, _read_peak_rss_kb(proc.pid))
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            time.sleep(0.05)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    if not peak_kb:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return {
+        "exit_code": proc.returncode,
+        "seconds": time.perf_counter() - start,
+        "peak_memory_mb": peak_kb / 1024,
+    }
+
+
+# =============================================================================
+# Dataset generation
+# =============================================================================
+
+def write_template(conn: duckdb.DuckDBPyConnection, n_events: int, days: int, seed: int) -> int:
+    """
+    Generate sessions with the event generator into the bench_template schema.
+
+    Each session is shifted to a random start within the last `days` days;
+    the generator itself stamps every event with the current time.
+    """
+    from event_generator.src.config import Config
+    from event_generator.src.generator import EventGenerator
+
+    random.seed(seed)
+    generator = EventGenerator(Config())
+
+    generated = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        with ExitStack() as stack:
+            files = {
+                table: stack.enter_context(open(Path(tmp) / f"{table}.jsonl", "w"))
+                for table in EVENT_TABLES
+            }
+            while generated < n_events:
+                shift = timedelta(seconds=random.randint(0, days * 86400))
+                for event in generator.generate_session():
+                    timestamp = datetime.fromisoformat(event["timestamp"].rstrip("Z")) - shift
+                    event["timestamp"] = timestamp.isoformat() + "Z"
+                    files[f"{event['event_type']}_events"].write(json.dumps(event) + "\n")
+                    generated += 1
+
+        conn.execute("CREATE SCHEMA IF NOT EXISTS bench_template")
+        for table in EVENT_TABLES:
+            path = str(Path(tmp) / f"{table}.jsonl")
+            conn.execute(f"""
+                CREATE OR REPLACE TABLE bench_template.{table} AS
+                WITH lines AS (
+                    SELECT content::JSON AS payload
+                    FROM read_csv('{path}',
+                        header=false,
+                        columns={{'content': 'VARCHAR'}},
+                        quote='',
+                        escape='',
+                        delim='\x01'
+                    )
+                )
+                SELECT
+                    payload,
+                    json_extract_string(payload, '$.session_id') AS session_id,
+                    json_extract_string(payload, '$.user_id') AS user_id,
+                    CAST(json_extract_string(payload, '$.timestamp') AS TIMESTAMP) AS event_timestamp
+                FROM lines
+            """)
+
+    return generated
+
+
+def scale_events(conn: duckdb.DuckDBPyConnection, copies: int):
+    """
+    Replicate the template `copies` times into the raw event tables.
+
+    Every copy gets its own event, session and user IDs (users are suffixed
+    with the copy number, so the user base grows with the data) and a
+    per-session time jitter of +/- 12 hours. Events are ingested 0-10
+    minutes after they happen.
+    """
+    conn.execute("CREATE SCHEMA IF NOT EXISTS raw")
+    for table in EVENT_TABLES:
+        shift = "to_seconds((hash(t.session_id, k) % 86400)::BIGINT - 43200)"
+        patch = ", ".join(
+            f"'{key}', md5(json_extract_string(t.payload, '$.{key}') || k::VARCHAR)"
+            for key in ID_KEYS[table]
+        )
+        conn.execute(f"""
+            CREATE OR REPLACE TABLE raw.{table} AS
+            WITH copies AS (
+                SELECT
+                    t.payload,
+                    k,
+                    md5(json_extract_string(t.payload, '$.event_id') || k::VARCHAR) AS event_id,
+                    t.user_id || '_' || k::VARCHAR AS user_id,
+                    t.event_timestamp + {shift} AS event_timestamp
+                FROM bench_template.{table} t, range({copies}) r(k)
+            )
+            SELECT
+                event_id,
+                json_merge_patch(t.payload, json_object(
+                    {patch},
+                    'user_id', user_id,
+                    'timestamp', strftime(event_timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
+                )) AS payload,
+                event_timestamp + to_seconds((hash(event_id) % 600)::BIGINT) AS ingested_at
+            FROM copies t
+        """)
+
+
+def generate_dataset(db_path: Path, n_events: int, template_events: int, days: int, seed: int) -> Dict[str, Any]:
+    """Generate a raw warehouse with about n_events events."""
+    start = time.perf_counter()
+    conn = duckdb.connect(str(db_path))
+
+    template_size = write_template(conn, min(template_events, n_events), days, seed)
+    copies = max(1, round(n_events / template_size))
+    scale_events(conn, copies)
+    conn.execute("DROP SCHEMA bench_template CASCADE")
+
+    raw_counts = count_rows(conn, RAW_TABLES)
+    conn.close()
+
+    return {
+        "template_events": template_size,
+        "copies": copies,
+        "events": sum(c or 0 for c in raw_counts.values()),
+        "raw_rows": raw_counts,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# =============================================================================
+# dbt models
+# =============================================================================
+
+def dbt_command(args: List[str], run_dir: Path) -> List[str]:
+    """dbt invocation against the project with per-run target/log paths."""
+    return [
+        os.getenv("DBT_EXECUTABLE", "dbt"), *args,
+        "--project-dir", str(DBT_DIR),
+        "--profiles-dir", str(DBT_DIR),
+        "--target-path", str(run_dir / "target"),
+        "--log-path", str(run_dir / "logs"),
+    ]
+
+
+def read_run_results(run_dir: Path) -> List[Dict[str, Any]]:
+    """Per-model status, execution time and relation from run_results.json."""
+    path = run_dir / "target" / "run_results.json"
+    if not path.exists():
+        return []
+
+    results = json.loads(path.read_text())["results"]
+    return [
+        {
+            "model": r["unique_id"].split(".")[-1],
+            "status": r["status"],
+            "seconds": r["execution_time"],
+            "relation": r.get("relation_name"),
+            "message": r.get("message"),
+        }
+        for r in results
+        if r["unique_id"].startswith("model.")
+    ]
+
+
+def build_models(db_path: Path, run_dir: Path, isolate: bool) -> Dict[str, Any]:
+    """Full-refresh every model, then optionally rebuild each one alone."""
+    env = {**os.environ, "DUCKDB_PATH": str(db_path)}
+
+    build_dir = run_dir / "build"
+    build_dir.mkdir(parents=True, exist_ok=True)
+    build = run_measured(
+        dbt_command(["run", "--full-refresh"], build_dir), build_dir / "dbt.log", env
+    )
+    models = read_run_results(build_dir)
+    if build["exit_code"] != 0 and not models:
+        raise RuntimeError(f"dbt run failed, see {build_dir / 'dbt.log'}")
+    print(f"[INFO]   dbt run: {build['seconds']:.1f}s, peak {build['peak_memory_mb']:,.0f} MB, "
+          f"{sum(m['status'] == 'success' for m in models)}/{len(models)} models OK")
+
+    if isolate:
+        # Upstream tables exist after the full build, so each model can be
+        # rebuilt on its own to attribute peak memory to it
+        for model in models:
+            if model["status"] != "success":
+                continue
+            model_dir = run_dir / "models" / model["model"]
+            model_dir.mkdir(parents=True, exist_ok=True)
+            measured = run_measured(
+                dbt_command(["run", "--full-refresh", "-s", model["model"]], model_dir),
+                model_dir / "dbt.log", env
+            )
+            isolated = read_run_results(model_dir)
+            model["isolated_seconds"] = isolated[0]["seconds"] if isolated else None
+            model["peak_memory_mb"] = measured["peak_memory_mb"]
+
+    conn = duckdb.connect(str(db_path), read_only=True)
+    rows = count_rows(conn, [m["relation"] for m in models if m["relation"]])
+    conn.close()
+    for model in models:
+        model["rows"] = rows.get(model["relation"])
+
+    return {**build, "models": models}
+
+
+# =============================================================================
+# Reverse-ETL queries
+# =============================================================================
+
+def run_sync_query(name: str, db_path: str):
+    """Run one sync's extraction query and print its timing as JSON (child process)."""
+    from reverse_etl.src import syncs
+
+    class_name, extract = SYNC_QUERIES[name]
+    sync_class = getattr(syncs, class_name)
+    if class_name == "RecommendationsSync":
+        sync = sync_class(db_path, redis_host="localhost", redis_port=6379)
+    else:
+        sync = sync_class(db_path, postgres_config={})
+
+    start = time.perf_counter()
+    rows = extract(sync)
+    print(json.dumps({"rows": len(rows), "seconds": time.perf_counter() - start}))
+
+
+def time_sync_queries(db_path: Path, run_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Time every sync extraction query in its own process."""
+    sync_dir = run_dir / "syncs"
+    sync_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    for name in SYNC_QUERIES:
+        log_path = sync_dir / f"{name}.log"
+        measured = run_measured(
+            [sys.executable, __file__, "--sync-query", name, "--database", str(db_path)],
+            log_path
+        )
+        output = log_path.read_text().strip().splitlines()
+        if measured["exit_code"] == 0 and output:
+            results[name] = {**json.loads(output[-1]), "peak_memory_mb": measured["peak_memory_mb"]}
+        else:
+            # Last exception line of the traceback
+            errors = [line for line in output if "Error" in line]
+            results[name] = {"error": errors[-1] if errors else f"exit {measured['exit_code']}"}
+        print(f"[INFO]   {name}: {results[name]}")
+
+    return results
+
+
+# =============================================================================
+# Report
+# =============================================================================
+
+def scaling_exponent(n1: int, t1: Optional[float], n2: int, t2: Optional[float]) -> Optional[float]:
+    """Exponent b in t ~ n^b between two sizes (1.0 = linear)."""
+    if not t1 or not t2 or n1 == n2:
+        return None
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def format_cell(seconds: Optional[float], exponent: Optional[float], peak_mb: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    cell = f"{seconds:.2f}s"
+    if exponent is not None:
+        cell += f" (x^{exponent:.2f})"
+    if peak_mb is not None:
+        cell += f", {peak_mb:,.0f} MB"
+    return cell
+
+
+def write_report(runs: List[Dict[str, Any]], output_dir: Path) -> Path:
+    """Write report.json and the markdown scaling report."""
+    (output_dir / "report.json").write_text(json.dumps(runs, indent=2, default=str))
+
+    labels = [run["label"] for run in runs]
+    events = [run["dataset"]["events"] for run in runs]
+    header = "| Name | " + " | ".join(labels) + " |"
+    divider = "|---" * (len(labels) + 1) + "|"
+
+    lines = [
+        "# Warehouse Scaling Report",
+        "",
+        f"Generated {datetime.utcnow():%Y-%m-%d %H:%M} UTC. Cells are seconds, "
+        "(x^b) the scaling exponent from the previous size (1.0 = linear) and "
+        "peak process memory where measured.",
+        "",
+        "## Datasets",
+        "",
+        "| Size | Events | Generation | dbt build | Build peak MB | DB size |",
+        "|---|---|---|---|---|---|",
+    ]
+    for run in runs:
+        lines.append(
+            f"| {run['label']} | {run['dataset']['events']:,} | {run['dataset']['seconds']:.1f}s "
+            f"| {run['build']['seconds']:.1f}s | {run['build']['peak_memory_mb']:,.0f} "
+            f"| {run['db_size_mb']:,.0f} MB |"
+        )
+
+    def timing_table(title: str, names: List[str], lookup) -> List[str]:
+        table = ["", f"## {title}", "", header, divider]
+        for name in names:
+            cells = []
+            for i, run in enumerate(runs):
+                entry = lookup(run, name) or {}
+                if "error" in entry:
+                    cells.append("FAILED")
+                    continue
+                seconds = entry.get("seconds")
+                exponent = None
+                if i:
+                    previous = (lookup(runs[i - 1], name) or {}).get("seconds")
+                    exponent = scaling_exponent(events[i - 1], previous, events[i], seconds)
+                cells.append(format_cell(seconds, exponent, entry.get("peak_memory_mb")))
+            table.append(f"| {name} | " + " | ".join(cells) + " |")
+        return table
+
+    def model_entry(run, name):
+        for model in run["build"]["models"]:
+            if model["model"] == name:
+                return model if model["status"] == "success" else {"error": model["message"]}
+        return None
+
+    model_names = list(dict.fromkeys(
+        m["model"] for run in runs for m in run["build"]["models"]
+    ))
+    lines += timing_table("dbt Models", model_names, model_entry)
+    lines += timing_table("Reverse-ETL Queries", list(SYNC_QUERIES), lambda run, name: run["syncs"].get(name))
+
+    # What breaks first: largest share of the build at the largest size,
+    # superlinear growth, and anything that failed
+    largest = runs[-1]
+    total = sum(m["seconds"] for m in largest["build"]["models"]) or 1
+    ranked = sorted(largest["build"]["models"], key=lambda m: m["seconds"], reverse=True)
+    lines += ["", f"## Slowest Models at {largest['label']}", ""]
+    for model in ranked[:5]:
+        lines.append(f"- {model['model']}: {model['seconds']:.2f}s ({model['seconds'] / total:.0%} of build)")
+
+    if len(runs) > 1:
+        superlinear = []
+        for name in model_names:
+            first, last = model_entry(runs[0], name), model_entry(largest, name)
+            if first and last and "error" not in first and "error" not in last:
+                exponent = scaling_exponent(events[0], first["seconds"], events[-1], last["seconds"])
+                if exponent and exponent > SUPERLINEAR_EXPONENT:
+                    superlinear.append(f"- {name}: x^{exponent:.2f}")
+        lines += ["", f"## Superlinear Models (exponent > {SUPERLINEAR_EXPONENT})", ""]
+        lines += superlinear or ["- none"]
+
+    failures = [
+        f"- {run['label']}: {m['model']} ({m['status']}): {m['message']}"
+        for run in runs for m in run["build"]["models"] if m["status"] != "success"
+    ]
+    if failures:
+        lines += ["", "## Failures", ""] + failures
+
+    report_path = output_dir / "report.md"
+    report_path.write_text("\n".join(lines) + "\n")
+    return report_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dbt models and reverse-ETL queries by data size")
+    parser.add_argument("--sizes", default="1M,10M,100M", help="Comma-separated event counts")
+    parser.add_argument("--output", default="data/benchmarks", help="Directory for databases and reports")
+    parser.add_argument("--template-events", type=int, default=100_000,
+                        help="Events generated by the event generator before replication")
+    parser.add_argument("--days", type=int, default=60, help="Days of history to spread sessions over")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--isolate-models", action="store_true",
+                        help="Rebuild each model in its own process to record per-model peak memory")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated databases")
+    parser.add_argument("--sync-query", choices=list(SYNC_QUERIES), help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.sync_query:
+        run_sync_query(args.sync_query, args.database)
+        return
+
+    output_dir = Path(args.output).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if not (DBT_DIR / "dbt_packages").exists():
+        subprocess.run(dbt_command(["deps"], output_dir), check=True)
+
+    runs = []
+    for n_events in sorted(parse_size(s) for s in args.sizes.split(",")):
+        label = format_size(n_events)
+        run_dir = output_dir / label
+        if run_dir.exists():
+            shutil.rmtree(run_dir)
+        run_dir.mkdir(parents=True)
+        # The dbt sources pin the catalog name, so the file must be searchflow.duckdb
+        db_path = run_dir / "searchflow.duckdb"
+
+        print(f"[INFO] {label}: generating events...")
+        dataset = generate_dataset(db_path, n_events, args.template_events, args.days, args.seed)
+        print(f"[INFO]   {dataset['events']:,} events in {dataset['seconds']:.1f}s")
+
+        print(f"[INFO] {label}: building models...")
+        build = build_models(db_path, run_dir, args.isolate_models)
+
+        print(f"[INFO] {label}: timing reverse-ETL queries...")
+        syncs = time_sync_queries(db_path, run_dir)
+
+        runs.append({
+            "label": label,
+            "dataset": dataset,
+            "build": build,
+            "syncs": syncs,
+            "db_size_mb": db_path.stat().st_size / 1024 ** 2,
+        })
+        report_path = write_report(runs, output_dir)
+
+        if not args.keep:
+            db_path.unlink()
+
+    print(f"[INFO] Scaling report: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Query funnel metrics through the pre-aggregated rollup cubes.
+
+The dbt rollups (models/marts/analytics/rollups) store additive measures at
+hourly and daily grain for several dimension sets. This router picks the
+coarsest rollup that contains every requested dimension at the requested
+time grain, re-aggregates it, and derives rates/averages from the sums, so
+dashboard queries read a few hundred rows instead of the full fact table.
+"""
+
+import argparse
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+import duckdb
+
+
+ANALYTICS_SCHEMA = "main_analytics"
+
+# Time grains from finest to coarsest
+TIME_GRAINS = ("hour", "day")
+TIME_COLUMNS = {"hour": "funnel_hour", "day": "funnel_date"}
+
+DIMENSIONS = ("platform", "device_type", "geo_country", "utm_source", "utm_campaign")
+
+# Derived metrics: (name, numerator, denominator) over re-aggregated sums
+DERIVED_METRICS = [
+    ("click_through_rate", "total_clicks", "total_searches"),
+    ("conversion_rate", "total_conversions", "total_clicks"),
+    ("search_to_conversion_rate", "total_conversions", "total_searches"),
+    ("avg_session_duration_minutes", "sum_session_duration_minutes", "total_sessions"),
+    ("avg_click_position", "sum_avg_click_position", "clicked_sessions"),
+    ("avg_queries_per_session", "sum_unique_queries", "total_sessions"),
+    ("avg_order_value", "total_revenue", "total_conversions"),
+    ("revenue_per_session", "total_revenue", "total_sessions"),
+]
+
+ADDITIVE_MEASURES = [
+    "total_sessions",
+    "total_searches",
+    "total_clicks",
+    "total_conversions",
+    "total_revenue",
+    "total_commission",
+    "sum_session_duration_minutes",
+    "sum_avg_click_position",
+    "clicked_sessions",
+    "sum_unique_queries",
+    "converted_sessions",
+    "engaged_sessions",
+    "bounced_sessions",
+]
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """A rollup cube registered in rollup_catalog."""
+    name: str
+    time_grain: str
+    dimensions: FrozenSet[str]
+    row_count: int
+
+
+class RollupRouter:
+    """Routes funnel queries to the coarsest rollup that can answer them."""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection):
+        self.conn = conn
+        self.rollups = self._load_catalog()
+
+    def _load_catalog(self) -> List[Rollup]:
+        """Load rollup definitions from the warehouse catalog."""
+        rows = self.conn.execute(f"""
+            SELECT rollup_name, time_grain, dimensions, row_count
+            FROM {ANALYTICS_SCHEMA}.rollup_catalog
+        """).fetchall()
+
+        return [
+            Rollup(
+                name=name,
+                time_grain=grain,
+                dimensions=frozenset(d for d in dimensions.split(",") if d),
+                row_count=row_count,
+            )
+            for name, grain, dimensions, row_count in rows
+        ]
+
+    def route(self, dimensions: Iterable[str] = (), grain: str = "day") -> Rollup:
+        """
+        Pick the coarsest rollup that can answer a query.
+
+        A rollup qualifies if it keeps every requested dimension and its time
+        grain is at least as fine as the requested one. Among those, the
+        smallest rollup wins.
+        """
+        if grain not in TIME_GRAINS:
+            raise ValueError(f"Unknown grain '{grain}', expected one of {TIME_GRAINS}")
+
+        requested = frozenset(dimensions)
+        unknown = requested - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {sorted(unknown)}")
+
+        max_grain = TIME_GRAINS.index(grain)
+        candidates = [
+            r for r in self.rollups
+            if requested <= r.dimensions and TIME_GRAINS.index(r.time_grain) <= max_grain
+        ]
+        if not candidates:
+            raise LookupError(f"No rollup covers dimensions {sorted(requested)} at '{grain}' grain")
+
+        # Coarsest first: fewest rows, then fewest dimensions, then coarsest time grain
+        return min(
+            candidates,
+            key=lambda r: (r.row_count, len(r.dimensions), -TIME_GRAINS.index(r.time_grain)),
+        )
+
+    def query(
+        self,
+        dimensions: Iterable[str] = (),
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        grain: str = "day",
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Funnel metrics grouped by time bucket and dimensions.
+
+        Args:
+            dimensions: Dimensions to group by
+            start_date: Inclusive start date (funnel_date)
+            end_date: Inclusive end date (funnel_date)
+            grain: 'hour' or 'day'
+            filters: Equality filters on dimensions, e.g. {'platform': 'ios'}
+
+        Returns:
+            List of row dicts with additive measures and derived metrics
+        """
+        dimensions = list(dimensions)
+        filters = filters or {}
+        rollup = self.route(set(dimensions) | set(filters), grain)
+
+        time_column = TIME_COLUMNS[grain]
+        if grain == "day" and rollup.time_grain == "hour":
+            time_expr = "funnel_date"
+        else:
+            time_expr = time_column
+
+        group_cols = [f"{time_expr} AS {time_column}"] + dimensions
+        measures = [f"SUM({m}) AS {m}" for m in ADDITIVE_MEASURES]
+
+        where, params = [], []
+        if start_date is not None:
+            where.append("funnel_date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            where.append("funnel_date <= ?")
+            params.append(end_date)
+        for column, value in filters.items():
+            where.append(f"{column} IS NOT DISTINCT FROM ?")
+            params.append(value)
+
+        sql = f"""
+            SELECT {', '.join(group_cols + measures)}
+            FROM {ANALYTICS_SCHEMA}.{rollup.name}
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            GROUP BY ALL
+            ORDER BY ALL
+        """
+        cursor = self.conn.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        for row in rows:
+            for name, numerator, denominator in DERIVED_METRICS:
+                row[name] = (
+                    float(row[numerator]) / float(row[denominator])
+                    if row[denominator] else 0.0
+                )
+
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query funnel metrics via rollups")
+    parser.add_argument("--db", default="data/searchflow.duckdb")
+    parser.add_argument("--dimensions", default="", help="Comma-separated dimensions")
+    parser.add_argument("--grain", choices=TIME_GRAINS, default="day")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    dimensions = [d for d in args.dimensions.split(",") if d]
+
+    conn = duckdb.connect(args.db, read_only=True)
+    router = RollupRouter(conn)
+    rollup = router.route(dimensions, args.grain)
+    print(f"[INFO] Routed to {ANALYTICS_SCHEMA}.{rollup.name} ({rollup.row_count:,} rows)")
+
+    for row in router.query(dimensions, args.start, args.end, args.grain):
+        keys = [str(row[TIME_COLUMNS[args.grain]])] + [str(row[d]) for d in dimensions]
+        print(
+            f"  {' | '.join(keys)}: {row['total_sessions']} sessions, "
+            f"{row['total_searches']} searches (CTR: {row['click_through_rate']:.2%}, "
+            f"CVR: {row['conversion_rate']:.2%})"
+        )
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
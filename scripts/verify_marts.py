@@ -1,72 +1,103 @@
+#!/usr/bin/env python3
+"""
+Verify the transformed marts: row counts per layer and a funnel sample.
+
+The table lists and count helpers are also used by benchmark_warehouse.py
+to record model sizes next to build timings.
+
+Usage:
+    python scripts/verify_marts.py
+    python scripts/verify_marts.py --database /tmp/bench/searchflow_1m.duckdb
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
 import duckdb
 
-conn = duckdb.connect("data/searchflow.duckdb")
 
-print("=== Raw Table Counts ===")
-raw_tables = ["raw.search_events", "raw.click_events", "raw.conversion_events"]
-for table in raw_tables:
-    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-    print(f"  {table}: {count:,} rows")
+RAW_TABLES = ["raw.search_events", "raw.click_events", "raw.conversion_events"]
 
-print("\n=== Staging Views ===")
-staging_tables = [
-    "main_staging.stg_search_events", 
-    "main_staging.stg_click_events", 
-    "main_staging.stg_conversion_events"
-]
-for table in staging_tables:
-    try:
-        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        print(f"  {table}: {count:,} rows")
-    except Exception as e:
-        print(f"  {table}: Error - {e}")
-
-print("\n=== Intermediate Views ===")
-int_tables = [
-    "main_intermediate.int_search_sessions",
-    "main_intermediate.int_user_journeys"
+# Model relations by layer, in build order
+LAYERS = [
+    ("Staging Tables", [
+        "main_staging.stg_search_events",
+        "main_staging.stg_click_events",
+        "main_staging.stg_conversion_events"
+    ]),
+    ("Intermediate Models", [
+        "main_intermediate.int_search_sessions",
+        "main_intermediate.int_user_journeys",
+        "main_intermediate.int_user_attribute_counts"
+    ]),
+    ("Analytics Mart Tables", [
+        "main_analytics.fct_search_funnel",
+        "main_analytics.dim_users"
+    ]),
+    ("Rollup Tables", [
+        "main_analytics.rollup_funnel_hourly",
+        "main_analytics.rollup_funnel_daily",
+        "main_analytics.rollup_funnel_daily_channel",
+        "main_analytics.rollup_funnel_daily_country",
+        "main_analytics.rollup_funnel_daily_device",
+        "main_analytics.rollup_funnel_daily_total",
+        "main_analytics.rollup_catalog"
+    ]),
+    ("Marketing Mart Tables", [
+        "main_marketing.mart_user_segments",
+        "main_marketing.mart_recommendations"
+    ]),
 ]
-for table in int_tables:
-    try:
-        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        print(f"  {table}: {count:,} rows")
-    except Exception as e:
-        print(f"  {table}: Error - {e}")
-
-print("\n=== Analytics Mart Tables ===")
-analytics_tables = [
-    "main_analytics.fct_search_funnel",
-    "main_analytics.dim_users"
-]
-for table in analytics_tables:
-    try:
-        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        print(f"  {table}: {count:,} rows")
-    except Exception as e:
-        print(f"  {table}: Error - {e}")
-
-print("\n=== Marketing Mart Tables ===")
-marketing_tables = [
-    "main_marketing.mart_user_segments",
-    "main_marketing.mart_recommendations"
-]
-for table in marketing_tables:
-    try:
-        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        print(f"  {table}: {count:,} rows")
-    except Exception as e:
-        print(f"  {table}: Error - {e}")
-
-print("\n=== Sample Data from fct_search_funnel ===")
-result = conn.execute("""
-    SELECT funnel_date, total_sessions, total_searches, total_clicks, 
-           total_conversions, click_through_rate, conversion_rate
-    FROM main_analytics.fct_search_funnel
-    ORDER BY funnel_date DESC
-    LIMIT 5
-""").fetchall()
-for row in result:
-    print(f"  {row[0]}: {row[1]} sessions, {row[2]} searches, {row[3]} clicks, {row[4]} conversions (CTR: {row[5]:.2%}, CVR: {row[6]:.2%})")
-
-conn.close()
-print("\n=== Verification Complete ===")
+
+
+def count_rows(conn: duckdb.DuckDBPyConnection, tables: List[str]) -> Dict[str, Optional[int]]:
+    """Row count per table (None if the table cannot be read)."""
+    counts = {}
+    for table in tables:
+        try:
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except duckdb.Error:
+            counts[table] = None
+    return counts
+
+
+def print_counts(conn: duckdb.DuckDBPyConnection, title: str, tables: List[str]):
+    """Print the row count of each table under a section title."""
+    print(f"=== {title} ===")
+    for table, count in count_rows(conn, tables).items():
+        print(f"  {table}: {count:,} rows" if count is not None else f"  {table}: not available")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify transformed marts")
+    parser.add_argument(
+        "--database", default="data/searchflow.duckdb",
+        help="DuckDB warehouse file"
+    )
+    args = parser.parse_args()
+
+    conn = duckdb.connect(args.database)
+
+    print_counts(conn, "Raw Table Counts", RAW_TABLES)
+
+    for title, tables in LAYERS:
+        print()
+        print_counts(conn, title, tables)
+
+    print("\n=== Sample Data from fct_search_funnel ===")
+    result = conn.execute("""
+        SELECT funnel_date, total_sessions, total_searches, total_clicks,
+               total_conversions, click_through_rate, conversion_rate
+        FROM main_analytics.fct_search_funnel
+        ORDER BY funnel_date DESC
+        LIMIT 5
+    """).fetchall()
+    for row in result:
+        print(f"  {row[0]}: {row[1]} sessions, {row[2]} searches, {row[3]} clicks, {row[4]} conversions (CTR: {row[5]:.2%}, CVR: {row[6]:.2%})")
+
+    conn.close()
+    print("\n=== Verification Complete ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -70,11 +70,13 @@ CREATE TABLE IF NOT EXISTS public.crm_user_segments (
     last_seen_at        TIMESTAMP,
     synced_at           TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     previous_segment    VARCHAR(50),
-    segment_changed_at  TIMESTAMP
+    segment_changed_at  TIMESTAMP,
+    source_segmented_at TIMESTAMP       -- warehouse segmented_at (UTC), sync watermark
 );
 
 CREATE INDEX IF NOT EXISTS idx_crm_segment ON public.crm_user_segments(segment);
 CREATE INDEX IF NOT EXISTS idx_crm_synced ON public.crm_user_segments(synced_at);
+CREATE INDEX IF NOT EXISTS idx_crm_source_segmented ON public.crm_user_segments(source_segmented_at);
 
 -- ============================================
 -- EMAIL QUEUE (Reverse-ETL Destination)